@@ -1,5 +1,178 @@
+const API_BASE = "http://127.0.0.1:8000";
+
+// Local verdict snapshot of known allow/deny hosts and domains (see
+// ai-model/model/verdict_snapshot.py). Deny entries are sorted 4-byte SHA-256
+// prefixes: a hit can be a collision, so it still goes to /check-url, but the
+// navigation is blocked if that request fails. Allow entries are full SHA-256
+// digests and only an exact match is decided locally; a short prefix could be
+// matched by an attacker-chosen subdomain.
+const SNAPSHOT_SYNC_MS = 10 * 60 * 1000;
+const SNAPSHOT_FORMAT = 2;
+let snapshot = null; // { seq, sets: { deny: Uint32Array, allow: Set<hex digest> } }
+let snapshotSyncedAt = 0;
+let snapshotSyncing = null;
+
+function decodeBytes(b64) {
+  return Uint8Array.from(atob(b64), (c) => c.charCodeAt(0));
+}
+
+function encodeBytes(bytes) {
+  let binary = "";
+  for (let i = 0; i < bytes.length; i += 0x8000) {
+    binary += String.fromCharCode(...bytes.subarray(i, i + 0x8000));
+  }
+  return btoa(binary);
+}
+
+function toHex(bytes) {
+  return Array.from(bytes, (b) => b.toString(16).padStart(2, "0")).join("");
+}
+
+function decodePrefixes(b64) {
+  const bytes = decodeBytes(b64);
+  const view = new DataView(bytes.buffer);
+  const values = new Uint32Array(bytes.length / 4);
+  for (let i = 0; i < values.length; i++) values[i] = view.getUint32(i * 4);
+  return values;
+}
+
+function encodePrefixes(values) {
+  const bytes = new Uint8Array(values.length * 4);
+  const view = new DataView(bytes.buffer);
+  values.forEach((v, i) => view.setUint32(i * 4, v));
+  return encodeBytes(bytes);
+}
+
+function decodeDigests(b64) {
+  const bytes = decodeBytes(b64);
+  const values = [];
+  for (let i = 0; i + 32 <= bytes.length; i += 32) values.push(toHex(bytes.subarray(i, i + 32)));
+  return values;
+}
+
+function encodeDigests(values) {
+  const bytes = new Uint8Array(values.size * 32);
+  let i = 0;
+  for (const hex of values) {
+    for (let j = 0; j < 32; j++) bytes[i++] = parseInt(hex.substr(j * 2, 2), 16);
+  }
+  return encodeBytes(bytes);
+}
+
+function hasPrefix(values, p) {
+  let lo = 0;
+  let hi = values.length - 1;
+  while (lo <= hi) {
+    const mid = (lo + hi) >>> 1;
+    if (values[mid] === p) return true;
+    if (values[mid] < p) lo = mid + 1;
+    else hi = mid - 1;
+  }
+  return false;
+}
+
+function applyPrefixDiff(values, add, remove) {
+  const removed = new Set(remove);
+  const merged = Array.from(values).filter((v) => !removed.has(v));
+  merged.push(...add);
+  return Uint32Array.from(new Set(merged)).sort();
+}
+
+function applyDigestDiff(values, add, remove) {
+  const merged = new Set(values);
+  for (const v of remove) merged.delete(v);
+  for (const v of add) merged.add(v);
+  return merged;
+}
+
+async function loadStoredSnapshot() {
+  const { verdictSnapshot } = await chrome.storage.local.get("verdictSnapshot");
+  // Snapshots stored by an older format are dropped and fetched again in full
+  if (verdictSnapshot && verdictSnapshot.format === SNAPSHOT_FORMAT) {
+    snapshot = {
+      seq: verdictSnapshot.seq,
+      sets: {
+        deny: decodePrefixes(verdictSnapshot.sets.deny),
+        allow: new Set(decodeDigests(verdictSnapshot.sets.allow)),
+      },
+    };
+  }
+}
+
+async function syncSnapshot() {
+  if (!snapshot) await loadStoredSnapshot();
+  const path = snapshot ? `/snapshot/diff?since=${snapshot.seq}` : "/snapshot";
+  const response = await fetch(API_BASE + path);
+  if (!response.ok) return;
+  const data = await response.json();
+  if (data.format_version !== SNAPSHOT_FORMAT) {
+    console.log("Unsupported verdict snapshot format:", data.format_version);
+    return;
+  }
+  if (snapshot && data.seq === snapshot.seq) return;
+
+  const diff = data.full === false;
+  const sets = {
+    deny: diff
+      ? applyPrefixDiff(snapshot.sets.deny, decodePrefixes(data.sets.deny.add), decodePrefixes(data.sets.deny.remove))
+      : decodePrefixes(data.sets.deny),
+    allow: diff
+      ? applyDigestDiff(snapshot.sets.allow, decodeDigests(data.sets.allow.add), decodeDigests(data.sets.allow.remove))
+      : new Set(decodeDigests(data.sets.allow)),
+  };
+  snapshot = { seq: data.seq, sets };
+  await chrome.storage.local.set({
+    verdictSnapshot: {
+      format: SNAPSHOT_FORMAT,
+      seq: data.seq,
+      sets: { deny: encodePrefixes(sets.deny), allow: encodeDigests(sets.allow) },
+    },
+  });
+  console.log("Verdict snapshot synced:", data.seq, diff ? "(diff)" : "(full)");
+}
+
+function maybeSyncSnapshot() {
+  if (snapshotSyncing || Date.now() - snapshotSyncedAt < SNAPSHOT_SYNC_MS) return snapshotSyncing;
+  snapshotSyncedAt = Date.now();
+  snapshotSyncing = syncSnapshot()
+    .catch((e) => console.error("Error syncing verdict snapshot:", e))
+    .finally(() => {
+      snapshotSyncing = null;
+    });
+  return snapshotSyncing;
+}
+
+async function digest(kind, name) {
+  return new Uint8Array(await crypto.subtle.digest("SHA-256", new TextEncoder().encode(`${kind}:${name}`)));
+}
+
+// "allow", "deny" or null, walking the host and its parent domains like the
+// backend's domain index (the most specific entry wins). Each level probes the
+// exact allow digest before the deny prefix, so a prefix collision cannot hide
+// an allow entry for the same name. A deny hit stops the walk: if it is real it
+// overrides any parent allow, and only /check-url can tell it from a collision.
+// Only "allow" is final; "deny" makes isBlocked fail closed.
+async function snapshotVerdict(url) {
+  if (!snapshot) {
+    await maybeSyncSnapshot();
+    if (!snapshot) return null;
+  }
+  const host = new URL(url).hostname.replace(/\.$/, "");
+  if (!host) return null;
+  const labels = host.split(".");
+  const probes = [["host", host]];
+  for (let i = 0; i < labels.length - 1; i++) probes.push(["domain", labels.slice(i).join(".")]);
+  for (const [kind, name] of probes) {
+    const d = await digest(kind, name);
+    if (snapshot.sets.allow.has(toHex(d))) return "allow";
+    if (hasPrefix(snapshot.sets.deny, new DataView(d.buffer).getUint32(0))) return "deny";
+  }
+  return null;
+}
+
 // Helper: check if URL is blocked by calling API
 async function isBlocked(url) {
+  let failClosed = false;
   try {
     // Skip checking for special URLs
     if (
@@ -17,25 +190,34 @@ async function isBlocked(url) {
       return false;
     }
 
+    // Exact matches of known-good hosts are decided locally; the rest are
+    // checked by the API. A deny prefix hit is blocked if the API can't answer.
+    maybeSyncSnapshot();
+    const local = await snapshotVerdict(url);
+    if (local === "allow") {
+      return false;
+    }
+    failClosed = local === "deny";
+
     // Remove the fragment (#) part of the URL
     const urlWithoutFragment = url.split("#")[0];
 
     // Properly encode the URL for the API request
-    const apiUrl = new URL("http://127.0.0.1:8000/check-url");
+    const apiUrl = new URL(API_BASE + "/check-url");
     apiUrl.searchParams.append("url", urlWithoutFragment);
 
     const response = await fetch(apiUrl.toString());
 
     if (!response.ok) {
       console.log("API response not OK:", response.status, url);
-      return false;
+      return failClosed;
     }
 
     const data = await response.json();
     return data.is_malicious;
   } catch (e) {
     console.error("Error checking URL:", e, "URL:", url);
-    return false;
+    return failClosed;
   }
 }
 
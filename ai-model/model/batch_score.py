@@ -0,0 +1,166 @@
+"""
+Offline scoring of large url lists, e.g. the nightly rescoring of proxy logs.
+
+Reads one url per line from a file or stdin, scores them in chunks with one
+predict_proba call per chunk (optionally spread over a pool of worker
+processes) and writes NDJSON or CSV records in input order:
+
+    {"url": "http://example.com/", "label": "benign", "score": 0.0312}
+
+At most 2 x workers chunks are read ahead of the writer, so memory stays
+constant whatever the input size. Progress goes to stderr, so the results
+can be written to stdout.
+
+Usage: python model/predict.py --batch [--input urls.txt|-] [--output scores.ndjson|-]
+                                       [--format ndjson|csv] [--chunk-size 10000]
+                                       [--workers 4] [--model PATH] [--quiet]
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+
+MODEL_FILE = Path(__file__).resolve().parent / 'url_pipeline.joblib'
+PROGRESS_SECONDS = 5.0
+
+# Per-process model, loaded once (inherited by forked pool workers)
+_pipeline = None
+
+
+def load_model(path=MODEL_FILE):
+    global _pipeline
+    if _pipeline is None:
+        _pipeline = joblib.load(path)
+    return _pipeline
+
+
+def score_chunk(urls, model_path=MODEL_FILE):
+    """(labels, malicious-class probabilities) for a list of urls, in order."""
+    pipeline = load_model(model_path)
+    proba = pipeline.predict_proba(pd.DataFrame({'url': urls}))
+    labels = np.where(pipeline.classes_[proba.argmax(axis=1)] == 1, "malicious", "benign")
+    return labels.tolist(), proba[:, 1].tolist()
+
+
+def read_urls(stream):
+    for line in stream:
+        url = line.strip()
+        if url:
+            yield url
+
+
+def chunked(urls, size):
+    urls = iter(urls)
+    return iter(lambda: list(islice(urls, size)), [])
+
+
+def scored_chunks(chunks, workers, model_path):
+    """Yields (urls, labels, scores) per chunk in input order."""
+    if workers <= 1:
+        for urls in chunks:
+            yield (urls, *score_chunk(urls, model_path))
+        return
+
+    load_model(model_path)
+    with ProcessPoolExecutor(max_workers=workers, initializer=load_model, initargs=(model_path,)) as pool:
+        pending = deque()
+        for urls in chunks:
+            pending.append((urls, pool.submit(score_chunk, urls, model_path)))
+            if len(pending) >= 2 * workers:
+                urls, future = pending.popleft()
+                yield (urls, *future.result())
+        while pending:
+            urls, future = pending.popleft()
+            yield (urls, *future.result())
+
+
+class NDJSONWriter:
+    def __init__(self, out):
+        self.out = out
+
+    def write(self, urls, labels, scores):
+        self.out.writelines(
+            json.dumps({"url": u, "label": l, "score": s}) + "\n"
+            for u, l, s in zip(urls, labels, scores)
+        )
+
+
+class CSVWriter:
+    def __init__(self, out):
+        self.writer = csv.writer(out)
+        self.writer.writerow(["url", "label", "score"])
+
+    def write(self, urls, labels, scores):
+        self.writer.writerows(zip(urls, labels, scores))
+
+
+WRITERS = {"ndjson": NDJSONWriter, "csv": CSVWriter}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--input", default="-", help="One url per line; - for stdin")
+    parser.add_argument("--output", default="-", help="- for stdout")
+    parser.add_argument("--format", choices=sorted(WRITERS), default=None,
+                        help="Default: from the output file extension, else ndjson")
+    parser.add_argument("--chunk-size", type=int, default=10000)
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes (0: one per CPU)")
+    parser.add_argument("--model", default=str(MODEL_FILE))
+    parser.add_argument("--quiet", action="store_true", help="No progress output")
+    args = parser.parse_args(argv)
+
+    fmt = args.format or ("csv" if args.output.endswith(".csv") else "ndjson")
+    workers = args.workers or os.cpu_count() or 1
+    if args.chunk_size < 1:
+        parser.error("--chunk-size must be positive")
+    if not Path(args.model).exists():
+        print(f"Model file not found at {args.model}. Please train the model first.", file=sys.stderr)
+        return 1
+
+    source = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8", errors="replace")
+    sink = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8", newline="")
+    writer = WRITERS[fmt](sink)
+    started = time.perf_counter()
+    next_report = started + PROGRESS_SECONDS
+    total = malicious = 0
+    try:
+        for urls, labels, scores in scored_chunks(chunked(read_urls(source), args.chunk_size),
+                                                  workers, args.model):
+            writer.write(urls, labels, scores)
+            total += len(urls)
+            malicious += labels.count("malicious")
+            now = time.perf_counter()
+            if not args.quiet and now >= next_report:
+                next_report = now + PROGRESS_SECONDS
+                print(f"  {total} urls scored ({total / (now - started):.0f} urls/s)", file=sys.stderr)
+    except BrokenPipeError:
+        # The reader went away (e.g. | head); stop without a traceback
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 1
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if sink is not sys.stdout:
+            sink.close()
+        else:
+            sink.flush()
+
+    elapsed = time.perf_counter() - started
+    if not args.quiet:
+        print(f"Scored {total} urls ({malicious} malicious) in {elapsed:.1f}s "
+              f"({total / elapsed if elapsed else 0:.0f} urls/s, {workers} worker(s))", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,180 @@
+"""
+Builds the known-domain allow/deny index consulted by the backend before
+the model.
+
+Hosts whose labelled URLs all agree (and occur at least --min-host-urls
+times) become host entries; registered domains whose URLs all agree across
+at least --min-domain-hosts distinct hosts become domain entries that also
+cover unseen subdomains. Hosts of reports that a reviewer confirmed
+(reports.review_status = 'confirmed') in the reports database are added
+to the deny list. Unreviewed reports are anonymous and never used, and a
+confirmed report never overrides a labelled allow entry: those hosts are
+listed as conflicts instead.
+
+Usage: python -m model.domain_index [--csv data/urls_and_labels.csv] [--out model/domain_index.json]
+                                   [--reports-db URL] [--no-allow]
+"""
+import argparse
+import hashlib
+import json
+import sys
+from collections import defaultdict
+from datetime import datetime, timezone
+from pathlib import Path
+from urllib.parse import urlsplit
+
+import pandas as pd
+
+from model.public_suffix import registered_domain
+
+ROOT = Path(__file__).resolve().parent.parent
+CSV_FILE = ROOT / "data" / "urls_and_labels.csv"
+INDEX_FILE = Path(__file__).resolve().parent / "domain_index.json"
+FORMAT_VERSION = 1
+
+ALLOW, DENY = "allow", "deny"
+CONFIRMED = "confirmed"
+
+
+def url_host(url):
+    """Lowercased hostname of a url (scheme optional), '' if it has none."""
+    url = str(url).strip()
+    if "://" not in url:
+        url = "http://" + url
+    try:
+        return (urlsplit(url).hostname or "").rstrip(".")
+    except ValueError:
+        return ""
+
+
+def allow_entry(host, hosts, domains):
+    """The labelled allow host or domain covering host, None if there is none."""
+    if hosts.get(host) == ALLOW:
+        return host
+    labels = host.split(".")
+    for i in range(len(labels) - 1):
+        suffix = ".".join(labels[i:])
+        if domains.get(suffix) == ALLOW:
+            return suffix
+    return None
+
+
+def build_index(urls, labels, min_host_urls=3, min_domain_hosts=2, min_domain_urls=5,
+                reported_hosts=(), include_allow=True):
+    """
+    The index dict. reported_hosts (hosts of confirmed reports) become deny
+    entries unless a labelled allow entry covers them; those are returned
+    under "conflicts" and left to the model.
+    """
+    host_labels = defaultdict(set)
+    host_counts = defaultdict(int)
+    for url, label in zip(urls, labels):
+        host = url_host(url)
+        if host:
+            host_labels[host].add(int(label))
+            host_counts[host] += 1
+
+    hosts = {}
+    domain_labels = defaultdict(set)
+    domain_hosts = defaultdict(set)
+    domain_counts = defaultdict(int)
+    for host, seen in host_labels.items():
+        if len(seen) == 1 and host_counts[host] >= min_host_urls:
+            hosts[host] = DENY if 1 in seen else ALLOW
+        domain = registered_domain(host)
+        if domain:
+            domain_labels[domain] |= seen
+            domain_hosts[domain].add(host)
+            domain_counts[domain] += host_counts[host]
+
+    domains = {}
+    for domain, seen in domain_labels.items():
+        if (len(seen) == 1 and len(domain_hosts[domain]) >= min_domain_hosts
+                and domain_counts[domain] >= min_domain_urls):
+            domains[domain] = DENY if 1 in seen else ALLOW
+
+    conflicts = {}
+    for host in reported_hosts:
+        allowed = allow_entry(host, hosts, domains)
+        if allowed is not None:
+            conflicts[host] = allowed
+        else:
+            hosts[host] = DENY
+
+    if not include_allow:
+        hosts = {h: v for h, v in hosts.items() if v == DENY}
+        domains = {d: v for d, v in domains.items() if v == DENY}
+
+    index = {
+        "format_version": FORMAT_VERSION,
+        "built_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "hosts": {v: sorted(h for h, hv in hosts.items() if hv == v) for v in (DENY, ALLOW)},
+        "domains": {v: sorted(d for d, dv in domains.items() if dv == v) for v in (DENY, ALLOW)},
+        "conflicts": dict(sorted(conflicts.items())),
+    }
+    content = json.dumps([index["hosts"], index["domains"]], sort_keys=True).encode()
+    index["version"] = hashlib.sha256(content).hexdigest()[:12]
+    return index
+
+
+def reported_hosts_from_db(url):
+    """Hosts of reports a reviewer confirmed, from the reports table."""
+    if url.startswith("sqlite:///"):
+        import sqlite3
+        conn = sqlite3.connect(url[len("sqlite:///"):])
+        placeholder = "?"
+    else:
+        import psycopg2
+        conn = psycopg2.connect(url)
+        placeholder = "%s"
+    try:
+        cur = conn.cursor()
+        cur.execute(f"SELECT url FROM reports WHERE review_status = {placeholder}", (CONFIRMED,))
+        return sorted({host for host in (url_host(row[0]) for row in cur.fetchall()) if host})
+    finally:
+        conn.close()
+
+
+def save_index(index, path):
+    """Writes the index atomically so a running backend never reads a partial file."""
+    path = Path(path)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp, "w") as f:
+        json.dump(index, f, separators=(",", ":"))
+    tmp.replace(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--csv", default=str(CSV_FILE))
+    parser.add_argument("--out", default=str(INDEX_FILE))
+    parser.add_argument("--reports-db", default=None, help="Postgres URL or sqlite:///path")
+    parser.add_argument("--min-host-urls", type=int, default=3)
+    parser.add_argument("--min-domain-hosts", type=int, default=2)
+    parser.add_argument("--min-domain-urls", type=int, default=5)
+    parser.add_argument("--no-allow", action="store_true", help="Only emit deny entries")
+    args = parser.parse_args()
+
+    df = pd.read_csv(args.csv, on_bad_lines='skip').dropna(subset=['url', 'label'])
+    reported = reported_hosts_from_db(args.reports_db) if args.reports_db else []
+
+    index = build_index(
+        df['url'], df['label'].astype(int),
+        min_host_urls=args.min_host_urls,
+        min_domain_hosts=args.min_domain_hosts,
+        min_domain_urls=args.min_domain_urls,
+        reported_hosts=reported,
+        include_allow=not args.no_allow,
+    )
+    save_index(index, args.out)
+    print(f"Saved domain index {index['version']} to {args.out}")
+    for kind in ("hosts", "domains"):
+        print(f"  {kind}: {len(index[kind][DENY])} deny, {len(index[kind][ALLOW])} allow")
+    conflicts = index["conflicts"]
+    print(f"  confirmed reported hosts added: {len(reported) - len(conflicts)}")
+    for host, allowed in conflicts.items():
+        print(f"  not added, labelled allow: {host} (covered by {allowed})")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,163 @@
+"""
+Cached feature matrices and a classifier-only hyperparameter sweep for train.py.
+
+Only the LogisticRegression parameters change between grid points, so the
+features are computed once and reused:
+
+- numeric_features does not depend on the training split and is computed
+  once for the whole dataset, then sliced per fold;
+- the char n-gram TF-IDF is fitted once per fold (so validation folds stay
+  unseen, as in GridSearchCV) and once on the full training set.
+
+Results are cached on disk with joblib.Memory, keyed by a hash of the data
+(urls, row indices) and of the featurizer config (TF-IDF params plus the
+source of utils.py and the bundled suffix list), so re-running train.py on
+unchanged data skips featurization entirely. Set FEATURE_CACHE_DIR="" to
+keep everything in memory only.
+"""
+import hashlib
+import json
+import os
+from pathlib import Path
+
+import joblib
+import numpy as np
+import scipy.sparse as sp
+from sklearn.base import clone
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.metrics import accuracy_score, f1_score, precision_score, recall_score
+from sklearn.model_selection import ParameterGrid
+
+from model.utils import numeric_features
+
+MODEL_DIR = Path(__file__).resolve().parent
+CACHE_DIR = os.getenv("FEATURE_CACHE_DIR", str(MODEL_DIR.parent / ".feature_cache"))
+# Solvers that can start from the previous grid point's coefficients
+WARM_START_SOLVERS = {"lbfgs", "newton-cg", "newton-cholesky", "sag", "saga"}
+# Sources whose changes must invalidate cached features
+FEATURIZER_SOURCES = [MODEL_DIR / "utils.py", MODEL_DIR / "public_suffix.py", MODEL_DIR / "public_suffix_list.dat"]
+
+SCORERS = {
+    "f1": lambda y, p: f1_score(y, p, zero_division=0),
+    "precision": lambda y, p: precision_score(y, p, zero_division=0),
+    "recall": lambda y, p: recall_score(y, p, zero_division=0),
+    "accuracy": accuracy_score,
+}
+
+
+def _hash(*parts):
+    digest = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, np.ndarray):
+            part = np.ascontiguousarray(part).tobytes()
+        elif isinstance(part, Path):
+            part = part.read_bytes()
+        elif not isinstance(part, bytes):
+            part = json.dumps(part, sort_keys=True, default=str).encode()
+        digest.update(len(part).to_bytes(8, "little"))
+        digest.update(part)
+    return digest.hexdigest()[:16]
+
+
+def _numeric_matrix(key, urls):
+    return sp.csr_matrix(numeric_features(urls))
+
+
+def _fit_tfidf(key, vectorizer, urls, train_idx, apply_idx):
+    """Fits the vectorizer on urls[train_idx]; returns it with both transformed matrices."""
+    vectorizer = clone(vectorizer)
+    X_train = vectorizer.fit_transform(urls[train_idx])
+    X_apply = vectorizer.transform(urls[apply_idx]) if apply_idx is not None else None
+    return vectorizer, X_train, X_apply
+
+
+class FeatureCache:
+    """Feature matrices for one dataset of urls under one featurizer config."""
+
+    def __init__(self, urls, vectorizer: TfidfVectorizer, location=CACHE_DIR):
+        self.urls = np.asarray([str(u) for u in urls], dtype=object)
+        self.vectorizer = vectorizer
+        self.data_key = _hash("\n".join(self.urls).encode())
+        self.config_key = _hash(vectorizer.get_params(), *FEATURIZER_SOURCES)
+        memory = joblib.Memory(location or None, verbose=0)
+        self._numeric_fn = memory.cache(_numeric_matrix, ignore=["urls"])
+        self._tfidf_fn = memory.cache(_fit_tfidf, ignore=["vectorizer", "urls", "train_idx", "apply_idx"])
+        self._numeric = None
+
+    def numeric(self):
+        if self._numeric is None:
+            self._numeric = self._numeric_fn(_hash(self.data_key, self.config_key), self.urls)
+        return self._numeric
+
+    def split(self, train_idx, apply_idx=None):
+        """
+        (fitted vectorizer, X_train, X_apply) with the TF-IDF fitted on the
+        train rows only; matrices are laid out like the FeatureUnion output.
+        """
+        key = _hash(self.data_key, self.config_key, train_idx,
+                    apply_idx if apply_idx is not None else b"")
+        vectorizer, tfidf_train, tfidf_apply = self._tfidf_fn(
+            key, self.vectorizer, self.urls, train_idx, apply_idx
+        )
+        numeric = self.numeric()
+        X_train = sp.hstack([tfidf_train, numeric[train_idx]]).tocsr()
+        X_apply = None
+        if apply_idx is not None:
+            X_apply = sp.hstack([tfidf_apply, numeric[apply_idx]]).tocsr()
+        return vectorizer, X_train, X_apply
+
+
+def _fit_path(clf, path, X_train, y_train, X_val, y_val):
+    """
+    Fits clf at each parameter set of path in order, warm-starting from the
+    previous fit where the solver allows it. Returns one score dict per point.
+    """
+    clf = clone(clf)
+    if clf.get_params().get("solver") in WARM_START_SOLVERS:
+        clf.set_params(warm_start=True)
+    scores = []
+    for params in path:
+        clf.set_params(**params)
+        clf.fit(X_train, y_train)
+        pred = clf.predict(X_val)
+        scores.append({name: float(score(y_val, pred)) for name, score in SCORERS.items()})
+    return scores
+
+
+def sweep_classifier(cache, y, folds, clf, param_grid, path_param="C", refit="f1", n_jobs=None):
+    """
+    Cross-validated sweep over classifier parameters on cached fold features.
+
+    Grid points that differ only in path_param form a regularization path,
+    fitted in increasing order (strongest regularization first) so warm
+    starts help. Returns (best_params, results) where results has the mean
+    score per metric for every grid point, in ParameterGrid order.
+    """
+    grid = list(ParameterGrid(param_grid))
+    paths = {}
+    for i, params in enumerate(grid):
+        rest = tuple(sorted((k, repr(v)) for k, v in params.items() if k != path_param))
+        paths.setdefault(rest, []).append(i)
+    for members in paths.values():
+        members.sort(key=lambda i: grid[i].get(path_param, 0))
+
+    fold_features = [cache.split(train_idx, val_idx)[1:] for train_idx, val_idx in folds]
+    tasks = [(f, members) for f in range(len(folds)) for members in paths.values()]
+    outputs = joblib.Parallel(n_jobs=n_jobs)(
+        joblib.delayed(_fit_path)(
+            clf, [grid[i] for i in members],
+            fold_features[f][0], y[folds[f][0]], fold_features[f][1], y[folds[f][1]],
+        )
+        for f, members in tasks
+    )
+
+    per_point = [[] for _ in grid]
+    for (f, members), scores in zip(tasks, outputs):
+        for i, score in zip(members, scores):
+            per_point[i].append(score)
+    results = [
+        {"params": params, **{name: float(np.mean([s[name] for s in per_point[i]])) for name in SCORERS}}
+        for i, params in enumerate(grid)
+    ]
+    best = max(range(len(grid)), key=lambda i: (results[i][refit], -i))
+    return grid[best], results
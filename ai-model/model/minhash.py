@@ -0,0 +1,376 @@
+"""
+MinHash signatures and an LSH index over character shingles of canonical urls.
+
+Near-identical urls, for example phishing kits that differ only in a random
+path segment or query value, share most of their 5-character shingles. The
+MinHash of a url is, for each of num_perm hash functions, the smallest hash
+of any of its shingles. The share of equal positions in two signatures
+estimates the Jaccard similarity of their shingle sets. The signature is
+split into `bands` bands of num_perm / bands rows. Urls whose signatures
+agree on a whole band land in the same bucket, so candidates are found by
+lookups rather than by comparing against every url. Candidates are then
+checked against the similarity threshold.
+
+Everything is vectorized with numpy:
+- shingles are hashed with a rolling polynomial over the concatenated url
+  bytes, and the per-url minima come from reduceat;
+- buckets are kept as one sorted key array per band, so a query is a binary
+  search and grouping a dataset is a sort.
+
+Both scale to millions of urls.
+
+- near_duplicate_groups(urls) labels each url with its near-duplicate group
+  (connected components of similar pairs); train.py splits on these groups.
+- MinHashIndex is the persistent index of known-bad urls that the API
+  queries for a "similar to known-bad" signal. It is a directory of .npy
+  files that are loaded memory-mapped:
+
+    meta.json         format version, num_perm, bands, shingle size, seed, threshold
+    signatures.npy    (n, num_perm) uint32
+    band_keys.npy     (bands, n) uint64, each row sorted
+    band_ids.npy      (bands, n) uint32, url id for each key
+    labels.npy        (n,) int8
+    urls.bin          utf-8 urls, back to back
+    url_offsets.npy   (n + 1,) int64 offsets into urls.bin
+
+Usage: python -m model.minhash build [--csv data/urls_and_labels.csv] [--out model/url_minhash] [--all-labels]
+       python -m model.minhash groups [--csv data/urls_and_labels.csv] [--threshold 0.6]
+       python -m model.minhash query [--index model/url_minhash] <url> [url ...]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from functools import lru_cache
+from pathlib import Path
+from urllib.parse import urlsplit
+
+import numpy as np
+
+FORMAT_VERSION = 1
+INDEX_DIR = Path(__file__).resolve().parent / "url_minhash"
+NUM_PERM = 64
+BANDS = 16
+SHINGLE = 5
+SEED = 1
+# Estimated Jaccard similarity from which two urls count as near-duplicates
+THRESHOLD = float(os.getenv("NEAR_DUP_THRESHOLD", "0.6"))
+# Urls hashed per vectorized step
+CHUNK = 20000
+# Candidates verified per query and band; bounds the cost of very hot buckets
+MAX_BUCKET_CANDIDATES = 64
+
+_MIX = np.uint64(0x9E3779B97F4A7C15)
+_BASE = np.uint64(1099511628211)
+DEFAULT_PORTS = {"http": "80", "https": "443"}
+
+
+def canonical_url(url):
+    """
+    Form of a url that is shingled: scheme, "www.", default ports, the fragment
+    and a trailing slash are dropped and the host is lowercased, so spellings
+    of the same address hash alike.
+    """
+    url = str(url).strip()
+    if "://" not in url:
+        url = "http://" + url
+    try:
+        parts = urlsplit(url)
+        host = (parts.hostname or "").rstrip(".")
+        port = parts.port
+    except ValueError:
+        return url.lower()
+    if host.startswith("www."):
+        host = host[4:]
+    if port is not None and str(port) != DEFAULT_PORTS.get(parts.scheme.lower()):
+        host = f"{host}:{port}"
+    rest = parts.path.rstrip("/") + (f"?{parts.query}" if parts.query else "")
+    return host + rest
+
+
+@lru_cache(maxsize=8)
+def _permutations(num_perm, seed):
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, 1 << 63, size=num_perm, dtype=np.uint64) | np.uint64(1)
+    b = rng.integers(0, 1 << 63, size=num_perm, dtype=np.uint64)
+    return a, b
+
+
+def _shingle_hashes(urls, k):
+    """(64-bit hash per shingle, start index of each url's shingles) for canonical urls."""
+    encoded = [u.encode("utf-8").ljust(k) for u in urls]
+    lengths = np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded))
+    buf = np.frombuffer(b"".join(encoded), dtype=np.uint8).astype(np.uint64)
+    n_windows = len(buf) - k + 1
+    h = np.zeros(n_windows, dtype=np.uint64)
+    for j in range(k):
+        h = h * _BASE + buf[j:j + n_windows]
+    # Keep only windows that lie inside one url
+    counts = lengths - k + 1
+    url_starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    starts = np.repeat(url_starts - np.concatenate(([0], np.cumsum(counts)[:-1])), counts)
+    windows = starts + np.arange(counts.sum())
+    segments = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    return h[windows] * _MIX, segments
+
+
+def signatures(urls, num_perm=NUM_PERM, shingle=SHINGLE, seed=SEED, canonical=True):
+    """(len(urls), num_perm) uint32 MinHash signatures."""
+    urls = [canonical_url(u) if canonical else str(u) for u in urls]
+    a, b = _permutations(num_perm, seed)
+    out = np.empty((len(urls), num_perm), dtype=np.uint32)
+    with np.errstate(over="ignore"):
+        for lo in range(0, len(urls), CHUNK):
+            hashes, segments = _shingle_hashes(urls[lo:lo + CHUNK], shingle)
+            x = hashes >> np.uint64(32)
+            # As many permutations at once as fit in ~4M intermediate values
+            step = max(1, min(num_perm, (1 << 22) // len(x)))
+            for p in range(0, num_perm, step):
+                values = (a[p:p + step, None] * x + b[p:p + step, None]) >> np.uint64(32)
+                out[lo:lo + len(segments), p:p + step] = np.minimum.reduceat(values, segments, axis=1).T
+    return out
+
+
+def band_keys(sigs, bands=BANDS):
+    """(bands, n) uint64 bucket key of each band of each signature."""
+    n, num_perm = sigs.shape
+    if num_perm % bands:
+        raise ValueError(f"num_perm {num_perm} is not a multiple of bands {bands}")
+    rows = num_perm // bands
+    banded = np.asarray(sigs).reshape(n, bands, rows).astype(np.uint64)
+    with np.errstate(over="ignore"):
+        keys = np.broadcast_to(np.arange(bands, dtype=np.uint64), (n, bands))
+        for row in range(rows):
+            keys = keys * _BASE + banded[:, :, row]
+        return np.ascontiguousarray((keys * _MIX).T)
+
+
+def similarity(sigs_a, sigs_b):
+    """Estimated Jaccard similarity, row by row."""
+    return (np.asarray(sigs_a) == np.asarray(sigs_b)).mean(axis=-1)
+
+
+def near_duplicate_groups(urls, threshold=THRESHOLD, num_perm=NUM_PERM, bands=BANDS):
+    """
+    Group id per url: urls linked by a chain of near-duplicate pairs
+    (estimated similarity >= threshold) share a group.
+
+    Within each LSH bucket every member is compared with the bucket's first
+    member only, which keeps grouping linear in the number of urls even for
+    huge buckets.
+    """
+    from scipy.sparse import coo_matrix
+    from scipy.sparse.csgraph import connected_components
+
+    sigs = signatures(urls, num_perm)
+    n = len(sigs)
+    if n == 0:
+        return np.zeros(0, dtype=np.int64)
+    src, dst = [], []
+    for keys in band_keys(sigs, bands):
+        order = np.argsort(keys, kind="stable")
+        sorted_keys = keys[order]
+        run_start = np.concatenate(([True], sorted_keys[1:] != sorted_keys[:-1]))
+        leader = order[np.maximum.accumulate(np.where(run_start, np.arange(n), 0))]
+        linked = (leader != order) & (similarity(sigs[order], sigs[leader]) >= threshold)
+        src.append(order[linked])
+        dst.append(leader[linked])
+    src, dst = np.concatenate(src), np.concatenate(dst)
+    graph = coo_matrix((np.ones(len(src), dtype=np.int8), (src, dst)), shape=(n, n))
+    return connected_components(graph, directed=False)[1]
+
+
+class MinHashIndex:
+    """Persistent LSH index of urls (with labels) supporting near-duplicate queries."""
+
+    def __init__(self, sigs, keys, ids, labels, url_bytes, url_offsets, meta):
+        # Plain ndarray views of memory-mapped files: np.memmap slicing is slow
+        self.signatures = np.asarray(sigs)
+        self.keys = np.asarray(keys)
+        self.ids = np.asarray(ids)
+        self.labels = np.asarray(labels)
+        self._url_bytes = np.asarray(url_bytes)
+        self._url_offsets = np.asarray(url_offsets)
+        self.meta = meta
+        self.num_perm = meta["num_perm"]
+        self.bands = meta["bands"]
+        self.threshold = meta["threshold"]
+        self.version = meta.get("version")
+
+    def __len__(self):
+        return len(self.labels)
+
+    @classmethod
+    def build(cls, urls, labels, num_perm=NUM_PERM, bands=BANDS, threshold=THRESHOLD, seed=SEED):
+        urls = [str(u) for u in urls]
+        sigs = signatures(urls, num_perm, seed=seed)
+        all_keys = band_keys(sigs, bands)
+        order = np.argsort(all_keys, axis=1, kind="stable")
+        keys = np.take_along_axis(all_keys, order, axis=1)
+        encoded = [u.encode("utf-8") for u in urls]
+        offsets = np.concatenate(([0], np.cumsum([len(e) for e in encoded]))).astype(np.int64)
+        meta = {
+            "format_version": FORMAT_VERSION,
+            "num_perm": num_perm,
+            "bands": bands,
+            "shingle": SHINGLE,
+            "seed": seed,
+            "threshold": threshold,
+            "n": len(urls),
+            "version": f"{int(time.time()):x}-{len(urls)}",
+        }
+        return cls(sigs, keys, order.astype(np.uint32), np.asarray(labels, dtype=np.int8),
+                   np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets, meta)
+
+    def save(self, out_dir=INDEX_DIR):
+        """Writes the index files; meta.json last, so readers keyed on it never see a partial index."""
+        out_dir = Path(out_dir)
+        out_dir.mkdir(parents=True, exist_ok=True)
+        np.save(out_dir / "signatures.npy", self.signatures)
+        np.save(out_dir / "band_keys.npy", self.keys)
+        np.save(out_dir / "band_ids.npy", self.ids)
+        np.save(out_dir / "labels.npy", self.labels)
+        np.save(out_dir / "url_offsets.npy", self._url_offsets)
+        (out_dir / "urls.bin").write_bytes(np.asarray(self._url_bytes).tobytes())
+        tmp = out_dir / ".meta.json.tmp"
+        tmp.write_text(json.dumps(self.meta, indent=2))
+        os.replace(tmp, out_dir / "meta.json")
+        return out_dir
+
+    @classmethod
+    def load(cls, path=INDEX_DIR, mmap=True):
+        path = Path(path)
+        mode = "r" if mmap else None
+        with open(path / "meta.json") as f:
+            meta = json.load(f)
+        if meta["format_version"] != FORMAT_VERSION:
+            raise ValueError(f"Unsupported MinHash index format {meta['format_version']}")
+        if meta["shingle"] != SHINGLE:
+            raise ValueError(f"Index was built with {meta['shingle']}-character shingles")
+        url_bytes = (np.memmap(path / "urls.bin", dtype=np.uint8, mode="r")
+                     if mmap and meta["n"] else np.fromfile(path / "urls.bin", dtype=np.uint8))
+        return cls(
+            np.load(path / "signatures.npy", mmap_mode=mode),
+            np.load(path / "band_keys.npy", mmap_mode=mode),
+            np.load(path / "band_ids.npy", mmap_mode=mode),
+            np.load(path / "labels.npy", mmap_mode=mode),
+            url_bytes,
+            np.load(path / "url_offsets.npy", mmap_mode=mode),
+            meta,
+        )
+
+    def url(self, i):
+        lo, hi = self._url_offsets[i], self._url_offsets[i + 1]
+        return bytes(self._url_bytes[lo:hi]).decode("utf-8")
+
+    def query(self, urls, threshold=None, label=None):
+        """
+        Best match per url: (index id, estimated similarity) of the most
+        similar indexed url at or above threshold (restricted to label if
+        given), else None.
+        """
+        threshold = self.threshold if threshold is None else threshold
+        if not len(self) or not len(urls):
+            return [None] * len(urls)
+        sigs = signatures(urls, self.num_perm, seed=self.meta["seed"])
+        query_keys = band_keys(sigs, self.bands)
+        bounds = [(np.searchsorted(self.keys[band], query_keys[band], side="left"),
+                   np.searchsorted(self.keys[band], query_keys[band], side="right"))
+                  for band in range(self.bands)]
+        results = []
+        for q in range(len(urls)):
+            candidates = [
+                self.ids[band, lo[q]:min(hi[q], lo[q] + MAX_BUCKET_CANDIDATES)]
+                for band, (lo, hi) in enumerate(bounds) if hi[q] > lo[q]
+            ]
+            if not candidates:
+                results.append(None)
+                continue
+            ids = np.unique(np.concatenate(candidates)).astype(np.int64)
+            if label is not None:
+                ids = ids[self.labels[ids] == label]
+            if not len(ids):
+                results.append(None)
+                continue
+            sims = similarity(self.signatures[ids], sigs[q])
+            best = int(np.argmax(sims))
+            results.append((int(ids[best]), float(sims[best])) if sims[best] >= threshold else None)
+        return results
+
+    def stats(self) -> dict:
+        return {
+            "version": self.version,
+            "urls": len(self),
+            "malicious": int((np.asarray(self.labels) == 1).sum()),
+            "num_perm": self.num_perm,
+            "bands": self.bands,
+            "threshold": self.threshold,
+        }
+
+
+def _read_dataset(csv_path):
+    import pandas as pd
+    from model.report_export import read_reports_dataset, REPORTS_DATASET
+
+    df = pd.read_csv(csv_path, on_bad_lines="skip")
+    try:
+        reports = read_reports_dataset(REPORTS_DATASET)
+    except ImportError:
+        reports = None
+    if reports is not None:
+        df = pd.concat([df, reports], ignore_index=True)
+    df = df.dropna(subset=["url", "label"])
+    return df["url"].astype(str).values, df["label"].astype(int).values
+
+
+def main():
+    from model.domain_index import CSV_FILE
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="Index the malicious urls of the dataset and exported reports")
+    build.add_argument("--csv", default=str(CSV_FILE))
+    build.add_argument("--out", default=str(INDEX_DIR))
+    build.add_argument("--all-labels", action="store_true", help="Index benign urls too")
+    build.add_argument("--threshold", type=float, default=THRESHOLD)
+    groups = sub.add_parser("groups", help="Near-duplicate group statistics of the dataset")
+    groups.add_argument("--csv", default=str(CSV_FILE))
+    groups.add_argument("--threshold", type=float, default=THRESHOLD)
+    query = sub.add_parser("query")
+    query.add_argument("--index", default=str(INDEX_DIR))
+    query.add_argument("urls", nargs="+")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        urls, labels = _read_dataset(args.csv)
+        if not args.all_labels:
+            urls, labels = urls[labels == 1], labels[labels == 1]
+        start = time.perf_counter()
+        index = MinHashIndex.build(urls, labels, threshold=args.threshold)
+        index.save(args.out)
+        size = sum(p.stat().st_size for p in Path(args.out).iterdir())
+        print(f"Indexed {len(index)} urls in {time.perf_counter() - start:.2f}s to {args.out} ({size} bytes)")
+    elif args.command == "groups":
+        urls, labels = _read_dataset(args.csv)
+        start = time.perf_counter()
+        group = near_duplicate_groups(urls, args.threshold)
+        sizes = np.bincount(group)
+        mixed = sum(len(set(labels[group == g])) > 1 for g in np.flatnonzero(sizes > 1))
+        print(f"{len(urls)} urls -> {len(sizes)} near-duplicate groups in {time.perf_counter() - start:.2f}s; "
+              f"{int((sizes > 1).sum())} groups with more than one url (largest {sizes.max()}), {mixed} mixed-label")
+        for g in np.argsort(-sizes)[:5]:
+            print(f"  {sizes[g]:5d}  {urls[np.flatnonzero(group == g)[0]]}")
+    else:
+        index = MinHashIndex.load(args.index)
+        for url, match in zip(args.urls, index.query(args.urls)):
+            if match is None:
+                print(f"{url} -> no near-duplicate")
+            else:
+                i, sim = match
+                print(f"{url} -> {index.url(i)} (similarity {sim:.2f}, label {index.labels[i]})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
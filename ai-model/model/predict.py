@@ -3,6 +3,8 @@ from pathlib import Path
 import pandas as pd
 import numpy as np
 import joblib
+from scipy.special import expit
+from sklearn.linear_model import LogisticRegression
 
 # Add project root to path
 ROOT_DIR = Path(__file__).resolve().parent.parent
@@ -11,49 +13,105 @@ sys.path.insert(0, str(ROOT_DIR))
 # Import from the same utils module used in training
 from model.utils import get_url_values, numeric_features, COMMON_TLDS
 
+# Chunked, optionally parallel scoring of url files (see model/batch_score.py):
+#   python model/predict.py --batch [--input FILE|-] [--output FILE|-] [--workers N]
+if __name__ == "__main__" and len(sys.argv) > 1 and sys.argv[1] == "--batch":
+    from model.batch_score import main as batch_score
+    sys.exit(batch_score(sys.argv[2:]))
+
 MODEL_FILE = Path(__file__).resolve().parent / 'url_pipeline.joblib'
 
+class LoadedModel:
+    """
+    Fitted pipeline split into feature steps and final classifier,
+    resolved once at load time so each prediction transforms features once.
+    """
+
+    def __init__(self, pipeline):
+        self.pipeline = pipeline
+        self.features = pipeline[:-1]
+        self.clf = pipeline.steps[-1][1]
+        self.classes = self.clf.classes_
+        # For binary one-vs-rest logistic regression predict() thresholds the
+        # decision function at 0 and predict_proba() is its sigmoid
+        self.binary_logistic = (
+            isinstance(self.clf, LogisticRegression)
+            and len(self.classes) == 2
+            and getattr(self.clf, 'multi_class', 'auto') != 'multinomial'
+        )
+
+    def score(self, urls):
+        """
+        Returns (predicted classes, malicious-class probabilities or None)
+        for a list of urls.
+        """
+        X = self.features.transform(pd.DataFrame({'url': urls}))
+        clf = self.clf
+
+        if self.binary_logistic:
+            dfv = clf.decision_function(X)
+            return self.classes[(dfv > 0).astype(int)], expit(dfv)
+        if hasattr(clf, 'predict_proba'):
+            proba = clf.predict_proba(X)
+            return self.classes[proba.argmax(axis=1)], proba[:, 1]
+        return clf.predict(X), None
+
 # Load model once at module level
 if MODEL_FILE.exists():
     try:
         pipeline = joblib.load(MODEL_FILE)
+        model = LoadedModel(pipeline)
         print("Model loaded successfully")
     except Exception as e:
         print(f"Error loading model: {e}")
         pipeline = None
+        model = None
 else:
     pipeline = None
+    model = None
     print(f"WARNING: Model file not found at {MODEL_FILE}")
 
 def predict_single(url):
-    if pipeline is None:
+    if model is None:
         raise RuntimeError("Model not loaded. Please train the model first.")
-    
-    # Create DataFrame with the same structure used in training
-    df = pd.DataFrame({'url': [url]})
-    
+
     try:
-        pred = pipeline.predict(df)
-        prob = None
-        
-        # Get probability scores if available
-        if hasattr(pipeline, 'predict_proba'):
-            prob = pipeline.predict_proba(df)[0][1]
-        else:
-            # Fallback for models without predict_proba
-            clf = pipeline.named_steps.get('clf')
-            if clf and hasattr(clf, 'predict_proba'):
-                prob = clf.predict_proba(df)[0][1]
-        
-        label = "malicious" if pred[0] == 1 else "benign"
-        return label, prob
-        
+        preds, probs = model.score([url])
+        label = "malicious" if preds[0] == 1 else "benign"
+        return label, (probs[0] if probs is not None else None)
+
     except Exception as e:
         raise RuntimeError(f"Prediction failed: {str(e)}")
 
+def predict_batch(urls):
+    """
+    Score many URLs with a single pass through the model.
+    Returns a list of (label, probability) tuples in input order.
+    """
+    if model is None:
+        raise RuntimeError("Model not loaded. Please train the model first.")
+
+    urls = [str(u) for u in urls]
+    if not urls:
+        return []
+
+    try:
+        preds, probs = model.score(urls)
+    except Exception as e:
+        raise RuntimeError(f"Batch prediction failed: {str(e)}")
+
+    if probs is None:
+        probs = [None] * len(urls)
+
+    return [
+        ("malicious" if pred == 1 else "benign", prob)
+        for pred, prob in zip(preds, probs)
+    ]
+
 if __name__ == '__main__':
     if len(sys.argv) < 2:
         print("Usage: python model/predict.py <url1> [url2] ...")
+        print("       python model/predict.py --batch [--input FILE|-] [--output FILE|-] [--workers N]")
         sys.exit(0)
     for u in sys.argv[1:]:
         try:
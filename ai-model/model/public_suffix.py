@@ -0,0 +1,149 @@
+"""
+Offline public-suffix parsing for url hosts.
+
+The bundled public_suffix_list.dat snapshot (ICANN section only, matching
+tldextract's default of ignoring private domains) is compiled into a
+reversed-label trie once at import. extract() splits a url's host into
+subdomain, domain and suffix with the same rules as tldextract.extract(),
+including wildcard and exception rules, punycode labels and bare IPv4/IPv6
+hosts, but never touches the network or a disk cache.
+
+To update the snapshot, replace public_suffix_list.dat with a newer copy of
+https://publicsuffix.org/list/public_suffix_list.dat and re-run
+benchmarks/bench_suffix.py to confirm parity.
+"""
+import re
+from collections import namedtuple
+from ipaddress import AddressValueError, IPv6Address
+from pathlib import Path
+from urllib.parse import scheme_chars
+
+SUFFIX_LIST_FILE = Path(__file__).resolve().parent / 'public_suffix_list.dat'
+_PRIVATE_SEPARATOR = "// ===BEGIN PRIVATE DOMAINS==="
+_RULE_RE = re.compile(r"^(?P<suffix>[.*!]*\w[\S]*)", re.UNICODE | re.MULTILINE)
+_VERSION_RE = re.compile(r"^// VERSION: (\S+)", re.MULTILINE)
+_IPV4_RE = re.compile(
+    r"^(?:(?:[0-9]|[1-9][0-9]|1[0-9]{2}|2[0-4][0-9]|25[0-5])\.)"
+    r"{3}(?:[0-9]|[1-9][0-9]|1[0-9]{2}|2[0-4][0-9]|25[0-5])$",
+    re.ASCII,
+)
+_SCHEME_CHARS = set(scheme_chars)
+_ROOT_LABEL_DOTS = ".。．｡"
+
+HostParts = namedtuple('HostParts', ['subdomain', 'domain', 'suffix'])
+
+
+class _Node:
+    __slots__ = ('children', 'end')
+
+    def __init__(self):
+        self.children = {}
+        self.end = False
+
+
+def _compile(text):
+    """Reversed-label trie over the ICANN rules of a suffix list."""
+    public_text = text.partition(_PRIVATE_SEPARATOR)[0]
+    root = _Node()
+    for match in _RULE_RE.finditer(public_text):
+        node = root
+        for label in reversed(match.group('suffix').split('.')):
+            child = node.children.get(label)
+            if child is None:
+                child = node.children[label] = _Node()
+            node = child
+        node.end = True
+    return root
+
+
+def _load(path=SUFFIX_LIST_FILE):
+    text = Path(path).read_text(encoding='utf-8')
+    version = _VERSION_RE.search(text)
+    return _compile(text), version.group(1) if version else None
+
+
+_TRIE, SUFFIX_LIST_VERSION = _load()
+
+
+def _host(url):
+    """Case-preserving host of a url-like string (scheme optional)."""
+    start = url.find("//")
+    if start == 0:
+        url = url[2:]
+    elif start >= 2 and url[start - 1] == ":" and not set(url[:start - 1]) - _SCHEME_CHARS:
+        url = url[start + 2:]
+    authority = url.partition("/")[0].partition("?")[0].partition("#")[0]
+    host = authority.rpartition("@")[-1]
+    if host and host[0] == "[":
+        ipv6 = host.partition("]")
+        if ipv6[1] == "]":
+            return ipv6[0] + "]"
+    return host.partition(":")[0].strip().rstrip(_ROOT_LABEL_DOTS)
+
+
+def _decode(label):
+    """Unicode form of a lowercased punycode label, the label itself if invalid."""
+    try:
+        return label.encode('ascii').decode('idna')
+    except UnicodeError:
+        return label
+
+
+def _suffix_index(lowered):
+    """Index of the first suffix label of a lowercased label list, or None."""
+    node = _TRIE
+    suffix_idx = idx = len(lowered)
+    for label in reversed(lowered):
+        if label.startswith("xn--"):
+            label = _decode(label)
+        child = node.children.get(label)
+        if child is not None:
+            idx -= 1
+            node = child
+            if node.end:
+                suffix_idx = idx
+            continue
+        if "*" in node.children:
+            return idx if "!" + label in node.children else idx - 1
+        break
+    return suffix_idx if suffix_idx < len(lowered) else None
+
+
+def _is_ipv6(value):
+    try:
+        IPv6Address(value)
+    except AddressValueError:
+        return False
+    return True
+
+
+def extract_host(host):
+    """HostParts for a bare host name (no scheme, port or path)."""
+    host = host.replace("。", ".").replace("．", ".").replace("｡", ".")
+    if len(host) >= 4 and host[0] == "[" and host[-1] == "]" and _is_ipv6(host[1:-1]):
+        return HostParts("", host, "")
+
+    labels = host.split(".")
+    idx = _suffix_index(host.lower().split("."))
+    if idx is None:
+        if len(labels) == 4 and host[0].isdecimal() and _IPV4_RE.fullmatch(host):
+            return HostParts("", host, "")
+        return HostParts(".".join(labels[:-1]), labels[-1], "")
+    return HostParts(
+        ".".join(labels[:idx - 1]) if idx >= 2 else "",
+        labels[idx - 1] if idx > 0 else "",
+        ".".join(labels[idx:]),
+    )
+
+
+def extract(url):
+    """HostParts(subdomain, domain, suffix) for a url; same results as tldextract.extract()."""
+    return extract_host(_host(url))
+
+
+def registered_domain(url):
+    """domain.suffix of a url, or '' when it has no public suffix."""
+    parts = extract(url)
+    if not parts.domain or not parts.suffix:
+        return ""
+    return f"{parts.domain}.{parts.suffix}"
@@ -0,0 +1,193 @@
+"""
+Versioned model releases.
+
+A release is a directory under the releases root named after its version,
+a short hash over the content of its artifacts:
+
+    url_pipeline.joblib   fitted sklearn pipeline
+    url_scorer/           compiled scorer exported from it (optional)
+    url_fallback.json     numeric-features-only fallback model (optional)
+    manifest.json         version, trained_at, metrics, params, sha256 per file
+
+The root also holds two pointer files, each containing one version:
+CURRENT names the release served live and SHADOW an optional candidate
+that the backend scores a sample of traffic with. Releases are published
+and pointers replaced with atomic renames, so a running backend never sees
+a partial release.
+
+Usage: python -m model.releases [--root DIR] list
+       python -m model.releases [--root DIR] promote <version>
+       python -m model.releases [--root DIR] shadow <version>|--clear
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+from datetime import datetime, timezone
+from pathlib import Path
+
+# Published where the backend's model registry watches for them
+RELEASES_DIR = Path(os.getenv(
+    "MODEL_RELEASES_DIR", Path(__file__).resolve().parents[2] / "backend" / "app" / "model" / "releases"
+))
+PIPELINE_NAME = "url_pipeline.joblib"
+SCORER_NAME = "url_scorer"
+FALLBACK_NAME = "url_fallback.json"
+MANIFEST_NAME = "manifest.json"
+CURRENT, SHADOW = "CURRENT", "SHADOW"
+FORMAT_VERSION = 1
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def artifact_hashes(release_dir):
+    """sha256 of every artifact in a release, keyed by its relative path."""
+    release_dir = Path(release_dir)
+    return {
+        path.relative_to(release_dir).as_posix(): _sha256(path)
+        for path in sorted(release_dir.rglob("*"))
+        if path.is_file() and path.name != MANIFEST_NAME
+    }
+
+
+def release_version(hashes):
+    return hashlib.sha256(json.dumps(hashes, sort_keys=True).encode()).hexdigest()[:12]
+
+
+def _write_atomic(path, text):
+    path = Path(path)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}-")
+    with os.fdopen(fd, "w") as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def publish_release(pipeline_file, scorer_dir=None, metrics=None, params=None,
+                    root=RELEASES_DIR, promote=True, fallback_file=None):
+    """
+    Copies the artifacts into a new release directory, writes its manifest
+    and (if promote) points CURRENT at it. Returns the manifest.
+    """
+    root = Path(root)
+    root.mkdir(parents=True, exist_ok=True)
+    staging = Path(tempfile.mkdtemp(dir=root, prefix=".staging-"))
+    try:
+        shutil.copy2(pipeline_file, staging / PIPELINE_NAME)
+        if scorer_dir is not None and Path(scorer_dir).is_dir():
+            shutil.copytree(scorer_dir, staging / SCORER_NAME)
+        if fallback_file is not None and Path(fallback_file).is_file():
+            shutil.copy2(fallback_file, staging / FALLBACK_NAME)
+        hashes = artifact_hashes(staging)
+        manifest = {
+            "format_version": FORMAT_VERSION,
+            "version": release_version(hashes),
+            "trained_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "metrics": metrics or {},
+            "params": params or {},
+            "files": hashes,
+        }
+        (staging / MANIFEST_NAME).write_text(json.dumps(manifest, indent=2, default=str))
+        final = root / manifest["version"]
+        if final.exists():
+            # Identical artifacts were published before
+            shutil.rmtree(staging)
+            manifest = read_manifest(final)
+        else:
+            os.replace(staging, final)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    if promote:
+        set_pointer(CURRENT, manifest["version"], root)
+    return manifest
+
+
+def read_manifest(release_dir):
+    with open(Path(release_dir) / MANIFEST_NAME) as f:
+        return json.load(f)
+
+
+def verify_release(release_dir):
+    """Returns the manifest after checking every artifact against its recorded hash."""
+    manifest = read_manifest(release_dir)
+    if artifact_hashes(release_dir) != manifest["files"]:
+        raise ValueError(f"Release {release_dir} does not match its manifest")
+    return manifest
+
+
+def read_pointer(name, root=RELEASES_DIR):
+    """Version named by a pointer file, or None if it is unset."""
+    try:
+        return (Path(root) / name).read_text().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def set_pointer(name, version, root=RELEASES_DIR):
+    root = Path(root)
+    if not (root / version / MANIFEST_NAME).exists():
+        raise ValueError(f"Unknown release {version} in {root}")
+    _write_atomic(root / name, version + "\n")
+
+
+def clear_pointer(name, root=RELEASES_DIR):
+    try:
+        (Path(root) / name).unlink()
+    except FileNotFoundError:
+        pass
+
+
+def list_releases(root=RELEASES_DIR):
+    """Manifests of all releases, oldest first."""
+    root = Path(root)
+    if not root.is_dir():
+        return []
+    manifests = [read_manifest(d) for d in root.iterdir() if (d / MANIFEST_NAME).exists()]
+    return sorted(manifests, key=lambda m: m["trained_at"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--root", default=str(RELEASES_DIR))
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("list")
+    promote = sub.add_parser("promote")
+    promote.add_argument("version")
+    shadow = sub.add_parser("shadow")
+    shadow.add_argument("version", nargs="?")
+    shadow.add_argument("--clear", action="store_true")
+    args = parser.parse_args()
+
+    if args.command == "list":
+        current, candidate = read_pointer(CURRENT, args.root), read_pointer(SHADOW, args.root)
+        for m in list_releases(args.root):
+            marks = [n for n, v in ((CURRENT, current), (SHADOW, candidate)) if v == m["version"]]
+            metrics = " ".join(f"{k}={v:.4f}" for k, v in m["metrics"].items() if isinstance(v, float))
+            print(f"{m['version']}  {m['trained_at']}  {metrics}  {' '.join(marks)}")
+    elif args.command == "promote":
+        set_pointer(CURRENT, args.version, args.root)
+        print(f"CURRENT -> {args.version}")
+    elif args.command == "shadow":
+        if args.clear:
+            clear_pointer(SHADOW, args.root)
+            print("SHADOW cleared")
+        elif args.version:
+            set_pointer(SHADOW, args.version, args.root)
+            print(f"SHADOW -> {args.version}")
+        else:
+            parser.error("shadow needs a version or --clear")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
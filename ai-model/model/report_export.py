@@ -0,0 +1,216 @@
+"""
+Incremental export of user reports into the training data.
+
+Pulls reports with an id above the stored watermark from the reports
+database in id order, canonicalizes their urls, drops urls already present
+in the training CSV or in earlier exports, and appends the rest to a
+Parquet dataset partitioned by report day:
+
+    data/reports/day=2026-10-17/part-00000041-00000187.parquet
+    data/reports/_watermark.json      {"last_id": 187, ...}
+
+Each part file is written to a temp name and renamed, then the watermark
+is advanced, so an interrupted run re-exports at most the batch in flight
+(part names are derived from the id range, so the retry overwrites it).
+Reported urls are labelled 1 (malicious). train.py reads the dataset with
+column projection and memory mapping.
+
+Needs pyarrow; the database is Postgres (psycopg2) or a sqlite:///path
+stand-in with the backend's schema.
+
+Usage: python -m model.report_export [--db URL] [--out data/reports] [--batch-size 5000]
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+from collections import defaultdict
+from datetime import date, datetime, timezone
+from pathlib import Path
+from urllib import parse
+
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parent.parent
+CSV_FILE = ROOT / "data" / "urls_and_labels.csv"
+REPORTS_DATASET = ROOT / "data" / "reports"
+WATERMARK_NAME = "_watermark.json"
+REPORT_LABEL = 1
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+SELECT_SQL = """
+    SELECT id, url, severity, created_at FROM reports
+    WHERE id > {p} ORDER BY id LIMIT {p}
+"""
+
+
+def canonicalize_url(url):
+    """Same normalization as the backend's verdict cache keys."""
+    parts = parse.urlsplit(str(url).strip())
+    scheme = parts.scheme.lower()
+
+    userinfo, at, hostport = parts.netloc.rpartition("@")
+    host, colon, port = hostport.lower().rpartition(":")
+    if not colon or "]" in port:
+        host, port = hostport.lower(), ""
+    elif port.isdigit() and int(port) == DEFAULT_PORTS.get(scheme):
+        port = ""
+    netloc = f"{userinfo}{at}{host}{':' + port if port else ''}"
+
+    return parse.urlunsplit((scheme, netloc, parts.path or "/", parts.query, ""))
+
+
+def url_hash(canonical_url):
+    """Signed 64-bit hash of a canonical url, stored alongside it for dedup."""
+    digest = hashlib.blake2b(canonical_url.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "little", signed=True)
+
+
+def connect(url):
+    """(connection, placeholder) for a Postgres URL or sqlite:///path."""
+    if url.startswith("sqlite:///"):
+        import sqlite3
+        return sqlite3.connect(url[len("sqlite:///"):]), "?"
+    import psycopg2
+    return psycopg2.connect(url), "%s"
+
+
+def read_watermark(out_dir):
+    try:
+        with open(Path(out_dir) / WATERMARK_NAME) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"last_id": 0, "rows": 0}
+
+
+def write_watermark(out_dir, watermark):
+    path = Path(out_dir) / WATERMARK_NAME
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "w") as f:
+        json.dump(watermark, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def known_hashes(csv_file, out_dir, chunk_size=500000):
+    """Hashes of canonical urls already in the CSV or the exported dataset."""
+    seen = set()
+    if Path(csv_file).exists():
+        for chunk in pd.read_csv(csv_file, usecols=['url'], chunksize=chunk_size, on_bad_lines='skip'):
+            seen.update(url_hash(canonicalize_url(u)) for u in chunk['url'].dropna())
+    if any(Path(out_dir).glob("day=*/*.parquet")):
+        import pyarrow.parquet as pq
+        table = pq.read_table(out_dir, columns=['url_hash'], memory_map=True)
+        seen.update(table.column('url_hash').to_pylist())
+    return seen
+
+
+def _day(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()[:10]
+    return str(value)[:10]
+
+
+def write_partitions(rows, out_dir):
+    """Writes one part file per report day; returns the paths written."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    by_day = defaultdict(list)
+    for row in rows:
+        by_day[row["day"]].append(row)
+    written = []
+    for day, day_rows in sorted(by_day.items()):
+        table = pa.table({
+            "url": pa.array([r["url"] for r in day_rows], pa.string()),
+            "label": pa.array([REPORT_LABEL] * len(day_rows), pa.int8()),
+            "url_hash": pa.array([r["url_hash"] for r in day_rows], pa.int64()),
+            "report_id": pa.array([r["id"] for r in day_rows], pa.int64()),
+            "severity": pa.array([r["severity"] for r in day_rows], pa.string()),
+            "created_at": pa.array([str(r["created_at"]) for r in day_rows], pa.string()),
+        })
+        part_dir = Path(out_dir) / f"day={day}"
+        part_dir.mkdir(parents=True, exist_ok=True)
+        path = part_dir / f"part-{day_rows[0]['id']:08d}-{day_rows[-1]['id']:08d}.parquet"
+        # Dot-prefixed temp names are ignored by dataset readers
+        tmp = part_dir / f".{path.name}.tmp"
+        pq.write_table(table, tmp, compression="zstd")
+        os.replace(tmp, path)
+        written.append(path)
+    return written
+
+
+def export_reports(db_url, out_dir=REPORTS_DATASET, csv_file=CSV_FILE, batch_size=5000):
+    """Exports reports above the watermark; returns a summary dict."""
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    watermark = read_watermark(out_dir)
+    seen = known_hashes(csv_file, out_dir)
+
+    conn, placeholder = connect(db_url)
+    sql = SELECT_SQL.format(p=placeholder)
+    fetched = exported = duplicates = 0
+    files = []
+    try:
+        while True:
+            cur = conn.cursor()
+            cur.execute(sql, (watermark["last_id"], batch_size))
+            batch = cur.fetchall()
+            cur.close()
+            if not batch:
+                break
+            rows = []
+            for report_id, url, severity, created_at in batch:
+                canonical = canonicalize_url(url)
+                h = url_hash(canonical)
+                if h in seen:
+                    duplicates += 1
+                    continue
+                seen.add(h)
+                rows.append({"id": report_id, "url": canonical, "url_hash": h, "severity": severity,
+                             "created_at": created_at, "day": _day(created_at)})
+            if rows:
+                files += write_partitions(rows, out_dir)
+            fetched += len(batch)
+            exported += len(rows)
+            watermark = {
+                "last_id": batch[-1][0],
+                "rows": watermark.get("rows", 0) + len(rows),
+                "exported_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            }
+            write_watermark(out_dir, watermark)
+    finally:
+        conn.close()
+    return {"fetched": fetched, "exported": exported, "duplicates": duplicates,
+            "files": len(files), "watermark": watermark["last_id"]}
+
+
+def read_reports_dataset(path=REPORTS_DATASET, columns=("url", "label")):
+    """Exported reports as a DataFrame (only the given columns, memory-mapped), or None."""
+    if not any(Path(path).glob("day=*/*.parquet")):
+        return None
+    import pyarrow.parquet as pq
+    return pq.read_table(path, columns=list(columns), memory_map=True).to_pandas()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default=os.getenv("DATABASE_URL") or os.getenv("SUPABASE_DB_URL"),
+                        help="Postgres URL or sqlite:///path (default: DATABASE_URL / SUPABASE_DB_URL)")
+    parser.add_argument("--out", default=str(REPORTS_DATASET))
+    parser.add_argument("--csv", default=str(CSV_FILE), help="Existing training CSV to dedupe against")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    args = parser.parse_args()
+    if not args.db:
+        parser.error("No database given (--db, DATABASE_URL or SUPABASE_DB_URL)")
+
+    summary = export_reports(args.db, args.out, args.csv, args.batch_size)
+    print(f"Fetched {summary['fetched']} reports, exported {summary['exported']} new urls "
+          f"({summary['duplicates']} duplicates) to {summary['files']} part files; "
+          f"watermark now {summary['watermark']}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
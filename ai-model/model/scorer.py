@@ -0,0 +1,229 @@
+"""
+Sklearn-free scorer for the TF-IDF + LogisticRegression url pipeline.
+
+At inference time the trained pipeline is a char n-gram vocabulary lookup,
+an idf-weighted and L2-normalised dot product with the classifier weights,
+plus a linear term over numeric_features and a sigmoid. export_scorer()
+flattens a fitted pipeline into plain .npy arrays that CompiledScorer loads
+memory-mapped, so workers need neither joblib nor pandas/sklearn.
+
+Artifact layout (one directory):
+    terms.npy          sorted vocabulary (fixed-width unicode)
+    idf.npy            idf per term, same order as terms
+    weight.npy         idf * coef per term, same order as terms
+    numeric_coef.npy   coef for the numeric_features columns
+    meta.json          intercept, classes, ngram_range, format version
+
+export_fallback() / FallbackScorer do the same for the numeric-features-only
+model train.py fits next to the full one (a single url_fallback.json). It
+needs no vocabulary lookup, so the API can answer with it inline when the
+full model is over its latency budget.
+"""
+import json
+import re
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+from model.utils import numeric_features
+
+FORMAT_VERSION = 1
+SCORER_DIR = Path(__file__).resolve().parent / 'url_scorer'
+FALLBACK_FILE = Path(__file__).resolve().parent / 'url_fallback.json'
+
+_WHITE_SPACES = re.compile(r"\s\s+")
+
+
+def _tfidf_step(pipeline):
+    union = pipeline.named_steps['features']
+    for name, transformer in union.transformer_list:
+        if name == 'tfidf':
+            return transformer.named_steps['tfidf']
+    raise ValueError("Pipeline has no 'tfidf' feature branch")
+
+
+def export_scorer(pipeline, out_dir=SCORER_DIR):
+    """
+    Writes the compiled scorer artifact for a fitted pipeline.
+    Raises ValueError if the pipeline is not the char_wb TF-IDF + linear
+    model layout this scorer reproduces.
+    """
+    vec = _tfidf_step(pipeline)
+    clf = pipeline.steps[-1][1]
+
+    params = vec.get_params()
+    supported = (
+        params['analyzer'] == 'char_wb' and params['lowercase'] and params['norm'] == 'l2'
+        and params['use_idf'] and not params['sublinear_tf'] and not params['binary']
+        and params['preprocessor'] is None and params['strip_accents'] is None
+    )
+    if not supported:
+        raise ValueError(f"Unsupported TfidfVectorizer configuration: {params}")
+    if not hasattr(clf, 'coef_') or clf.coef_.shape[0] != 1:
+        raise ValueError("Final step must be a binary linear classifier")
+    if pipeline.named_steps['features'].transformer_weights:
+        raise ValueError("FeatureUnion transformer_weights are not supported")
+
+    vocab = vec.vocabulary_
+    n_terms = len(vocab)
+    terms = sorted(vocab)
+    order = np.array([vocab[t] for t in terms])
+    coef = clf.coef_[0]
+
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    np.save(out_dir / 'terms.npy', np.array(terms))
+    np.save(out_dir / 'idf.npy', vec.idf_[order])
+    np.save(out_dir / 'weight.npy', vec.idf_[order] * coef[:n_terms][order])
+    np.save(out_dir / 'numeric_coef.npy', coef[n_terms:])
+
+    meta = {
+        'format_version': FORMAT_VERSION,
+        'intercept': float(clf.intercept_[0]),
+        'classes': [int(c) for c in clf.classes_],
+        'ngram_range': list(params['ngram_range']),
+        'n_terms': n_terms,
+        'n_numeric': int(len(coef) - n_terms),
+    }
+    with open(out_dir / 'meta.json', 'w') as f:
+        json.dump(meta, f, indent=2)
+    return out_dir
+
+
+class CompiledScorer:
+    """Scores urls from an export_scorer() artifact using only numpy."""
+
+    def __init__(self, path=SCORER_DIR, mmap=True):
+        path = Path(path)
+        mode = 'r' if mmap else None
+        with open(path / 'meta.json') as f:
+            meta = json.load(f)
+        if meta['format_version'] != FORMAT_VERSION:
+            raise ValueError(f"Unsupported scorer format {meta['format_version']}")
+
+        self.path = path
+        self.version = None
+        self.terms = np.load(path / 'terms.npy', mmap_mode=mode)
+        self.idf = np.load(path / 'idf.npy', mmap_mode=mode)
+        self.weight = np.load(path / 'weight.npy', mmap_mode=mode)
+        self.numeric_coef = np.load(path / 'numeric_coef.npy', mmap_mode=mode)
+        self.intercept = meta['intercept']
+        self.classes = np.array(meta['classes'])
+        self.min_n, self.max_n = meta['ngram_range']
+
+    def _ngrams(self, text):
+        """Same tokenisation as TfidfVectorizer(analyzer='char_wb', lowercase=True)."""
+        text = _WHITE_SPACES.sub(" ", text.lower())
+        min_n, max_n = self.min_n, self.max_n
+        ngrams = []
+        for w in text.split():
+            w = " " + w + " "
+            w_len = len(w)
+            for n in range(min_n, max_n + 1):
+                if w_len <= n:
+                    # a short word is counted once, as itself
+                    ngrams.append(w)
+                    break
+                ngrams.extend(w[i:i + n] for i in range(w_len - n + 1))
+        return ngrams
+
+    def decision_function(self, urls, observe=None):
+        """observe, if given, is called as observe(stage, seconds, n_urls) per stage."""
+        urls = [str(u) for u in urls]
+        n = len(urls)
+        if n == 0:
+            return np.zeros(0)
+        if observe is not None:
+            start = time.perf_counter()
+
+        grams = [self._ngrams(u) for u in urls]
+        doc = np.repeat(np.arange(n), [len(g) for g in grams])
+        flat = np.array([g for gs in grams for g in gs], dtype=str)
+
+        # Vocabulary lookup: binary search in the sorted term table
+        idx = np.searchsorted(self.terms, flat)
+        idx[idx == len(self.terms)] = 0
+        known = self.terms[idx] == flat
+        doc, idx = doc[known], idx[known]
+
+        # Term frequencies per (document, term)
+        keys, tf = np.unique(doc * len(self.terms) + idx, return_counts=True)
+        doc, idx = keys // len(self.terms), keys % len(self.terms)
+
+        dot = np.bincount(doc, weights=tf * self.weight[idx], minlength=n)
+        norm = np.sqrt(np.bincount(doc, weights=(tf * self.idf[idx]) ** 2, minlength=n))
+        text_score = np.divide(dot, norm, out=np.zeros(n), where=norm > 0)
+        if observe is None:
+            return text_score + numeric_features(urls) @ self.numeric_coef + self.intercept
+
+        observe('tfidf', time.perf_counter() - start, n)
+        start = time.perf_counter()
+        numeric_score = numeric_features(urls) @ self.numeric_coef
+        observe('numeric', time.perf_counter() - start, n)
+        return text_score + numeric_score + self.intercept
+
+    def score(self, urls, observe=None):
+        """Returns (predicted classes, malicious-class probabilities) for a list of urls."""
+        dfv = self.decision_function(urls, observe)
+        return self.classes[(dfv > 0).astype(int)], 1 / (1 + np.exp(-dfv))
+
+
+def export_fallback(clf, path=FALLBACK_FILE, feature_names=None, metrics=None):
+    """Writes a binary linear classifier fitted on numeric_features() as JSON."""
+    if not hasattr(clf, 'coef_') or clf.coef_.shape[0] != 1:
+        raise ValueError("Fallback model must be a binary linear classifier")
+    data = {
+        'format_version': FORMAT_VERSION,
+        'intercept': float(clf.intercept_[0]),
+        'classes': [int(c) for c in clf.classes_],
+        'coef': [float(c) for c in clf.coef_[0]],
+        'feature_names': list(feature_names) if feature_names is not None else None,
+        'metrics': metrics or {},
+    }
+    path = Path(path)
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=2)
+    return path
+
+
+class FallbackScorer:
+    """Scores urls from an export_fallback() artifact: numeric_features() and one dot product."""
+
+    def __init__(self, path=FALLBACK_FILE):
+        with open(path) as f:
+            data = json.load(f)
+        if data['format_version'] != FORMAT_VERSION:
+            raise ValueError(f"Unsupported fallback format {data['format_version']}")
+        self.path = Path(path)
+        self.version = None
+        self.coef = np.array(data['coef'])
+        self.intercept = data['intercept']
+        self.classes = np.array(data['classes'])
+        self.metrics = data.get('metrics') or {}
+
+    def decision_function(self, urls):
+        urls = [str(u) for u in urls]
+        if not urls:
+            return np.zeros(0)
+        return numeric_features(urls) @ self.coef + self.intercept
+
+    def score(self, urls, observe=None):
+        """Returns (predicted classes, malicious-class probabilities) for a list of urls."""
+        n = len(urls)
+        if observe is not None:
+            start = time.perf_counter()
+        dfv = self.decision_function(urls)
+        if observe is not None:
+            observe('fallback', time.perf_counter() - start, n)
+        return self.classes[(dfv > 0).astype(int)], 1 / (1 + np.exp(-dfv))
+
+
+if __name__ == '__main__':
+    # Export the scorer for an existing pipeline: python -m model.scorer [model.joblib] [out_dir]
+    import joblib
+
+    model_file = Path(sys.argv[1]) if len(sys.argv) > 1 else Path(__file__).resolve().parent / 'url_pipeline.joblib'
+    out_dir = Path(sys.argv[2]) if len(sys.argv) > 2 else SCORER_DIR
+    print(f"Exported compiled scorer to {export_scorer(joblib.load(model_file), out_dir)}")
@@ -1,6 +1,7 @@
 import json
 import os
 import sys
+import time
 from pathlib import Path
 
 import joblib
@@ -9,7 +10,8 @@ import pandas as pd
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.linear_model import LogisticRegression
 from sklearn.metrics import classification_report, confusion_matrix, roc_auc_score
-from sklearn.model_selection import train_test_split, GridSearchCV
+from sklearn.base import clone
+from sklearn.model_selection import GroupKFold, ParameterGrid, StratifiedGroupKFold, train_test_split
 from sklearn.pipeline import FeatureUnion, Pipeline
 from sklearn.preprocessing import FunctionTransformer
 from sklearn.preprocessing import MinMaxScaler
@@ -20,13 +22,30 @@ if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
 
 # Import from shared utils
-from model.utils import get_url_values, numeric_features, NUMERIC_FEATURE_NAMES, COMMON_TLDS
+from model.utils import get_url_values, numeric_features, host_memo, NUMERIC_FEATURE_NAMES, COMMON_TLDS
+from model.scorer import CompiledScorer, FallbackScorer, export_scorer, export_fallback, SCORER_DIR, FALLBACK_FILE
+from model.releases import publish_release, RELEASES_DIR
+from model.feature_cache import FeatureCache, sweep_classifier
+from model.report_export import read_reports_dataset, REPORTS_DATASET
+from model.minhash import MinHashIndex, near_duplicate_groups, INDEX_DIR as MINHASH_DIR, THRESHOLD as NEAR_DUP_THRESHOLD
+
+# Out-of-core mode for datasets that do not fit in memory (see model/train_stream.py):
+#   python model/train.py --stream [--chunk-size N] [--epochs N] [--resume]
+if __name__ == "__main__" and len(sys.argv) > 1 and sys.argv[1] == "--stream":
+    from model.train_stream import main as train_stream
+    sys.exit(train_stream(sys.argv[2:]))
 
 # ---------- Config ----------
 CSV_FILE = ROOT / "data" / "urls_and_labels.csv"
 MODEL_FILE = Path(__file__).resolve().parent / "url_pipeline.joblib"
 RANDOM_STATE = 42
 TEST_SIZE = 0.15
+CV_FOLDS = 3
+# saga is the baseline solver; TRAIN_SOLVER=liblinear converges in tens of
+# iterations here instead of stopping at max_iter (see README)
+SOLVER = os.getenv("TRAIN_SOLVER", "saga")
+# Set PROMOTE_RELEASE=0 to publish a release without making it CURRENT
+PROMOTE_RELEASE = os.getenv("PROMOTE_RELEASE", "1") != "0"
 # ----------------------------
 
 def validate_csv(filepath):
@@ -57,6 +76,17 @@ def validate_csv(filepath):
 
 print(f"Loading data from {CSV_FILE}...")
 df = validate_csv(CSV_FILE)
+
+# Reports exported by model/report_export.py (url, label columns only)
+try:
+    reports_df = read_reports_dataset(REPORTS_DATASET)
+except ImportError:
+    print(f"pyarrow is not installed; skipping exported reports in {REPORTS_DATASET}")
+    reports_df = None
+if reports_df is not None:
+    print(f"Adding {len(reports_df)} exported report urls from {REPORTS_DATASET}")
+    df = pd.concat([df, reports_df], ignore_index=True)
+
 df = df.dropna(subset=['url', 'label'])
 df['label'] = df['label'].astype(int)
 
@@ -70,68 +100,88 @@ num_feat = FunctionTransformer(func=numeric_features, validate=False)
 # Character n-gram TF-IDF
 char_vec = TfidfVectorizer(analyzer='char_wb', ngram_range=(3,5), max_features=20000)
 
-# Replace lambda functions with named functions in FeatureUnion
-union = FeatureUnion([
-    ('tfidf', Pipeline([
-        ('selector', FunctionTransformer(func=get_url_values, validate=False)),
-        ('tfidf', char_vec)
-    ])),
-    ('numeric', Pipeline([
-        ('selector', FunctionTransformer(func=get_url_values, validate=False)),
-        ('nums', num_feat)
-    ]))
-])
+def make_union(vectorizer):
+    # Replace lambda functions with named functions in FeatureUnion
+    return FeatureUnion([
+        ('tfidf', Pipeline([
+            ('selector', FunctionTransformer(func=get_url_values, validate=False)),
+            ('tfidf', vectorizer)
+        ])),
+        ('numeric', Pipeline([
+            ('selector', FunctionTransformer(func=get_url_values, validate=False)),
+            ('nums', num_feat)
+        ]))
+    ])
 
 X = df[['url']]
 y = df['label'].values
 
-# train/test split (guard: stratify requires multiple classes)
-if len(np.unique(y)) > 1:
-    X_train, X_test, y_train, y_test = train_test_split(
-        X, y, test_size=TEST_SIZE, random_state=RANDOM_STATE, stratify=y
-    )
+# Near-duplicate urls (same kit, random path or query) form one group, and
+# groups never straddle train/test or CV folds, so scores are not inflated
+# by variants of training urls
+rows = np.arange(len(df))
+start = time.perf_counter()
+groups = near_duplicate_groups(X['url'].values, NEAR_DUP_THRESHOLD)
+group_sizes = np.bincount(groups)
+print(f"Near-duplicate groups: {len(group_sizes)} for {len(df)} urls "
+      f"({int((group_sizes > 1).sum())} with duplicates, largest {group_sizes.max()}, "
+      f"threshold {NEAR_DUP_THRESHOLD}, {time.perf_counter() - start:.2f}s)")
+
+# Test fold of a (stratified, if possible) group k-fold sized like TEST_SIZE
+stratify = len(np.unique(y)) > 1 and np.bincount(y).min() >= round(1 / TEST_SIZE)
+if stratify:
+    splitter = StratifiedGroupKFold(n_splits=round(1 / TEST_SIZE), shuffle=True, random_state=RANDOM_STATE)
 else:
-    X_train, X_test, y_train, y_test = train_test_split(
-        X, y, test_size=TEST_SIZE, random_state=RANDOM_STATE
-    )
-
-pipeline = Pipeline([
-    ('features', union),
-    ('clf', LogisticRegression(
-        max_iter=2000,
-        solver='saga',
-        class_weight='balanced',  # Important for imbalanced malicious/benign data
-        random_state=RANDOM_STATE,
-        verbose=1
-    ))
-])
+    splitter = GroupKFold(n_splits=round(1 / TEST_SIZE))
+idx_train, idx_test = next(splitter.split(rows, y, groups))
+
+# How many test urls a plain row split would have leaked (a near-duplicate in train)
+row_train, row_test = train_test_split(rows, test_size=TEST_SIZE, random_state=RANDOM_STATE,
+                                       stratify=y if stratify else None)
+leaked = np.isin(groups[row_test], groups[row_train]).mean()
+print(f"Group-aware split: {len(idx_train)} train / {len(idx_test)} test urls "
+      f"(a row-wise split would put near-duplicates of training urls in {leaked:.1%} of the test set)")
+X_train, X_test = X.iloc[idx_train], X.iloc[idx_test]
+y_train, y_test = y[idx_train], y[idx_test]
+
+base_clf = LogisticRegression(
+    max_iter=2000,
+    solver=SOLVER,
+    class_weight='balanced',  # Important for imbalanced malicious/benign data
+    random_state=RANDOM_STATE,
+)
 
 # Expand parameter grid for better tuning
 param_grid = {
-    'clf__C': [0.01, 0.05, 0.1, 0.2, 1.0],
-    'clf__penalty': ['l1', 'l2']
+    'C': [0.01, 0.05, 0.1, 0.2, 1.0],
+    'penalty': ['l1', 'l2']
 }
 
-# Update GridSearchCV to use multiple metrics
-grid = GridSearchCV(
-    pipeline, 
-    param_grid, 
-    cv=3, 
-    scoring={
-        'f1': 'f1',
-        'precision': 'precision',
-        'recall': 'recall',
-        'accuracy': 'accuracy'
-    },
-    refit='f1',  # Still use f1 as primary metric
-    n_jobs=-1, 
-    verbose=1
-)
-print("Starting GridSearchCV ...")
-grid.fit(X_train, y_train)
+# Features are computed once per fold (and cached on disk); only the
+# classifier is refitted for each grid point, warm-started along C
+cache = FeatureCache(X['url'].values, char_vec)
+cv = StratifiedGroupKFold(n_splits=CV_FOLDS) if len(np.unique(y_train)) > 1 else GroupKFold(n_splits=CV_FOLDS)
+folds = [(idx_train[tr], idx_train[va]) for tr, va in cv.split(idx_train, y_train, groups[idx_train])]
+
+print(f"Sweeping {len(ParameterGrid(param_grid))} classifier settings x {CV_FOLDS} folds (solver={SOLVER}) ...")
+start = time.perf_counter()
+best_params, cv_results = sweep_classifier(cache, y, folds, base_clf, param_grid, refit='f1', n_jobs=-1)
+for r in cv_results:
+    print(f"  {r['params']}  f1 {r['f1']:.4f}  precision {r['precision']:.4f}  "
+          f"recall {r['recall']:.4f}  accuracy {r['accuracy']:.4f}")
+print(f"Sweep took {time.perf_counter() - start:.2f}s")
 
-best = grid.best_estimator_
-print("Best params:", grid.best_params_)
+# Refit on the full training set and assemble the usual fitted pipeline
+vectorizer, F_train, F_test = cache.split(idx_train, idx_test)
+best_clf = clone(base_clf).set_params(**best_params).fit(F_train, y_train)
+best = Pipeline([('features', make_union(vectorizer)), ('clf', best_clf)])
+best_params = {f'clf__{k}': v for k, v in best_params.items()}
+print("Best params:", best_params)
+
+# The assembled pipeline must score exactly like the classifier on cached features
+pipeline_diff = np.abs(best.decision_function(X_test) - best_clf.decision_function(F_test)).max()
+if pipeline_diff > 1e-9:
+    raise RuntimeError(f"Assembled pipeline diverges from cached features (max diff {pipeline_diff:.3e})")
 
 # Evaluate
 y_pred = best.predict(X_test)
@@ -147,6 +197,7 @@ elif hasattr(clf, "decision_function"):
 print("\nClassification report (test set):")
 print(classification_report(y_test, y_pred, digits=4))
 
+auc = None
 try:
     auc = roc_auc_score(y_test, y_proba)
     print(f"ROC AUC: {auc:.4f}")
@@ -155,11 +206,78 @@ except Exception:
 
 cm = confusion_matrix(y_test, y_pred)
 print("Confusion matrix:\n", cm)
+print("Host feature memo:", host_memo.stats())
 
 # Save the fitted pipeline
 joblib.dump(best, MODEL_FILE)
 print(f"Saved pipeline to {MODEL_FILE}")
 
+# Export the sklearn-free scorer and check parity with the full pipeline
+try:
+    export_scorer(best, SCORER_DIR)
+    compiled = CompiledScorer(SCORER_DIR)
+    compiled_dec = compiled.decision_function(X_test['url'])
+    pipeline_dec = best.decision_function(X_test)
+    max_diff = np.abs(compiled_dec - pipeline_dec).max() if len(X_test) else 0.0
+    label_agree = ((compiled_dec > 0) == (pipeline_dec > 0)).mean() if len(X_test) else 1.0
+    print(f"Saved compiled scorer to {SCORER_DIR}")
+    print(f"Compiled scorer parity: max |decision diff| {max_diff:.3e}, label agreement {label_agree:.4%}")
+    if max_diff > 1e-9:
+        print("WARNING: compiled scorer diverges from the pipeline; do not deploy it")
+except ValueError as e:
+    print(f"Skipping compiled scorer export: {e}")
+
+# Cheap fallback the API answers with when the full model is over its
+# latency budget: the same classifier on the numeric features alone
+n_terms = len(vectorizer.vocabulary_)
+fallback_clf = clone(base_clf).set_params(C=1.0, penalty='l2').fit(F_train[:, n_terms:], y_train)
+fallback_pred = fallback_clf.predict(F_test[:, n_terms:])
+fallback_report = classification_report(y_test, fallback_pred, output_dict=True, zero_division=0)
+fallback_metrics = {
+    "accuracy": float(fallback_report["accuracy"]),
+    "precision": float(fallback_report["1"]["precision"]) if "1" in fallback_report else None,
+    "recall": float(fallback_report["1"]["recall"]) if "1" in fallback_report else None,
+    "f1": float(fallback_report["1"]["f1-score"]) if "1" in fallback_report else None,
+    "agreement": float((fallback_pred == y_pred).mean()) if len(y_pred) else None,
+}
+try:
+    fallback_metrics["roc_auc"] = float(roc_auc_score(y_test, fallback_clf.decision_function(F_test[:, n_terms:])))
+except ValueError:
+    fallback_metrics["roc_auc"] = None
+export_fallback(fallback_clf, FALLBACK_FILE, NUMERIC_FEATURE_NAMES, fallback_metrics)
+fallback_diff = np.abs(FallbackScorer(FALLBACK_FILE).decision_function(X_test['url'])
+                       - fallback_clf.decision_function(F_test[:, n_terms:])).max() if len(X_test) else 0.0
+print(f"Saved fallback model to {FALLBACK_FILE}: "
+      + ", ".join(f"{k} {v:.4f}" for k, v in fallback_metrics.items() if v is not None)
+      + f" (max |decision diff| {fallback_diff:.3e})")
+
+# Near-duplicate index of the known-bad urls, queried by the API for its
+# "similar to known-bad" signal
+malicious = y == 1
+minhash_index = MinHashIndex.build(X['url'].values[malicious], y[malicious])
+minhash_index.save(MINHASH_DIR)
+print(f"Saved near-duplicate index of {len(minhash_index)} malicious urls to {MINHASH_DIR}")
+
+# Publish a versioned release (pipeline + compiled scorer + fallback + manifest)
+# that the backend picks up without a restart
+report = classification_report(y_test, y_pred, output_dict=True)
+metrics = {
+    "accuracy": float(report["accuracy"]),
+    "precision": float(report["1"]["precision"]) if "1" in report else None,
+    "recall": float(report["1"]["recall"]) if "1" in report else None,
+    "f1": float(report["1"]["f1-score"]) if "1" in report else None,
+    "roc_auc": float(auc) if auc is not None else None,
+    "n_train": int(len(X_train)),
+    "n_test": int(len(X_test)),
+    "fallback": fallback_metrics,
+}
+manifest = publish_release(
+    MODEL_FILE, SCORER_DIR, metrics=metrics, params=best_params,
+    root=RELEASES_DIR, promote=PROMOTE_RELEASE, fallback_file=FALLBACK_FILE,
+)
+print(f"Published release {manifest['version']} to {RELEASES_DIR}"
+      + (" (CURRENT)" if PROMOTE_RELEASE else ""))
+
 # --- Feature importance / interpretability ---
 # Build feature name list for TF-IDF + numeric features
 tfidf_vec = best.named_steps['features'].transformer_list[0][1].named_steps['tfidf']
@@ -0,0 +1,293 @@
+"""
+Out-of-core training for datasets that do not fit in memory.
+
+Reads the CSV in chunks and trains an SGD logistic regression with
+partial_fit on stateless features: hashed char_wb 3-5 grams (no vocabulary
+to fit) plus the usual numeric_features, max-abs scaled. Peak memory is
+one chunk plus the fixed-size weight vector, whatever the dataset size.
+
+Passes over the data:
+  1. stats: label counts (for balanced class weights) and the numeric
+     feature scaler, fitted with partial_fit;
+  2. --epochs training passes, shuffling within each chunk. The
+     numeric-features-only fallback model is trained alongside.
+Rows whose url hashes into the --test-percent bucket are held out from
+training and used for the final evaluation.
+
+A checkpoint is written atomically every --checkpoint-every chunks and at
+the end of each pass; --resume continues an interrupted run from it. The
+result is a regular fitted Pipeline saved where predict.py loads it (and
+published as a release like train.py does), with its fallback model
+written to url_fallback.json next to it. The compiled scorer needs a
+TF-IDF vocabulary, so it is not exported for streamed models; a url_scorer/
+left next to --out by an earlier train.py run is removed, since it would
+serve a different model than the pipeline.
+
+Usage: python model/train.py --stream [--csv PATH] [--chunk-size 20000] [--epochs 3]
+                                      [--n-features 1048576] [--resume]
+"""
+import argparse
+import copy
+import hashlib
+import os
+import shutil
+import sys
+import time
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.linear_model import SGDClassifier
+from sklearn.pipeline import FeatureUnion, Pipeline
+from sklearn.preprocessing import FunctionTransformer, MaxAbsScaler
+
+from model.utils import get_url_values, numeric_features, host_memo, NUMERIC_FEATURE_NAMES
+from model.releases import publish_release, RELEASES_DIR
+from model.scorer import FALLBACK_FILE, SCORER_DIR, export_fallback
+
+MODEL_DIR = Path(__file__).resolve().parent
+CSV_FILE = MODEL_DIR.parent / "data" / "urls_and_labels.csv"
+MODEL_FILE = MODEL_DIR / "url_pipeline.joblib"
+CHECKPOINT_FILE = MODEL_DIR / "stream_checkpoint.joblib"
+RANDOM_STATE = 42
+CLASSES = np.array([0, 1])
+
+
+def make_featurizer(n_features, scaler):
+    return FeatureUnion([
+        ('hashing', Pipeline([
+            ('selector', FunctionTransformer(func=get_url_values, validate=False)),
+            ('hashing', HashingVectorizer(analyzer='char_wb', ngram_range=(3, 5),
+                                          n_features=n_features, alternate_sign=False))
+        ])),
+        ('numeric', Pipeline([
+            ('selector', FunctionTransformer(func=get_url_values, validate=False)),
+            ('nums', FunctionTransformer(func=numeric_features, validate=False)),
+            ('scale', scaler)
+        ]))
+    ])
+
+
+def is_holdout(urls, test_percent):
+    """Deterministic per-url holdout membership, stable across passes and runs."""
+    return np.fromiter(
+        (int.from_bytes(hashlib.blake2b(u.encode(), digest_size=4).digest(), "little") % 100 < test_percent
+         for u in urls),
+        dtype=bool, count=len(urls),
+    )
+
+
+def read_chunks(csv, chunk_size):
+    """Cleaned (urls, labels) chunks; same row filtering as train.py."""
+    for chunk in pd.read_csv(csv, chunksize=chunk_size, on_bad_lines='skip', usecols=['url', 'label']):
+        chunk = chunk.dropna(subset=['url', 'label'])
+        labels = pd.to_numeric(chunk['label'], errors='coerce')
+        keep = labels.isin([0, 1]).values
+        yield chunk['url'].astype(str).values[keep], labels.values[keep].astype(int)
+
+
+def dump_atomic(obj, path):
+    """joblib.dump through a temp file, so an interrupted write never leaves a partial file."""
+    tmp = Path(str(path) + ".tmp")
+    joblib.dump(obj, tmp)
+    os.replace(tmp, path)
+
+
+def save_checkpoint(state, path):
+    dump_atomic(state, path)
+
+
+def new_state(args):
+    return {
+        "args": {k: getattr(args, k) for k in ("csv", "chunk_size", "n_features", "alpha", "test_percent")},
+        "pass": 0,          # 0 = stats pass, 1..epochs = training passes
+        "chunk": 0,         # chunks of the current pass already consumed
+        "counts": np.zeros(2, dtype=np.int64),
+        "scaler": MaxAbsScaler(),
+        "clf": SGDClassifier(loss='log_loss', alpha=args.alpha, random_state=RANDOM_STATE),
+        "fallback": SGDClassifier(loss='log_loss', alpha=args.alpha, random_state=RANDOM_STATE),
+        "rows_trained": 0,
+    }
+
+
+def make_fallback_pipeline(scaler, clf):
+    return Pipeline([
+        ('selector', FunctionTransformer(func=get_url_values, validate=False)),
+        ('nums', FunctionTransformer(func=numeric_features, validate=False)),
+        ('scale', scaler),
+        ('clf', clf),
+    ])
+
+
+def unscaled(clf, scaler):
+    """clf with the MaxAbsScaler folded into its weights, for raw numeric_features()."""
+    folded = copy.deepcopy(clf)
+    folded.coef_ = clf.coef_ / scaler.scale_
+    return folded
+
+
+def remove_stale_artifacts(out_dir):
+    """Removes a compiled scorer exported by train.py for a different pipeline."""
+    scorer_dir = Path(out_dir) / SCORER_DIR.name
+    if scorer_dir.is_dir():
+        shutil.rmtree(scorer_dir)
+        print(f"Removed {scorer_dir}: it was exported from a different pipeline")
+
+
+def run_pass(state, args, ckpt_path, fn):
+    """Calls fn(urls, labels, chunk_index) for chunks not yet done in this pass."""
+    for i, (urls, labels) in enumerate(read_chunks(args.csv, args.chunk_size)):
+        if i < state["chunk"]:
+            continue
+        fn(urls, labels, i)
+        state["chunk"] = i + 1
+        if args.checkpoint_every and state["chunk"] % args.checkpoint_every == 0:
+            save_checkpoint(state, ckpt_path)
+    state["pass"] += 1
+    state["chunk"] = 0
+    save_checkpoint(state, ckpt_path)
+
+
+def evaluate(pipeline, args):
+    """Confusion counts and log loss on the holdout rows, streamed."""
+    tp = fp = tn = fn = 0
+    loss, n = 0.0, 0
+    for urls, labels in read_chunks(args.csv, args.chunk_size):
+        mask = is_holdout(urls, args.test_percent)
+        if not mask.any():
+            continue
+        X = pd.DataFrame({'url': urls[mask]})
+        y = labels[mask]
+        proba = np.clip(pipeline.predict_proba(X)[:, 1], 1e-15, 1 - 1e-15)
+        pred = (proba > 0.5).astype(int)
+        tp += int(((pred == 1) & (y == 1)).sum())
+        fp += int(((pred == 1) & (y == 0)).sum())
+        tn += int(((pred == 0) & (y == 0)).sum())
+        fn += int(((pred == 0) & (y == 1)).sum())
+        loss -= float(np.sum(y * np.log(proba) + (1 - y) * np.log(1 - proba)))
+        n += len(y)
+    precision = tp / (tp + fp) if tp + fp else 0.0
+    recall = tp / (tp + fn) if tp + fn else 0.0
+    return {
+        "accuracy": (tp + tn) / n if n else None,
+        "precision": precision,
+        "recall": recall,
+        "f1": 2 * precision * recall / (precision + recall) if precision + recall else 0.0,
+        "log_loss": loss / n if n else None,
+        "n_test": n,
+        "confusion": [[tn, fp], [fn, tp]],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--csv", default=str(CSV_FILE))
+    parser.add_argument("--out", default=str(MODEL_FILE))
+    parser.add_argument("--chunk-size", type=int, default=20000)
+    parser.add_argument("--epochs", type=int, default=3)
+    parser.add_argument("--n-features", type=int, default=2 ** 20)
+    parser.add_argument("--alpha", type=float, default=1e-5)
+    parser.add_argument("--test-percent", type=int, default=15)
+    parser.add_argument("--checkpoint", default=str(CHECKPOINT_FILE))
+    parser.add_argument("--checkpoint-every", type=int, default=10, help="Chunks between checkpoints (0: per pass only)")
+    parser.add_argument("--resume", action="store_true", help="Continue from --checkpoint if it exists")
+    parser.add_argument("--no-promote", action="store_true", help="Publish the release without making it CURRENT")
+    args = parser.parse_args(argv)
+
+    ckpt_path = Path(args.checkpoint)
+    # Created up front: a missing directory should fail nothing after the whole run
+    out_dir = Path(args.out).resolve().parent
+    out_dir.mkdir(parents=True, exist_ok=True)
+    ckpt_path.resolve().parent.mkdir(parents=True, exist_ok=True)
+    state = None
+    if args.resume and ckpt_path.exists():
+        state = joblib.load(ckpt_path)
+        current = {k: getattr(args, k) for k in state["args"]}
+        if current != state["args"]:
+            parser.error(f"Checkpoint was written with different settings: {state['args']}")
+        print(f"Resuming from {ckpt_path}: pass {state['pass']}, chunk {state['chunk']}")
+    if state is None:
+        state = new_state(args)
+
+    started = time.perf_counter()
+
+    if state["pass"] == 0:
+        print("Pass 0: label counts and numeric feature scaling ...")
+
+        def stats(urls, labels, i):
+            train = ~is_holdout(urls, args.test_percent)
+            state["counts"] += np.bincount(labels[train], minlength=2)
+            if train.any():
+                state["scaler"].partial_fit(numeric_features(urls[train]))
+
+        run_pass(state, args, ckpt_path, stats)
+        print(f"  benign {state['counts'][0]}, malicious {state['counts'][1]}")
+
+    counts = state["counts"]
+    if (counts == 0).any():
+        print("Error: training data must contain both classes")
+        return 1
+    # Same weighting as class_weight='balanced', which partial_fit does not accept
+    class_weight = counts.sum() / (2.0 * counts)
+    featurizer = make_featurizer(args.n_features, state["scaler"])
+    clf = state["clf"]
+    # Checkpoints written before the fallback model was trained here
+    fallback_clf = state.setdefault(
+        "fallback", SGDClassifier(loss='log_loss', alpha=args.alpha, random_state=RANDOM_STATE)
+    )
+
+    while state["pass"] <= args.epochs:
+        epoch = state["pass"]
+        print(f"Pass {epoch}/{args.epochs}: partial_fit ...")
+
+        def train(urls, labels, i):
+            train_mask = ~is_holdout(urls, args.test_percent)
+            if not train_mask.any():
+                return
+            rng = np.random.RandomState(RANDOM_STATE + epoch * 100003 + i)
+            order = rng.permutation(np.flatnonzero(train_mask))
+            X = featurizer.transform(pd.DataFrame({'url': urls[order]}))
+            y = labels[order]
+            clf.partial_fit(X, y, classes=CLASSES, sample_weight=class_weight[y])
+            numeric = state["scaler"].transform(numeric_features(urls[order]))
+            fallback_clf.partial_fit(numeric, y, classes=CLASSES, sample_weight=class_weight[y])
+            state["rows_trained"] += len(y)
+
+        run_pass(state, args, ckpt_path, train)
+        print(f"  rows trained so far: {state['rows_trained']} ({time.perf_counter() - started:.1f}s)")
+
+    pipeline = Pipeline([('features', featurizer), ('clf', clf)])
+    metrics = evaluate(pipeline, args)
+    print("Holdout metrics:", {k: v for k, v in metrics.items() if k != "confusion"})
+    print("Confusion matrix [[tn, fp], [fn, tp]]:", metrics["confusion"])
+
+    fallback_metrics = evaluate(make_fallback_pipeline(state["scaler"], fallback_clf), args)
+    fallback_metrics = {k: v for k, v in fallback_metrics.items() if k != "confusion"}
+    print("Fallback holdout metrics:", fallback_metrics)
+
+    dump_atomic(pipeline, args.out)
+    print(f"Saved pipeline to {args.out}")
+    fallback_file = out_dir / FALLBACK_FILE.name
+    tmp = out_dir / f".{FALLBACK_FILE.name}.tmp"
+    export_fallback(unscaled(fallback_clf, state["scaler"]), tmp, NUMERIC_FEATURE_NAMES, fallback_metrics)
+    os.replace(tmp, fallback_file)
+    print(f"Saved fallback model to {fallback_file}")
+    remove_stale_artifacts(out_dir)
+    manifest = publish_release(
+        args.out, None,
+        metrics={k: v for k, v in metrics.items() if k != "confusion"},
+        params={"mode": "stream", "epochs": args.epochs, **state["args"]},
+        root=RELEASES_DIR, promote=not args.no_promote, fallback_file=fallback_file,
+    )
+    print(f"Published release {manifest['version']} to {RELEASES_DIR}"
+          + ("" if args.no_promote else " (CURRENT)"))
+    ckpt_path.unlink(missing_ok=True)
+    print("Host feature memo:", host_memo.stats())
+    print(f"Done in {time.perf_counter() - started:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,227 @@
+"""
+Compact, versioned snapshot of the known-domain index for the browser
+extension, so it can decide most navigations without calling /check-url.
+
+Each host and domain entry of domain_index.json is hashed as
+SHA-256("host:<host>") or SHA-256("domain:<domain>"), with names in their
+ASCII (IDNA) form as browsers report them, and kept in one sorted set per
+verdict. A client checks its host against the host entries, then the host
+and each parent suffix against the domain entries, the same walk as the
+backend's DomainIndex.
+
+Deny entries are reduced to the first 4 bytes of the hash. Prefixes
+collide (at the rate reported below), so a deny hit only means the url
+must be confirmed with /check-url. Allow entries are kept as full
+digests: an allow hit lets a client skip the check, and with short
+prefixes an attacker could search for a subdomain label whose hash
+collides with any allow entry.
+
+Snapshots are numbered. A new <seq>.json is written only when the sets
+change, and the last --keep of them are retained so the backend can serve
+diffs (GET /snapshot/diff?since=<seq>) to clients that are not too far
+behind:
+
+    model/snapshots/00000007.json
+        {"format_version": 2, "seq": 7, "index_version": "...", "hash_bytes": {"deny": 4, "allow": 32},
+         "sets": {"deny": "<base64>", "allow": "<base64>"}, "stats": {...}}
+
+Usage: python -m model.verdict_snapshot [--index model/domain_index.json] [--out model/snapshots]
+                                        [--keep 30] [--fpr-samples 200000]
+"""
+import argparse
+import base64
+import hashlib
+import json
+import os
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+
+from model.domain_index import ALLOW, DENY, INDEX_FILE
+
+SNAPSHOT_DIR = Path(__file__).resolve().parent / "snapshots"
+FORMAT_VERSION = 2
+# Bytes of SHA-256 kept per entry: deny hits are confirmed, allow hits are final
+HASH_BYTES = {DENY: 4, ALLOW: 32}
+VERDICTS = (DENY, ALLOW)
+
+
+def ascii_name(name):
+    """A host or domain as browsers report it (IDNA/punycode), None if it cannot be encoded."""
+    try:
+        name.encode("ascii")
+        return name
+    except UnicodeEncodeError:
+        pass
+    try:
+        return name.encode("idna").decode("ascii")
+    except UnicodeError:
+        return None
+
+
+def digest(kind, name):
+    """SHA-256("<kind>:<name>")."""
+    return hashlib.sha256(f"{kind}:{name}".encode()).digest()
+
+
+def encode_hashes(values):
+    """Sorted unique hashes (equal-width byte strings) as base64 of their concatenation."""
+    return base64.b64encode(np.unique(values).tobytes()).decode("ascii")
+
+
+def decode_hashes(data, width):
+    """Array of width-byte hashes; sorting them bytewise matches big-endian integer order."""
+    return np.frombuffer(base64.b64decode(data), dtype=f"S{width}")
+
+
+def build_sets(index):
+    """({verdict: sorted hashes}, number of names that could not be encoded)."""
+    sets = {v: [] for v in VERDICTS}
+    skipped = 0
+    for kind, entries in (("host", index["hosts"]), ("domain", index["domains"])):
+        for verdict in VERDICTS:
+            for name in entries.get(verdict, []):
+                name = ascii_name(name)
+                if name is None:
+                    skipped += 1
+                    continue
+                sets[verdict].append(digest(kind, name)[:HASH_BYTES[verdict]])
+    return {v: np.unique(np.array(h, dtype=f"S{HASH_BYTES[v]}")) for v, h in sets.items()}, skipped
+
+
+def lookup_hashes(sets, host):
+    """Verdict a client would find for host in the snapshot ({verdict: set of hashes}), or None."""
+    probes = [("host", host)]
+    labels = host.split(".")
+    probes += [("domain", ".".join(labels[i:])) for i in range(len(labels) - 1)]
+    for kind, name in probes:
+        h = digest(kind, name)
+        for verdict in VERDICTS:
+            if h[:HASH_BYTES[verdict]] in sets[verdict]:
+                return verdict
+    return None
+
+
+def measure_fpr(sets, samples, seed=0):
+    """Share of random hosts (not in the index) that hit a snapshot set."""
+    if not samples:
+        return None
+    # From the raw buffer: numpy drops trailing NUL bytes when converting S values
+    lookup = {}
+    for v, values in sets.items():
+        raw, width = values.tobytes(), values.dtype.itemsize
+        lookup[v] = {raw[i:i + width] for i in range(0, len(raw), width)}
+    rng = np.random.default_rng(seed)
+    hits = 0
+    for i, label in enumerate(rng.integers(1 << 62, size=samples)):
+        if lookup_hashes(lookup, f"{label:x}.example-{i % 97}.com") is not None:
+            hits += 1
+    return hits / samples
+
+
+def snapshot_stats(sets, index, skipped, fpr_samples):
+    entries = {v: len(index["hosts"].get(v, [])) + len(index["domains"].get(v, [])) for v in VERDICTS}
+    total = sum(len(s) for s in sets.values())
+    # A lookup probes ~3 names (host, domain, parent); only the short deny
+    # prefixes collide at a measurable rate
+    per_probe = len(sets[DENY]) / float(1 << (8 * HASH_BYTES[DENY]))
+    allow_prefixes = sets[ALLOW].view(np.uint8).reshape(-1, HASH_BYTES[ALLOW])[:, :HASH_BYTES[DENY]]
+    allow_prefixes = np.ascontiguousarray(allow_prefixes).view(f"S{HASH_BYTES[DENY]}").ravel()
+    return {
+        "entries": entries,
+        "hashes": {v: int(len(s)) for v, s in sets.items()},
+        "collapsed_collisions": int(sum(entries.values()) - skipped - total),
+        # Allow entries whose prefix is denied: still checked with /check-url
+        "cross_verdict_collisions": int(np.isin(allow_prefixes, sets[DENY]).sum()),
+        "skipped_names": skipped,
+        "bytes": {v: int(len(s) * HASH_BYTES[v]) for v, s in sets.items()},
+        "expected_fpr_per_probe": per_probe,
+        "expected_fpr_per_lookup": 3 * per_probe,
+        "measured_fpr": measure_fpr(sets, fpr_samples),
+        "fpr_samples": fpr_samples,
+    }
+
+
+def list_snapshots(out_dir):
+    """Snapshot sequence numbers in out_dir, ascending."""
+    return sorted(int(p.stem) for p in Path(out_dir).glob("*.json") if p.stem.isdigit())
+
+
+def read_snapshot(out_dir, seq):
+    with open(Path(out_dir) / f"{seq:08d}.json") as f:
+        return json.load(f)
+
+
+def write_snapshot(out_dir, snapshot):
+    """Writes <seq>.json atomically so the backend never reads a partial file."""
+    path = Path(out_dir) / f"{snapshot['seq']:08d}.json"
+    tmp = path.with_name(f".{path.name}.tmp")
+    with open(tmp, "w") as f:
+        json.dump(snapshot, f, separators=(",", ":"))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    return path
+
+
+def publish_snapshot(index, out_dir=SNAPSHOT_DIR, keep=30, fpr_samples=200000):
+    """Writes a new snapshot if the sets changed; returns (snapshot, written)."""
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    sets, skipped = build_sets(index)
+    encoded = {v: encode_hashes(sets[v]) for v in VERDICTS}
+
+    existing = list_snapshots(out_dir)
+    if existing:
+        latest = read_snapshot(out_dir, existing[-1])
+        if latest["sets"] == encoded and latest.get("hash_bytes") == HASH_BYTES:
+            return latest, False
+
+    snapshot = {
+        "format_version": FORMAT_VERSION,
+        "seq": (existing[-1] if existing else 0) + 1,
+        "index_version": index.get("version"),
+        "built_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "hash_bytes": dict(HASH_BYTES),
+        "sets": encoded,
+        "stats": snapshot_stats(sets, index, skipped, fpr_samples),
+    }
+    write_snapshot(out_dir, snapshot)
+    for seq in existing[:max(0, len(existing) + 1 - keep)]:
+        (out_dir / f"{seq:08d}.json").unlink(missing_ok=True)
+    return snapshot, True
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--index", default=str(INDEX_FILE), help="domain_index.json built by model.domain_index")
+    parser.add_argument("--out", default=str(SNAPSHOT_DIR))
+    parser.add_argument("--keep", type=int, default=30, help="Snapshots retained for diffs")
+    parser.add_argument("--fpr-samples", type=int, default=200000, help="Random hosts probed to measure the FPR")
+    args = parser.parse_args()
+
+    with open(args.index) as f:
+        index = json.load(f)
+    snapshot, written = publish_snapshot(index, args.out, max(1, args.keep), args.fpr_samples)
+    if not written:
+        print(f"Index {index.get('version')} unchanged since snapshot {snapshot['seq']}; nothing written")
+        return 0
+
+    stats = snapshot["stats"]
+    size = (Path(args.out) / f"{snapshot['seq']:08d}.json").stat().st_size
+    print(f"Saved snapshot {snapshot['seq']} (index {snapshot['index_version']}) to {args.out}: {size} bytes")
+    for verdict in VERDICTS:
+        print(f"  {verdict}: {stats['entries'][verdict]} entries -> {stats['hashes'][verdict]} hashes "
+              f"({stats['bytes'][verdict]} bytes)")
+    print(f"  collisions: {stats['collapsed_collisions']} within a set, "
+          f"{stats['cross_verdict_collisions']} across deny/allow; {stats['skipped_names']} names skipped")
+    measured = stats["measured_fpr"]
+    print(f"  deny false-positive rate: expected {stats['expected_fpr_per_lookup']:.2e} per lookup, "
+          f"measured {measured if measured is None else f'{measured:.2e}'} on {stats['fpr_samples']} random hosts")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,70 @@
+# admission.py
+import os
+import time
+
+# Latency budget of one /check-url request; the full model must answer
+# within it or the fallback tier does
+CHECK_URL_DEADLINE_MS = float(os.getenv("CHECK_URL_DEADLINE_MS", "250"))
+# Queue depth at which new urls skip the full model outright (0: never)
+SHED_QUEUE_DEPTH = int(os.getenv("SHED_QUEUE_DEPTH", "256"))
+
+# Tiers, from most to least expensive
+FULL, FALLBACK = "full", "fallback"
+CACHE, DOMAIN_INDEX = "cache", "domain_index"
+
+# Why a url did not get the full model: shed before queueing because the
+# queue was too deep or its estimated wait too long, rejected by a full
+# queue, or admitted but not answered in time
+OVERLOADED, OVER_BUDGET, QUEUE_FULL, DEADLINE = "overloaded", "over_budget", "queue_full", "deadline"
+
+
+class AdmissionControl:
+    """
+    Decides whether a url is sent to the full model or answered by the
+    cheap fallback tier.
+
+    A url is shed before queueing when the inference queue is at
+    shed_queue_depth or when its estimated wait (queue depth times the
+    recent per-url scoring cost) would not fit in what is left of its
+    deadline. Admitted urls that still miss the deadline are answered by
+    the fallback; their full-model result still lands in the verdict cache.
+    """
+
+    def __init__(self, batcher, deadline_ms=CHECK_URL_DEADLINE_MS, shed_queue_depth=SHED_QUEUE_DEPTH):
+        self.batcher = batcher
+        self.deadline = max(0.0, deadline_ms) / 1000
+        self.shed_queue_depth = shed_queue_depth
+        self.admitted = 0
+        self.tiers = {}
+        self.reasons = {}
+
+    def deadline_at(self, start, deadline_ms=None):
+        """perf_counter() time by which a request started at start must be answered."""
+        budget = self.deadline if deadline_ms is None else deadline_ms / 1000
+        return start + budget
+
+    def admit(self, deadline_at):
+        """Returns None if the url may be queued for the full model, else the reason it is shed."""
+        if self.shed_queue_depth > 0 and self.batcher.queue_depth() >= self.shed_queue_depth:
+            return OVERLOADED
+        if self.batcher.estimated_wait() > deadline_at - time.perf_counter():
+            return OVER_BUDGET
+        self.admitted += 1
+        return None
+
+    def record(self, tier, reason=None, n=1):
+        """Counts n verdicts answered by tier; reason is why the full model was skipped, if it was."""
+        self.tiers[tier] = self.tiers.get(tier, 0) + n
+        if reason is not None:
+            key = (tier, reason)
+            self.reasons[key] = self.reasons.get(key, 0) + n
+
+    def stats(self) -> dict:
+        return {
+            "deadline_ms": self.deadline * 1000,
+            "shed_queue_depth": self.shed_queue_depth,
+            "estimated_wait_ms": round(self.batcher.estimated_wait() * 1000, 3),
+            "admitted": self.admitted,
+            "tiers": dict(self.tiers),
+            "degraded": {f"{tier}/{reason}": n for (tier, reason), n in self.reasons.items()},
+        }
@@ -0,0 +1,217 @@
+# batching.py
+import asyncio
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+# Upper bounds of the batch size histogram buckets
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+
+class QueueFullError(Exception):
+    """Raised when the inference queue is at capacity (backpressure)."""
+
+
+class MicroBatcher:
+    """
+    Collects concurrent single-URL requests into small batches.
+
+    A batch is dispatched when it reaches max_batch_size or when the oldest
+    request in it has waited max_wait_ms. Each batch is scored with one
+    score_batch(urls) call on a dedicated thread or process pool, and every
+    caller's future is resolved with its own result.
+
+    With capture(score_batch, urls) -> (results, stages), thread-pool
+    batches are scored through it so that per-stage timings recorded on the
+    inference thread can be handed back to the callers (see submit()).
+    """
+
+    def __init__(self, score_batch, max_batch_size=32, max_wait_ms=2.0,
+                 max_queue=1024, workers=1, executor="thread", capture=None):
+        self.score_batch = score_batch
+        self.capture = capture if executor != "process" else None
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self.max_queue = max_queue
+        self.workers = max(1, workers)
+        self.executor_kind = executor
+
+        self._queue = None
+        self._pool = None
+        self._slots = None
+        self._runner = None
+        self._inflight = set()
+
+        self.requests = 0
+        self.rejected = 0
+        self.batches = 0
+        self.items = 0
+        self.errors = 0
+        self.batch_size_counts = [0] * (len(BATCH_SIZE_BUCKETS) + 1)
+        self.queue_wait_total = 0.0
+        self.queue_wait_max = 0.0
+        # Moving average of scoring seconds per url, for estimated_wait()
+        self.item_seconds = 0.0
+
+    @property
+    def running(self):
+        return self._runner is not None and not self._runner.done()
+
+    def queue_depth(self):
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def estimated_wait(self):
+        """Seconds a url submitted now would take to come back, from the recent per-url cost."""
+        pending = self.queue_depth() + 1
+        return pending * self.item_seconds / self.workers + self.max_wait
+
+    async def start(self):
+        if self.running:
+            return
+        if self.executor_kind == "process":
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        else:
+            self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="inference")
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._slots = asyncio.Semaphore(self.workers)
+        self._runner = asyncio.create_task(self._collect())
+
+    async def stop(self):
+        if self._runner is not None:
+            self._runner.cancel()
+            try:
+                await self._runner
+            except asyncio.CancelledError:
+                pass
+            self._runner = None
+        if self._inflight:
+            await asyncio.gather(*self._inflight, return_exceptions=True)
+        while self._queue is not None and not self._queue.empty():
+            _, future, _, _ = self._queue.get_nowait()
+            if not future.done():
+                future.set_exception(RuntimeError("Inference executor stopped"))
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+
+    async def submit(self, url, info=None):
+        """
+        Queues one URL and waits for its (label, probability) result.
+
+        If info is a dict it is filled with queue_wait and batch_seconds
+        (seconds), batch_size and, with capture, the batch's stages.
+        """
+        if not self.running:
+            raise RuntimeError("Inference executor is not running")
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait((url, future, time.perf_counter(), info))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise QueueFullError(f"Inference queue is full ({self.max_queue} pending)")
+        self.requests += 1
+        return await future
+
+    async def _collect(self):
+        loop = asyncio.get_running_loop()
+        batch = []
+        try:
+            while True:
+                batch = [await self._queue.get()]
+                deadline = loop.time() + self.max_wait
+                while len(batch) < self.max_batch_size:
+                    try:
+                        batch.append(self._queue.get_nowait())
+                        continue
+                    except asyncio.QueueEmpty:
+                        pass
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                    except asyncio.TimeoutError:
+                        break
+
+                # Bound concurrent batches to the pool size so the queue, not
+                # the pool, absorbs bursts and backpressure stays observable
+                await self._slots.acquire()
+                task = asyncio.create_task(self._dispatch(batch))
+                self._inflight.add(task)
+                task.add_done_callback(self._inflight.discard)
+                batch = []
+        except asyncio.CancelledError:
+            for _, future, _, _ in batch:
+                if not future.done():
+                    future.set_exception(RuntimeError("Inference executor stopped"))
+            raise
+
+    async def _dispatch(self, batch):
+        try:
+            now = time.perf_counter()
+            for _, _, enqueued, info in batch:
+                wait = now - enqueued
+                self.queue_wait_total += wait
+                self.queue_wait_max = max(self.queue_wait_max, wait)
+                if info is not None:
+                    info["queue_wait"] = wait
+                    info["batch_size"] = len(batch)
+            self.batches += 1
+            self.items += len(batch)
+            self.batch_size_counts[self._bucket(len(batch))] += 1
+
+            urls = [url for url, _, _, _ in batch]
+            loop = asyncio.get_running_loop()
+            stages = None
+            try:
+                if self.capture is not None:
+                    results, stages = await loop.run_in_executor(self._pool, self.capture, self.score_batch, urls)
+                else:
+                    results = await loop.run_in_executor(self._pool, self.score_batch, urls)
+            except Exception as e:
+                self.errors += 1
+                for _, future, _, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                return
+
+            elapsed = time.perf_counter() - now
+            per_item = elapsed / len(batch)
+            self.item_seconds = per_item if not self.item_seconds else 0.8 * self.item_seconds + 0.2 * per_item
+            for (_, future, _, info), result in zip(batch, results):
+                if info is not None:
+                    info["batch_seconds"] = elapsed
+                    if stages is not None:
+                        info["stages"] = stages
+                if not future.done():
+                    future.set_result(result)
+        finally:
+            self._slots.release()
+
+    @staticmethod
+    def _bucket(size):
+        for i, bound in enumerate(BATCH_SIZE_BUCKETS):
+            if size <= bound:
+                return i
+        return len(BATCH_SIZE_BUCKETS)
+
+    def stats(self) -> dict:
+        labels = [f"<={b}" for b in BATCH_SIZE_BUCKETS] + [f">{BATCH_SIZE_BUCKETS[-1]}"]
+        return {
+            "running": self.running,
+            "executor": self.executor_kind,
+            "workers": self.workers,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "max_queue": self.max_queue,
+            "queue_depth": self.queue_depth(),
+            "requests": self.requests,
+            "rejected": self.rejected,
+            "batches": self.batches,
+            "errors": self.errors,
+            "mean_batch_size": round(self.items / self.batches, 3) if self.batches else 0.0,
+            "batch_size_histogram": dict(zip(labels, self.batch_size_counts)),
+            "queue_wait_ms_mean": round(self.queue_wait_total / self.items * 1000, 3) if self.items else 0.0,
+            "queue_wait_ms_max": round(self.queue_wait_max * 1000, 3),
+            "item_ms": round(self.item_seconds * 1000, 3),
+            "estimated_wait_ms": round(self.estimated_wait() * 1000, 3),
+        }
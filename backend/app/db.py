@@ -1,13 +1,293 @@
 # db.py
 import os
-import psycopg2
-from psycopg2.extras import RealDictCursor
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
 
-# Read your Supabase connection string from env
+from starlette.concurrency import run_in_threadpool
+
+# Read your Supabase connection string from env. DATABASE_URL takes
+# precedence and also accepts sqlite:///path/to/file.db as a local stand-in.
 SUPABASE_DB_URL = os.getenv("SUPABASE_DB_URL")
+DATABASE_URL = os.getenv("DATABASE_URL") or SUPABASE_DB_URL
+
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", "1"))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", "10"))
+# Seconds to wait for a free pooled connection before giving up
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "5"))
+DB_CONNECT_TIMEOUT = int(os.getenv("DB_CONNECT_TIMEOUT", "5"))
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "10000"))
+# Idle connections older than this are pinged before being handed out
+DB_HEALTHCHECK_AFTER = float(os.getenv("DB_HEALTHCHECK_AFTER", "30"))
+
+SCHEMA_DIR = Path(__file__).resolve().parent
+# Columns added to existing tables after they were first created; sqlite
+# has no ADD COLUMN IF NOT EXISTS, so init_schema adds the missing ones
+SQLITE_ADDED_COLUMNS = {
+    "reports": [
+        ("canonical_url", "TEXT"),
+        ("report_count", "INTEGER NOT NULL DEFAULT 1"),
+        ("reporters", "TEXT NOT NULL DEFAULT '[]'"),
+        ("last_reported_at", "TIMESTAMP"),
+        ("review_status", "VARCHAR(20)"),
+        ("reviewed_at", "TIMESTAMP"),
+    ],
+}
+
+
+class PoolTimeout(Exception):
+    """No pooled connection became available within the pool timeout."""
+
+
+class ConnectionPool:
+    """
+    Bounded, thread-safe pool of DB-API connections.
+
+    Connections are created lazily up to maxsize, pinged before reuse when
+    they have been idle for a while, and discarded if they fail.
+    """
+
+    def __init__(self, connect, maxsize=10, minsize=1, timeout=5.0,
+                 healthcheck_after=30.0, ping_sql="SELECT 1"):
+        self._connect = connect
+        self.maxsize = maxsize
+        self.minsize = min(minsize, maxsize)
+        self.timeout = timeout
+        self.healthcheck_after = healthcheck_after
+        self.ping_sql = ping_sql
+
+        self._idle = queue.LifoQueue()  # (conn, idle_since)
+        self._lock = threading.Lock()
+        self._size = 0
+        self._closed = False
+
+    def open(self):
+        for _ in range(self.minsize):
+            with self._lock:
+                self._size += 1
+            try:
+                conn = self._connect()
+            except Exception:
+                with self._lock:
+                    self._size -= 1
+                raise
+            self._idle.put((conn, time.monotonic()))
+
+    def _healthy(self, conn):
+        if getattr(conn, "closed", 0):
+            return False
+        try:
+            cur = conn.cursor()
+            cur.execute(self.ping_sql)
+            cur.fetchall()
+            cur.close()
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    def _discard(self, conn):
+        with self._lock:
+            self._size -= 1
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def acquire(self):
+        if self._closed:
+            raise RuntimeError("Connection pool is closed")
+        deadline = time.monotonic() + self.timeout
+        while True:
+            try:
+                conn, idle_since = self._idle.get_nowait()
+            except queue.Empty:
+                conn = None
+
+            if conn is not None:
+                if time.monotonic() - idle_since < self.healthcheck_after or self._healthy(conn):
+                    return conn
+                self._discard(conn)
+                continue
+
+            with self._lock:
+                can_create = self._size < self.maxsize
+                if can_create:
+                    self._size += 1
+            if can_create:
+                try:
+                    return self._connect()
+                except Exception:
+                    with self._lock:
+                        self._size -= 1
+                    raise
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise PoolTimeout(f"No database connection available within {self.timeout}s")
+            try:
+                conn, idle_since = self._idle.get(timeout=remaining)
+            except queue.Empty:
+                raise PoolTimeout(f"No database connection available within {self.timeout}s")
+            self._idle.put((conn, idle_since))
+
+    def release(self, conn, broken=False):
+        if broken or self._closed or getattr(conn, "closed", 0):
+            self._discard(conn)
+            return
+        self._idle.put((conn, time.monotonic()))
+
+    @contextmanager
+    def connection(self):
+        """Yields a connection; commits on success, rolls back on error."""
+        conn = self.acquire()
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            broken = False
+            try:
+                conn.rollback()
+            except Exception:
+                broken = True
+            self.release(conn, broken=broken)
+            raise
+        self.release(conn)
+
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                conn, _ = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(conn)
+
+    def stats(self) -> dict:
+        return {"size": self._size, "idle": self._idle.qsize(), "maxsize": self.maxsize}
+
+
+def _dict_row(cursor, row):
+    return {col[0]: value for col, value in zip(cursor.description, row)}
+
+
+class Database:
+    """
+    Pooled access to the reports database.
+
+    Postgres URLs use psycopg2 with RealDictCursor rows; sqlite:///path is a
+    local stand-in (for tests and development) that creates its schema on
+    open. Queries are written with %s placeholders for both. The async
+    helpers run the blocking driver calls in a worker thread so they never
+    stall the event loop.
+    """
+
+    def __init__(self, url=None, minsize=DB_POOL_MIN, maxsize=DB_POOL_MAX, timeout=DB_POOL_TIMEOUT):
+        self.url = url if url is not None else DATABASE_URL
+        self.minsize = minsize
+        self.maxsize = maxsize
+        self.timeout = timeout
+        self.pool = None
+
+    @property
+    def is_sqlite(self):
+        return bool(self.url) and self.url.startswith("sqlite://")
+
+    def _connect(self):
+        if self.is_sqlite:
+            path = self.url[len("sqlite:///"):] or ":memory:"
+            if path == ":memory:":
+                # Pooled connections must all see the same in-memory database
+                path = "file:reports?mode=memory&cache=shared"
+            conn = sqlite3.connect(path, timeout=DB_CONNECT_TIMEOUT, check_same_thread=False, uri=True)
+            conn.row_factory = _dict_row
+            return conn
+
+        import psycopg2
+        from psycopg2.extras import RealDictCursor
+        return psycopg2.connect(
+            self.url,
+            cursor_factory=RealDictCursor,
+            connect_timeout=DB_CONNECT_TIMEOUT,
+            options=f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}",
+        )
+
+    def open(self):
+        if not self.url:
+            raise ValueError("SUPABASE_DB_URL not set in environment variables")
+        if self.pool is not None:
+            return
+        self.pool = ConnectionPool(
+            self._connect,
+            maxsize=self.maxsize,
+            minsize=self.minsize,
+            timeout=self.timeout,
+            healthcheck_after=DB_HEALTHCHECK_AFTER,
+        )
+        self.pool.open()
+        if self.is_sqlite:
+            self.init_schema()
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.close()
+            self.pool = None
+
+    def init_schema(self):
+        """Creates the stand-in schema (sqlite only; Postgres uses schema.sql)."""
+        script = (SCHEMA_DIR / "schema_sqlite.sql").read_text()
+        with self.connection() as conn:
+            for table, columns in SQLITE_ADDED_COLUMNS.items():
+                existing = {row["name"] for row in conn.execute(f"PRAGMA table_info({table})").fetchall()}
+                if not existing:
+                    continue
+                for name, definition in columns:
+                    if name not in existing:
+                        conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {definition}")
+            conn.executescript(script)
+
+    @contextmanager
+    def connection(self):
+        if self.pool is None:
+            raise RuntimeError("Database is not open")
+        with self.pool.connection() as conn:
+            yield conn
+
+    def format_sql(self, sql):
+        """Adapts %s placeholders to the driver in use."""
+        return sql.replace("%s", "?") if self.is_sqlite else sql
+
+    def execute(self, sql, params=(), fetch=None):
+        """Runs one statement in its own transaction; fetch is None, "one" or "all"."""
+        with self.connection() as conn:
+            cur = conn.cursor()
+            try:
+                cur.execute(self.format_sql(sql), params)
+                if fetch == "one":
+                    return cur.fetchone()
+                if fetch == "all":
+                    return cur.fetchall()
+                return cur.rowcount
+            finally:
+                cur.close()
+
+    def run(self, fn, *args, **kwargs):
+        """Awaitable that runs fn(*args, **kwargs) in a worker thread."""
+        return run_in_threadpool(fn, *args, **kwargs)
+
+    async def fetchone(self, sql, params=()):
+        return await self.run(self.execute, sql, params, "one")
+
+    async def fetchall(self, sql, params=()):
+        return await self.run(self.execute, sql, params, "all")
+
+    async def execute_async(self, sql, params=()):
+        return await self.run(self.execute, sql, params)
 
-def get_db_connection():
-    if not SUPABASE_DB_URL:
-        raise ValueError("SUPABASE_DB_URL not set in environment variables")
-    conn = psycopg2.connect(SUPABASE_DB_URL, cursor_factory=RealDictCursor)
-    return conn
+    def stats(self) -> dict:
+        if self.pool is None:
+            return {"open": False}
+        return {"open": True, "backend": "sqlite" if self.is_sqlite else "postgres", **self.pool.stats()}
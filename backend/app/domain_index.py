@@ -0,0 +1,129 @@
+# domain_index.py
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from urllib import parse
+
+# Built offline by ai-model/model/domain_index.py
+DOMAIN_INDEX_FILE = Path(os.getenv(
+    "DOMAIN_INDEX_FILE", Path(__file__).resolve().parent / "model" / "domain_index.json"
+))
+# How often the index file is checked for a newer version
+DOMAIN_INDEX_CHECK_SECONDS = float(os.getenv("DOMAIN_INDEX_CHECK_SECONDS", "5"))
+
+ALLOW, DENY = "allow", "deny"
+
+
+def url_host(url: str) -> str:
+    """Lowercased hostname of a url without a trailing dot, '' if it has none."""
+    try:
+        return (parse.urlsplit(url.strip()).hostname or "").rstrip(".")
+    except ValueError:
+        return ""
+
+
+class DomainIndex:
+    """
+    Known allow/deny hosts and registered domains.
+
+    Host entries match exactly; domain entries also match any subdomain,
+    found by walking the host's parent suffixes through a hash lookup.
+    """
+
+    def __init__(self, hosts=None, domains=None, version=None):
+        self.hosts = hosts or {}
+        self.domains = domains or {}
+        self.version = version
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path) as f:
+            data = json.load(f)
+        hosts = {h: verdict for verdict in (ALLOW, DENY) for h in data["hosts"].get(verdict, [])}
+        domains = {d: verdict for verdict in (ALLOW, DENY) for d in data["domains"].get(verdict, [])}
+        return cls(hosts, domains, data.get("version"))
+
+    def __len__(self):
+        return len(self.hosts) + len(self.domains)
+
+    def lookup_host(self, host):
+        """Returns {"verdict", "matched", "scope"} for a known host, else None."""
+        if not host:
+            return None
+        verdict = self.hosts.get(host)
+        if verdict is not None:
+            return {"verdict": verdict, "matched": host, "scope": "host"}
+        labels = host.split(".")
+        for i in range(len(labels) - 1):
+            suffix = ".".join(labels[i:])
+            verdict = self.domains.get(suffix)
+            if verdict is not None:
+                return {"verdict": verdict, "matched": suffix, "scope": "domain"}
+        return None
+
+
+class DomainIndexHolder:
+    """
+    Hot-swappable reference to the current DomainIndex.
+
+    The index file is re-read when its mtime changes (checked at most every
+    check_interval seconds); the new index is built off to the side and
+    swapped in with a single reference assignment, so lookups never block.
+    """
+
+    def __init__(self, path=DOMAIN_INDEX_FILE, check_interval=DOMAIN_INDEX_CHECK_SECONDS):
+        self.path = Path(path)
+        self.check_interval = check_interval
+        self.index = DomainIndex()
+        self._mtime = None
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+        self.loaded_at = None
+        self.hits = {ALLOW: 0, DENY: 0}
+        self.misses = 0
+        self.reload()
+
+    def reload(self):
+        """Loads the index file if it changed; returns True if a new index was swapped in."""
+        with self._lock:
+            self._next_check = time.monotonic() + self.check_interval
+            try:
+                mtime = self.path.stat().st_mtime_ns
+            except FileNotFoundError:
+                return False
+            if mtime == self._mtime:
+                return False
+            try:
+                index = DomainIndex.from_file(self.path)
+            except Exception as e:
+                print(f"Error loading domain index {self.path}: {e}")
+                return False
+            self.index = index
+            self._mtime = mtime
+            self.loaded_at = time.time()
+            print(f"Domain index loaded (version {index.version}, {len(index)} entries)")
+            return True
+
+    def lookup(self, url):
+        if time.monotonic() >= self._next_check:
+            self.reload()
+        hit = self.index.lookup_host(url_host(url))
+        if hit is None:
+            self.misses += 1
+        else:
+            self.hits[hit["verdict"]] += 1
+        return hit
+
+    def stats(self) -> dict:
+        index = self.index
+        return {
+            "version": index.version,
+            "path": str(self.path),
+            "hosts": len(index.hosts),
+            "domains": len(index.domains),
+            "loaded_at": self.loaded_at,
+            "hits": dict(self.hits),
+            "misses": self.misses,
+        }
@@ -0,0 +1,411 @@
+# ingest.py
+import asyncio
+import json
+import os
+import time
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # No cross-process segment locks: one process per spool directory
+    fcntl = None
+
+# Reports are acknowledged once appended (and fsynced) here and written to
+# the database in the background; empty: each report is inserted synchronously
+REPORT_SPOOL_DIR = os.getenv("REPORT_SPOOL_DIR", str(Path(__file__).resolve().parent / "spool"))
+# A flush starts once this many reports are spooled, or after the interval
+REPORT_FLUSH_SIZE = int(os.getenv("REPORT_FLUSH_SIZE", "500"))
+REPORT_FLUSH_INTERVAL_MS = float(os.getenv("REPORT_FLUSH_INTERVAL_MS", "1000"))
+# Reports written by one flush transaction at most (whole segments)
+REPORT_FLUSH_MAX_BATCH = int(os.getenv("REPORT_FLUSH_MAX_BATCH", "5000"))
+# Spooled reports not yet in the database at which new ones are refused
+REPORT_SPOOL_MAX_PENDING = int(os.getenv("REPORT_SPOOL_MAX_PENDING", "100000"))
+# fsync every appended group; "0" trades durability on power loss for speed
+REPORT_SPOOL_FSYNC = os.getenv("REPORT_SPOOL_FSYNC", "1") != "0"
+# Longest wait between retries while the database is failing
+MAX_RETRY_SECONDS = 30.0
+# How often segments orphaned by crashed processes are looked for, and old
+# applied-segment markers pruned
+MAINTENANCE_SECONDS = 60.0
+
+SEGMENT_SUFFIX = ".jsonl"
+
+
+class SpoolFullError(Exception):
+    """Too many reports are spooled and not yet written to the database (backpressure)."""
+
+
+def _try_lock(handle):
+    if fcntl is None:
+        return True
+    try:
+        fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return True
+    except OSError:
+        return False
+
+
+def _fsync_dir(path):
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+class Segment:
+    """
+    One append-only spool file (a JSON report per line) and its reports
+    that are not in the database yet. The owning process holds an exclusive
+    flock on it until it is deleted.
+    """
+
+    def __init__(self, path, handle, reports=None):
+        self.path = path
+        self.name = path.name[:-len(SEGMENT_SUFFIX)]
+        self.handle = handle
+        self.reports = reports if reports is not None else []
+
+    @classmethod
+    def create(cls, directory):
+        # Locked under a temporary name and then renamed, so other processes
+        # never find an unlocked segment that is still being written
+        name = f"{time.time_ns():020d}-{uuid.uuid4().hex[:8]}"
+        tmp = directory / f".{name}.tmp"
+        handle = open(tmp, "ab")
+        _try_lock(handle)
+        path = directory / f"{name}{SEGMENT_SUFFIX}"
+        os.rename(tmp, path)
+        _fsync_dir(directory)
+        return cls(path, handle)
+
+    def append(self, lines, fsync=True):
+        """Appends lines; on failure the file is cut back so no partial group is left."""
+        start = self.handle.tell()
+        try:
+            self.handle.write(b"".join(lines))
+            self.handle.flush()
+            if fsync:
+                os.fsync(self.handle.fileno())
+        except BaseException:
+            try:
+                self.handle.truncate(start)
+                self.handle.seek(start)
+            except OSError:
+                pass
+            raise
+
+    def discard(self):
+        """Deletes the file (its reports are in the database), then releases the lock."""
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+        self.handle.close()
+
+    def close(self):
+        """Releases the lock and leaves the file for the next start to replay."""
+        self.handle.close()
+
+
+def adopt_segments(directory, skip=()):
+    """
+    Segments in directory that no live process holds (left by a stop or a
+    crash), oldest first, locked and with their reports read back. A torn
+    last line (a crash mid-append) was never acknowledged and is dropped.
+    """
+    directory = Path(directory)
+    segments = []
+    for path in sorted(directory.glob(f"*{SEGMENT_SUFFIX}")):
+        if path.name[:-len(SEGMENT_SUFFIX)] in skip:
+            continue
+        try:
+            handle = open(path, "rb")
+        except FileNotFoundError:
+            continue
+        # Held by a live process, or deleted by its owner after being flushed
+        if not _try_lock(handle) or os.fstat(handle.fileno()).st_nlink == 0:
+            handle.close()
+            continue
+        reports = []
+        for line in handle:
+            try:
+                reports.append(json.loads(line))
+            except ValueError:
+                continue
+        segment = Segment(path, handle, reports)
+        if reports:
+            segments.append(segment)
+        else:
+            segment.discard()
+    for path in directory.glob(".*.tmp"):
+        try:
+            with open(path, "rb") as handle:
+                if _try_lock(handle):
+                    os.unlink(path)
+        except OSError:
+            pass
+    return segments
+
+
+class ReportIngestor:
+    """
+    Write-behind ingestion of user reports.
+
+    submit() appends a report to the current spool segment and returns
+    once it is on disk. Appends that arrive while another is being fsynced
+    are written together behind a single fsync (group commit). A background
+    task hands the spooled reports to apply(db, segments={name: reports})
+    every flush_interval_ms, or as soon as flush_size are waiting. apply
+    coalesces reports of the same url into one row, so database work
+    follows distinct urls rather than report volume. A segment file is
+    deleted only after the transaction that wrote its reports has committed.
+
+    At start, and periodically, segments left by stopped or crashed
+    processes (not locked by a live one) are read back and flushed. apply
+    records flushed segment names and skips known ones, so a crash between
+    commit and delete does not count reports twice. While the database is
+    down, reports stay spooled and flushes are retried with backoff.
+    submit() raises SpoolFullError once max_pending reports are waiting.
+    """
+
+    def __init__(self, db, apply, path=REPORT_SPOOL_DIR, flush_size=REPORT_FLUSH_SIZE,
+                 flush_interval_ms=REPORT_FLUSH_INTERVAL_MS, max_batch=REPORT_FLUSH_MAX_BATCH,
+                 max_pending=REPORT_SPOOL_MAX_PENDING, fsync=REPORT_SPOOL_FSYNC, prune=None):
+        self.db = db
+        self.apply = apply
+        self.prune = prune
+        self.path = Path(path)
+        self.flush_size = max(1, flush_size)
+        self.flush_interval = max(0.001, flush_interval_ms / 1000)
+        self.max_batch = max(1, max_batch)
+        self.max_pending = max_pending
+        self.fsync = fsync
+
+        self.segments = OrderedDict()
+        self._current = None
+        self._spooled = 0
+        self._waiting = []
+        self._writer = None
+        self._flusher = None
+        self._io_lock = None
+        self._flush_lock = None
+        self._flush_now = None
+
+        self.accepted = 0
+        self.rejected = 0
+        self.replayed = 0
+        self.appends = 0
+        self.write_errors = 0
+        self.flushes = 0
+        self.flushed = 0
+        self.rows_written = 0
+        self.flush_errors = 0
+        self.flush_seconds = 0.0
+        self.last_error = None
+        self.last_flush_at = None
+
+    @property
+    def running(self):
+        return self._flusher is not None and not self._flusher.done()
+
+    @property
+    def pending(self):
+        """Reports accepted (or being appended) and not yet written to the database."""
+        return self._spooled + len(self._waiting)
+
+    async def start(self):
+        if self.running:
+            return
+        self._io_lock = asyncio.Lock()
+        self._flush_lock = asyncio.Lock()
+        self._flush_now = asyncio.Event()
+        self.path.mkdir(parents=True, exist_ok=True)
+        await self._adopt()
+        self._flusher = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Writes what it can to the database; the rest stays spooled for the next start."""
+        if self._io_lock is None:
+            return
+        if self._flusher is not None:
+            self._flusher.cancel()
+            try:
+                await self._flusher
+            except asyncio.CancelledError:
+                pass
+            self._flusher = None
+        if self._writer is not None:
+            await asyncio.gather(self._writer, return_exceptions=True)
+        try:
+            while await self.flush():
+                pass
+        except Exception as e:
+            print(f"Report spool: {self._spooled} reports left in {self.path} for the next start ({e})")
+        for segment in self.segments.values():
+            if segment.reports:
+                segment.close()
+            else:
+                segment.discard()
+        self.segments.clear()
+        self._current = None
+        self._spooled = 0
+
+    async def submit(self, report: dict):
+        """Spools one report (a JSON-serializable dict) and returns once it is durable."""
+        if not self.running:
+            raise RuntimeError("Report spool is not running")
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise SpoolFullError(f"Report spool is full ({self.pending} reports waiting for the database)")
+        line = (json.dumps(report, separators=(",", ":")) + "\n").encode()
+        future = asyncio.get_running_loop().create_future()
+        self._waiting.append((line, report, future))
+        if self._writer is None or self._writer.done():
+            self._writer = asyncio.create_task(self._write())
+        await future
+        self.accepted += 1
+
+    async def _write(self):
+        async with self._io_lock:
+            while self._waiting:
+                group, self._waiting = self._waiting, []
+                try:
+                    if self._current is None:
+                        self._current = await asyncio.to_thread(Segment.create, self.path)
+                        self.segments[self._current.name] = self._current
+                    await asyncio.to_thread(self._current.append, [line for line, _, _ in group], self.fsync)
+                except Exception as e:
+                    self.write_errors += 1
+                    for _, _, future in group:
+                        if not future.done():
+                            future.set_exception(e)
+                    continue
+                self.appends += 1
+                self._current.reports.extend(report for _, report, _ in group)
+                self._spooled += len(group)
+                # A caller that went away still had its report spooled
+                for _, _, future in group:
+                    if not future.done():
+                        future.set_result(None)
+                if self._spooled >= self.flush_size:
+                    self._flush_now.set()
+
+    async def flush(self):
+        """
+        Writes the oldest spooled segments (up to max_batch reports) in one
+        transaction. Returns True if more segments are waiting.
+        """
+        # One flush at a time, or two could pick the same segments
+        async with self._flush_lock:
+            return await self._flush()
+
+    async def _flush(self):
+        async with self._io_lock:
+            # Seal the current segment; the next append starts a new one
+            if self._current is not None and self._current.reports:
+                self._current = None
+            batch, n = [], 0
+            for segment in self.segments.values():
+                if segment is self._current:
+                    break
+                if batch and n + len(segment.reports) > self.max_batch:
+                    break
+                batch.append(segment)
+                n += len(segment.reports)
+        if not batch:
+            return False
+
+        start = time.perf_counter()
+        try:
+            ids = await self.db.run(self.apply, self.db, segments={s.name: s.reports for s in batch})
+        except Exception as e:
+            self.flush_errors += 1
+            self.last_error = f"{type(e).__name__}: {e}"
+            raise
+        for segment in batch:
+            segment.discard()
+            del self.segments[segment.name]
+            self._spooled -= len(segment.reports)
+        self.flushes += 1
+        self.flushed += n
+        self.rows_written += len(ids)
+        self.flush_seconds += time.perf_counter() - start
+        self.last_flush_at = time.time()
+        self.last_error = None
+        return any(segment is not self._current for segment in self.segments.values())
+
+    async def _adopt(self):
+        async with self._io_lock:
+            adopted = await asyncio.to_thread(adopt_segments, self.path, set(self.segments))
+            for segment in adopted:
+                self.segments[segment.name] = segment
+                self._spooled += len(segment.reports)
+            if self._current is not None:
+                # The current segment stays last: flush() stops there
+                self.segments.move_to_end(self._current.name)
+        if adopted:
+            n = sum(len(s.reports) for s in adopted)
+            self.replayed += n
+            print(f"Report spool: replaying {n} reports from {len(adopted)} segments in {self.path}")
+            self._flush_now.set()
+
+    async def _maintain(self):
+        try:
+            await self._adopt()
+            if self.prune is not None:
+                await self.db.run(self.prune, self.db)
+        except Exception as e:
+            print(f"Report spool maintenance failed: {e}")
+
+    async def _run(self):
+        wait = self.flush_interval
+        next_maintenance = time.monotonic() + MAINTENANCE_SECONDS
+        while True:
+            if wait > self.flush_interval:
+                # Backing off after a failure: a full spool does not cut it short
+                await asyncio.sleep(wait)
+            else:
+                try:
+                    await asyncio.wait_for(self._flush_now.wait(), wait)
+                except asyncio.TimeoutError:
+                    pass
+            self._flush_now.clear()
+            try:
+                while await self.flush():
+                    pass
+                wait = self.flush_interval
+            except Exception as e:
+                wait = min(wait * 2, MAX_RETRY_SECONDS)
+                print(f"Report flush failed, {self._spooled} reports spooled; retrying in {wait:.1f}s: {e}")
+            if time.monotonic() >= next_maintenance:
+                next_maintenance = time.monotonic() + MAINTENANCE_SECONDS
+                await self._maintain()
+
+    def stats(self) -> dict:
+        return {
+            "path": str(self.path),
+            "running": self.running,
+            "pending": self.pending,
+            "segments": len(self.segments),
+            "accepted": self.accepted,
+            "rejected": self.rejected,
+            "replayed": self.replayed,
+            "appends": self.appends,
+            "write_errors": self.write_errors,
+            "flushes": self.flushes,
+            "flushed_reports": self.flushed,
+            "rows_written": self.rows_written,
+            "reports_per_row": self.flushed / self.rows_written if self.rows_written else 0.0,
+            "flush_ms_avg": round(self.flush_seconds / self.flushes * 1000, 3) if self.flushes else 0.0,
+            "flush_errors": self.flush_errors,
+            "last_error": self.last_error,
+            "last_flush_at": self.last_flush_at,
+        }
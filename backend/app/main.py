@@ -1,13 +1,29 @@
 from urllib import parse
 from pathlib import Path
+from contextlib import asynccontextmanager
 import sys
-from fastapi import FastAPI, HTTPException, Form, File, UploadFile
-from fastapi.responses import JSONResponse
+import asyncio
+from email.utils import format_datetime, parsedate_to_datetime
+from fastapi import FastAPI, HTTPException, Form, File, UploadFile, Query, Request, Response
+from fastapi.responses import JSONResponse, PlainTextResponse
 from typing import Optional, List
 from pydantic import BaseModel, HttpUrl, constr
-from db import get_db_connection
-import json
+from db import Database
+from verdict_cache import VerdictCache, canonicalize_url
+from batching import MicroBatcher, QueueFullError
+from uploads import RequestBodyLimit, UploadTooLarge, store_attachments
+from domain_index import DomainIndexHolder, DENY
+from snapshots import SnapshotStore
+from similarity import SimilarityIndexHolder
+from admission import AdmissionControl, FULL, FALLBACK, CACHE, DOMAIN_INDEX, QUEUE_FULL, DEADLINE
+from ingest import ReportIngestor, SpoolFullError, REPORT_SPOOL_DIR
+import metrics
+from reports import (
+    apply_reports, insert_report, new_report, prune_spool_markers,
+    list_reports, parse_fields, report_stats, reports_version, etag_for
+)
 import os
+import time
 
 
 # Add project root to Python path
@@ -17,7 +33,11 @@ if str(ROOT_DIR) not in sys.path:
 
 # Import from model
 try:
-    from model.predict import predict_single
+    from model.predict import (
+        predict_batch, predict_fallback, has_fallback, model_version, registry as model_registry, set_stage_observer,
+        load_model, is_ready, WARMUP_URLS
+    )
+    from model.utils import host_memo
 except ImportError as e:
     print(f"Import error: {e}")
     raise
@@ -32,40 +52,573 @@ class ReportForm(BaseModel):
     reporter_contact: Optional[constr(strip_whitespace=True, max_length=100)] = None
 
 
-app = FastAPI(docs_url="/docs", redoc_url="/redoc")
+class BatchCheckRequest(BaseModel):
+    urls: List[str]
+
+
+# Upper bound on URLs accepted by a single POST /check-urls call
+MAX_BATCH_URLS = int(os.getenv("MAX_BATCH_URLS", "500"))
+
+# Verdicts are cached per (model version, canonical URL)
+verdict_cache = VerdictCache(
+    maxsize=int(os.getenv("VERDICT_CACHE_SIZE", "10000")),
+    ttl=float(os.getenv("VERDICT_CACHE_TTL", "300")),
+)
+
+
+# Single /check-url requests are scored in small batches on a dedicated pool
+inference = MicroBatcher(
+    predict_batch,
+    max_batch_size=int(os.getenv("INFERENCE_MAX_BATCH", "32")),
+    max_wait_ms=float(os.getenv("INFERENCE_MAX_WAIT_MS", "2")),
+    max_queue=int(os.getenv("INFERENCE_QUEUE_SIZE", "1024")),
+    workers=int(os.getenv("INFERENCE_WORKERS", "1")),
+    executor=os.getenv("INFERENCE_EXECUTOR", "thread"),
+    capture=metrics.capture_stages,
+)
+
+# Per-request latency budget: over it, urls are answered by the numeric-only
+# fallback model instead of waiting for the full one
+admission = AdmissionControl(inference)
+# Upper bound on the deadline_ms a client may ask for
+MAX_DEADLINE_MS = float(os.getenv("MAX_DEADLINE_MS", "5000"))
+# Full-model computations that outlived their request; kept referenced
+# until they finish and fill the verdict cache
+_late_scores = set()
+
+# Model stage timings (features, classifier) go to the stage histogram; with
+# the process executor they are recorded in the workers and not reported
+set_stage_observer(metrics.observe_model_stage)
+
+
+# Known allow/deny hosts answered without running the model
+domain_index = DomainIndexHolder()
+
+# Near-duplicates of known-bad urls (MinHash/LSH), reported alongside model verdicts
+similar_urls = SimilarityIndexHolder()
+
+# Hashed snapshots of the index that the extension syncs and checks locally
+snapshots = SnapshotStore()
+
+# Pooled connections to the reports database, opened in the lifespan hook
+db = Database()
+
+# Reports are acknowledged once spooled to disk and written to the database
+# in coalesced batches; without REPORT_SPOOL_DIR each one is inserted inline
+report_ingest = ReportIngestor(db, apply_reports, prune=prune_spool_markers) if REPORT_SPOOL_DIR else None
+
+# Model loading and warm-up run in the background from the lifespan hook, so
+# the process answers /healthz (and domain-index hits) while they finish
+startup = {"started_at": time.time(), "warm_up_ms": None, "ready_at": None, "error": None}
+_startup_task = None
+
+MAX_REPORTS_PAGE = int(os.getenv("MAX_REPORTS_PAGE", "200"))
+
+# Scrape-time views of the stats the components already keep
+metrics.Collector("urlcheck_inference_queue_depth", "URLs waiting for a batch", inference.queue_depth)
+metrics.Collector("urlcheck_inference_rejected_total", "Requests rejected with a full inference queue",
+                  lambda: inference.rejected, kind="counter")
+metrics.Collector("urlcheck_inference_batches_total", "Micro-batches scored", lambda: inference.batches, kind="counter")
+metrics.Collector("urlcheck_verdict_cache_entries", "Entries in the verdict cache", lambda: verdict_cache.stats()["size"])
+metrics.Collector("urlcheck_verdict_cache_lookups_total", "Verdict cache lookups by result",
+                  lambda: {(k,): v for k, v in verdict_cache.stats().items() if k in ("hits", "misses", "coalesced")},
+                  kind="counter", labelnames=["result"])
+metrics.Collector("urlcheck_host_memo_entries", "Hosts in the numeric feature memo", lambda: host_memo.stats()["size"])
+metrics.Collector("urlcheck_host_memo_lookups_total", "Host feature memo lookups by result",
+                  lambda: {(k,): v for k, v in host_memo.stats().items() if k in ("hits", "misses")},
+                  kind="counter", labelnames=["result"])
+metrics.Collector("urlcheck_verdict_tier_total", "Verdicts by the tier that answered",
+                  lambda: {(k,): v for k, v in admission.tiers.items()}, kind="counter", labelnames=["tier"])
+metrics.Collector("urlcheck_degraded_total", "Verdicts not answered by the full model, by tier and reason",
+                  lambda: dict(admission.reasons), kind="counter", labelnames=["tier", "reason"])
+metrics.Collector("urlcheck_inference_estimated_wait_seconds", "Estimated queue wait of a url submitted now",
+                  inference.estimated_wait)
+metrics.Collector("urlcheck_similar_known_bad_total", "Near-duplicate lookups against known-bad urls by result",
+                  lambda: {("hit",): similar_urls.hits, ("miss",): similar_urls.misses},
+                  kind="counter", labelnames=["result"])
+metrics.Collector("urlcheck_snapshot_seq", "Latest published verdict snapshot (0 if none)",
+                  lambda: snapshots.latest["seq"] if snapshots.latest else 0)
+metrics.Collector("urlcheck_snapshot_served_total", "Verdict snapshots served, full or as a diff",
+                  lambda: {(k,): v for k, v in snapshots.served.items()}, kind="counter", labelnames=["kind"])
+metrics.Collector("urlcheck_model_info", "Live model release (value is always 1)",
+                  lambda: {(model_version() or "none", model_registry.stats()["backend"]): 1},
+                  labelnames=["version", "backend"])
+metrics.Collector("urlcheck_model_reloads_total", "Model releases swapped in without a restart",
+                  lambda: model_registry.reloads, kind="counter")
+if report_ingest is not None:
+    metrics.Collector("urlcheck_report_spool_pending", "Reports spooled and not yet written to the database",
+                      lambda: report_ingest.pending)
+    metrics.Collector("urlcheck_reports_spooled_total", "Reports accepted into the spool, or refused when it was full",
+                      lambda: {("accepted",): report_ingest.accepted, ("rejected",): report_ingest.rejected},
+                      kind="counter", labelnames=["result"])
+    metrics.Collector("urlcheck_report_flushes_total", "Spool flushes to the database by result",
+                      lambda: {("ok",): report_ingest.flushes, ("error",): report_ingest.flush_errors},
+                      kind="counter", labelnames=["result"])
+    metrics.Collector("urlcheck_report_flushed_total", "Spooled reports written, and the coalesced url rows they became",
+                      lambda: {("reports",): report_ingest.flushed, ("rows",): report_ingest.rows_written},
+                      kind="counter", labelnames=["kind"])
+
+
+def cache_key(url: str):
+    return (model_version(), canonicalize_url(url))
+
+
+def is_valid_url(url: str) -> bool:
+    """True if the URL has both a scheme and a network location."""
+    try:
+        parsed = parse.urlparse(url)
+    except ValueError:
+        return False
+    return bool(parsed.scheme and parsed.netloc)
+
+
+def validator_headers(etag: str, last_modified=None) -> dict:
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if last_modified is not None:
+        headers["Last-Modified"] = format_datetime(last_modified, usegmt=True)
+    return headers
+
+
+def not_modified(request: Request, etag: str, last_modified=None) -> bool:
+    """True if the client's If-None-Match / If-Modified-Since validators still match."""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [t.strip().removeprefix("W/") for t in if_none_match.split(",")]
+        return etag in tags or "*" in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if last_modified is not None and if_modified_since:
+        try:
+            return last_modified.replace(microsecond=0) <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def verdict(url: str, label: str, probability, source: str = "model", tier: str = FULL) -> dict:
+    return {
+        "url": url,
+        "is_malicious": label == "malicious",
+        "label": label,
+        "confidence": float(probability) if probability is not None else None,
+        "source": source,
+        "tier": tier,
+    }
+
+
+def index_verdict(url: str, hit: dict) -> dict:
+    denied = hit["verdict"] == DENY
+    result = verdict(url, "malicious" if denied else "benign", 1.0 if denied else 0.0, "domain_index", DOMAIN_INDEX)
+    result["matched"] = hit["matched"]
+    return result
+
+
+def fallback_verdict(url: str, scored, reason: str) -> dict:
+    label, probability = scored
+    result = verdict(url, label, probability, "fallback_model", FALLBACK)
+    result["degraded_reason"] = reason
+    return result
+
+
+def _keep_late_score(task):
+    """Lets a timed-out full-model computation finish in the background (it fills the cache)."""
+    _late_scores.add(task)
+    task.add_done_callback(_late_scores.discard)
+    task.add_done_callback(lambda t: t.cancelled() or t.exception())
+
+
+def add_similarity(result: dict, trace=None) -> dict:
+    """Adds the "similar to known-bad" signal (or None) to a model verdict."""
+    with metrics.stage("similarity", trace):
+        result["similar_known_bad"] = similar_urls.lookup([result["url"]])[0]
+    return result
+
+
+def count_verdict(result: dict, version=None):
+    metrics.VERDICTS.inc(label=result["label"], source=result["source"], model_version=version or "")
+
+
+async def score_url(url: str, info: dict, trace=None):
+    """Scores one URL through the micro-batcher, recording queue and model timings."""
+    start = time.perf_counter()
+    try:
+        return await inference.submit(url, info)
+    finally:
+        metrics.observe_inference(info, time.perf_counter() - start, trace)
+
+
+async def load_and_warm_up():
+    """
+    Loads the model off the event loop (a no-op when serve.py preloaded it
+    before forking), then scores one url through the micro-batcher so the
+    inference pool and feature code are warm before /readyz reports ready.
+    """
+    try:
+        model = await asyncio.to_thread(load_model)
+        if model is None:
+            startup["error"] = model_registry.last_error or "No model artifact found"
+            # The registry keeps retrying; a release published later is picked up
+            while not is_ready():
+                await asyncio.sleep(1)
+            startup["error"] = None
+        start = time.perf_counter()
+        await inference.submit(WARMUP_URLS[-1], {})
+        startup["warm_up_ms"] = round((time.perf_counter() - start) * 1000, 3)
+        startup["ready_at"] = time.time()
+    except Exception as e:
+        startup["error"] = f"{type(e).__name__}: {e}"
+        print(f"Model warm-up failed: {startup['error']}")
+
+
+def model_unavailable():
+    """503 for requests that need the model before it has loaded."""
+    metrics.ERRORS.inc(endpoint="model", kind="not_ready")
+    detail = "Model is still loading" if startup["error"] is None else "Model is not available"
+    return HTTPException(status_code=503, detail=detail, headers={"Retry-After": "1"})
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global _startup_task
+    await inference.start()
+    _startup_task = asyncio.create_task(load_and_warm_up())
+    try:
+        await db.run(db.open)
+    except Exception as e:
+        # The URL checker still works without a database; reports will fail
+        # (or, with the spool, wait in it)
+        print(f"Database unavailable: {e}")
+    if report_ingest is not None:
+        # Replays reports a previous run spooled but did not write
+        await report_ingest.start()
+    try:
+        yield
+    finally:
+        _startup_task.cancel()
+        if report_ingest is not None:
+            await report_ingest.stop()
+        await inference.stop()
+        await db.run(db.close)
+
+
+app = FastAPI(docs_url="/docs", redoc_url="/redoc", lifespan=lifespan)
+# Oversized report uploads are refused before the form parser spools them
+app.add_middleware(RequestBodyLimit, paths=("/api/report",),
+                   on_reject=lambda path: metrics.ERRORS.inc(endpoint=path, kind="upload_too_large"))
+app.add_middleware(metrics.MetricsMiddleware)
 
 @app.get("/")
 def read_root():
     return {"message": "Use GET /check-url?url=<your_url> to check if URL is malicious"}
 
+
+@app.get("/healthz")
+def liveness():
+    """Liveness: the process serves requests. Does not wait for the model."""
+    return {"status": "ok", "uptime_seconds": round(time.time() - startup["started_at"], 3),
+            "model": model_registry.state}
+
+
+@app.get("/readyz")
+def readiness():
+    """Readiness: 200 once the model is loaded and warmed up, 503 until then (or if loading failed)."""
+    ready = is_ready() and startup["ready_at"] is not None
+    body = {
+        "status": "ready" if ready else model_registry.state,
+        "model_version": model_version(),
+        "load_seconds": model_registry.load_seconds,
+        "warm_up_ms": startup["warm_up_ms"],
+        "error": startup["error"],
+    }
+    return JSONResponse(content=body, status_code=200 if ready else 503)
+
 @app.get("/check-url")
-def check_url(url: str):
+async def check_url(url: str, deadline_ms: Optional[float] = Query(None, gt=0, le=MAX_DEADLINE_MS)):
     """
     Accepts a URL via query string and returns prediction:
-    - Returns JSON with prediction and confidence score
+    - Returns JSON with prediction, confidence score and the tier that answered
+      (domain_index, cache, full or fallback)
+    - Over the latency budget (CHECK_URL_DEADLINE_MS or deadline_ms) the
+      numeric-only fallback model answers instead of the full model
     Example: GET /check-url?url=https://example.com
     """
+    start = time.perf_counter()
+    trace = metrics.tracer.start("/check-url")
     try:
         # Validate URL format
-        parsed = parse.urlparse(url)
+        with metrics.stage("validate", trace):
+            parsed = parse.urlparse(url)
         if not parsed.scheme or not parsed.netloc:
+            metrics.ERRORS.inc(endpoint="/check-url", kind="invalid_url")
             raise HTTPException(status_code=400, detail="Invalid URL format")
 
-        # Get prediction
-        label, probability = predict_single(url)
-        
-        return {
-            "url": url,
-            "is_malicious": label == "malicious",
-            "label": label,
-            "confidence": float(probability) if probability is not None else None
-        }
+        # Known hosts short-circuit the model
+        with metrics.stage("domain_index", trace):
+            hit = domain_index.lookup(url)
+        if hit is not None:
+            result = index_verdict(url, hit)
+            admission.record(DOMAIN_INDEX)
+            count_verdict(result)
+            return result
+        if not is_ready():
+            raise model_unavailable()
+
+        # Get prediction. Cached per canonical form, but the model scores the
+        # url as submitted: it was trained on raw urls
+        key = cache_key(url)
+        deadline_at = admission.deadline_at(start, deadline_ms)
+        reason = admission.admit(deadline_at) if has_fallback() else None
+        if reason is not None:
+            # Over budget: a cached full-model verdict, else the fallback
+            with metrics.stage("cache", trace):
+                cached = verdict_cache.get(key)
+            if cached is None:
+                return degrade(url, key, reason, trace)
+            result = add_similarity(verdict(url, *cached, tier=CACHE), trace)
+            admission.record(CACHE, reason)
+            count_verdict(result, key[0])
+            return result
+
+        info = {}
+        lookup_start = time.perf_counter()
+        task = asyncio.ensure_future(verdict_cache.get_or_compute_async(
+            key, lambda: score_url(url, info, trace)
+        ))
+        try:
+            if has_fallback():
+                label, probability = await asyncio.wait_for(
+                    asyncio.shield(task), max(0.0, deadline_at - time.perf_counter())
+                )
+            else:
+                label, probability = await task
+        except asyncio.TimeoutError:
+            _keep_late_score(task)
+            return degrade(url, key, DEADLINE, trace)
+        except QueueFullError:
+            if not has_fallback():
+                raise
+            return degrade(url, key, QUEUE_FULL, trace)
+
+        tier = FULL
+        if not info:
+            # Answered by the cache (or by waiting on an identical miss in flight)
+            tier = CACHE
+            elapsed = time.perf_counter() - lookup_start
+            metrics.STAGE_SECONDS.observe(elapsed, stage="cache")
+            if trace is not None:
+                trace.add("cache", elapsed, hit=True)
+
+        result = add_similarity(verdict(url, label, probability, tier=tier), trace)
+        admission.record(tier)
+        count_verdict(result, key[0])
+        return result
     except HTTPException:
         raise
+    except QueueFullError as e:
+        metrics.ERRORS.inc(endpoint="/check-url", kind="queue_full")
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
     except Exception as e:
+        metrics.ERRORS.inc(endpoint="/check-url", kind="prediction")
         raise HTTPException(status_code=500, detail=f"Prediction error: {str(e)}")
+    finally:
+        metrics.tracer.finish(trace)
+
+
+def degrade(url: str, key, reason: str, trace=None) -> dict:
+    """Answers one url with the fallback model after the full model was skipped or timed out."""
+    with metrics.stage("fallback", trace, reason=reason):
+        scored = predict_fallback([url])
+    if scored is None:
+        # The release swapped in meanwhile has no fallback model
+        raise QueueFullError("Inference is over its latency budget")
+    result = add_similarity(fallback_verdict(url, scored[0], reason), trace)
+    admission.record(FALLBACK, reason)
+    count_verdict(result, key[0])
+    return result
+
+
+@app.post("/check-urls")
+def check_urls(body: BatchCheckRequest):
+    """
+    Accepts a JSON body {"urls": [...]} and scores all valid URLs in one model call.
+    - Results are returned in input order
+    - Invalid URLs get an "error" entry instead of failing the whole batch
+    - While the single-url queue is over its budget, cache misses are scored
+      by the fallback model (tier "fallback")
+    """
+    if not body.urls:
+        raise HTTPException(status_code=400, detail="No URLs provided")
+    if len(body.urls) > MAX_BATCH_URLS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Too many URLs: {len(body.urls)} (max {MAX_BATCH_URLS})"
+        )
+
+    start = time.perf_counter()
+    results = [None] * len(body.urls)
+    valid_idx = []
+    index_hits = 0
+    index_seconds = 0.0
+    for i, url in enumerate(body.urls):
+        if not is_valid_url(url):
+            results[i] = {"url": url, "error": "Invalid URL format"}
+            continue
+        lookup_start = time.perf_counter()
+        hit = domain_index.lookup(url)
+        index_seconds += time.perf_counter() - lookup_start
+        if hit is not None:
+            results[i] = index_verdict(url, hit)
+            index_hits += 1
+        else:
+            valid_idx.append(i)
+    metrics.STAGE_SECONDS.observe(time.perf_counter() - start - index_seconds, stage="validate")
+    metrics.STAGE_SECONDS.observe(index_seconds, stage="domain_index")
+    if valid_idx and not is_ready():
+        raise model_unavailable()
+
+    # Serve what we can from the cache, score the distinct misses in one call
+    with metrics.stage("cache"):
+        keys = {i: cache_key(body.urls[i]) for i in valid_idx}
+        # First submitted url of each key: the one scored on a miss
+        submitted = {}
+        for i, key in keys.items():
+            submitted.setdefault(key, body.urls[i])
+        cached = {}
+        misses = []
+        for key in submitted:
+            hit = verdict_cache.get(key)
+            if hit is None:
+                misses.append(key)
+            else:
+                cached[key] = hit
+
+    reason = admission.admit(admission.deadline_at(start)) if misses and has_fallback() else None
+    try:
+        if reason is None:
+            with metrics.stage("inference"):
+                scored = predict_batch([submitted[key] for key in misses])
+        else:
+            with metrics.stage("fallback"):
+                scored = predict_fallback([submitted[key] for key in misses])
+    except Exception as e:
+        metrics.ERRORS.inc(endpoint="/check-urls", kind="prediction")
+        raise HTTPException(status_code=500, detail=f"Prediction error: {str(e)}")
+
+    # Fallback verdicts are not cached: the full model should answer next time
+    fallback = {}
+    for key, result in zip(misses, scored):
+        if reason is None:
+            verdict_cache.put(key, result)
+            cached[key] = result
+        else:
+            fallback[key] = result
+
+    missed = set(misses)
+    for i in valid_idx:
+        key = keys[i]
+        if key in fallback:
+            results[i] = fallback_verdict(body.urls[i], fallback[key], reason)
+        else:
+            results[i] = verdict(body.urls[i], *cached[key], tier=FULL if key in missed else CACHE)
+    with metrics.stage("similarity"):
+        for i, similar in zip(valid_idx, similar_urls.lookup([body.urls[i] for i in valid_idx])):
+            results[i]["similar_known_bad"] = similar
+    tiers = {}
+    for result in results:
+        if "tier" in result:
+            tiers[result["tier"]] = tiers.get(result["tier"], 0) + 1
+    for tier, n in tiers.items():
+        admission.record(tier, reason if tier == FALLBACK else None, n)
+    for i, result in enumerate(results):
+        if "error" in result:
+            metrics.ERRORS.inc(endpoint="/check-urls", kind="invalid_url")
+        else:
+            count_verdict(result, keys[i][0] if i in keys else None)
+
+    return {
+        "results": results,
+        "count": len(results),
+        "scored": len(valid_idx) + index_hits,
+        "errors": len(results) - len(valid_idx) - index_hits,
+        "index_hits": index_hits,
+        "cache_hits": len(cached) - (len(misses) if reason is None else 0),
+        "tiers": tiers,
+        "elapsed_ms": round((time.perf_counter() - start) * 1000, 3)
+    }
     
 
+@app.get("/cache/stats")
+def cache_stats():
+    """Hit/miss/eviction counters for the verdict cache."""
+    return {"model_version": model_version(), **verdict_cache.stats()}
+
+
+@app.get("/domain-index/stats")
+def domain_index_stats():
+    """Version, size and hit counters of the known-domain index."""
+    return domain_index.stats()
+
+
+@app.get("/similarity/stats")
+def similarity_stats():
+    """Version, size and hit counters of the known-bad near-duplicate index."""
+    return similar_urls.stats()
+
+
+@app.get("/snapshot")
+def verdict_snapshot(request: Request):
+    """Latest hashed snapshot of the known allow/deny hosts and domains."""
+    snapshot = snapshots.current()
+    if snapshot is None:
+        raise HTTPException(status_code=404, detail="No verdict snapshot has been published")
+    etag = f'"snapshot-{snapshot["seq"]}"'
+    if not_modified(request, etag):
+        return Response(status_code=304, headers=validator_headers(etag))
+    return JSONResponse(content=snapshot, headers=validator_headers(etag))
+
+
+@app.get("/snapshot/diff")
+def verdict_snapshot_diff(request: Request, since: int = Query(..., ge=0)):
+    """Hashes added/removed since snapshot `since`; the full snapshot if it is no longer kept."""
+    diff = snapshots.diff(since)
+    if diff is None:
+        raise HTTPException(status_code=404, detail="No verdict snapshot has been published")
+    etag = f'"snapshot-{since}-{diff["seq"]}"'
+    if not_modified(request, etag):
+        return Response(status_code=304, headers=validator_headers(etag))
+    return JSONResponse(content=diff, headers=validator_headers(etag))
+
+
+@app.get("/snapshot/stats")
+def verdict_snapshot_stats():
+    """Published snapshot sequence numbers, size and false-positive-rate stats, serve counters."""
+    return snapshots.stats()
+
+
+@app.get("/model")
+def model_info():
+    """Live model release (manifest, reloads) and shadow-scoring disagreement."""
+    return model_registry.stats()
+
+
+@app.get("/inference/stats")
+def inference_stats():
+    """Micro-batching queue metrics, admission control and tier counts, plus the host feature memo."""
+    return {**inference.stats(), "admission": admission.stats(), "host_memo": host_memo.stats()}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    """Stage latency histograms and request/verdict/error counters, Prometheus text format."""
+    return PlainTextResponse(metrics.REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/metrics/traces")
+def sampled_traces(limit: int = Query(50, ge=1, le=1000)):
+    """Most recent sampled per-request stage traces (TRACE_SAMPLE_RATE), newest first."""
+    traces = list(metrics.tracer.traces)[::-1][:limit]
+    return {"sample_rate": metrics.tracer.sample_rate, "count": len(traces), "traces": traces}
+
+
 @app.post("/api/report")
 async def submit_report(
     url: str = Form(...),
@@ -77,59 +630,125 @@ async def submit_report(
     reporter_contact: Optional[str] = Form(None),
     attachments: List[UploadFile] = File(default=[])
 ):
+    trace = metrics.tracer.start("/api/report")
     try:
-        # Validate input via Pydantic
-        form_data = ReportForm(
-            url=url,
-            description=description,
-            headers=headers,
-            severity=severity,
-            anonymous=anonymous.lower() == "true",
-            reporter_name=reporter_name,
-            reporter_contact=reporter_contact,
+        try:
+            # Validate input via Pydantic
+            with metrics.stage("form_validate", trace):
+                form_data = ReportForm(
+                    url=url,
+                    description=description,
+                    headers=headers,
+                    severity=severity,
+                    anonymous=anonymous.lower() == "true",
+                    reporter_name=reporter_name,
+                    reporter_contact=reporter_contact,
+                )
+        except Exception as e:
+            metrics.ERRORS.inc(endpoint="/api/report", kind="validation")
+            raise HTTPException(status_code=400, detail=f"Validation error: {e}")
+
+        # Save files (optional): streamed to disk, stored once per content hash
+        try:
+            with metrics.stage("upload", trace, files=len(attachments)):
+                stored_files = await store_attachments(attachments)
+        except UploadTooLarge as e:
+            metrics.ERRORS.inc(endpoint="/api/report", kind="upload_too_large")
+            raise HTTPException(status_code=413, detail=str(e))
+
+        url = str(form_data.url)
+        report = new_report(
+            url, canonicalize_url(url), form_data.description, form_data.headers, form_data.severity,
+            form_data.anonymous, form_data.reporter_name, form_data.reporter_contact, stored_files,
         )
+        if report_ingest is not None:
+            # Acknowledged once on disk; written to the database with the next batch
+            try:
+                with metrics.stage("spool", trace):
+                    await report_ingest.submit(report)
+            except SpoolFullError as e:
+                metrics.ERRORS.inc(endpoint="/api/report", kind="spool_full")
+                raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+            except Exception as e:
+                metrics.ERRORS.inc(endpoint="/api/report", kind="spool")
+                raise HTTPException(status_code=500, detail=f"Spool error: {e}")
+            return JSONResponse(status_code=202, content={
+                "status": "accepted",
+                "canonical_url": report["canonical_url"],
+                "attachments": stored_files
+            })
+
+        # Insert into DB safely using parameterized query (rollups in the same transaction)
+        try:
+            with metrics.stage("db_insert", trace):
+                new_id = await db.run(insert_report, db, report)
+        except Exception as e:
+            metrics.ERRORS.inc(endpoint="/api/report", kind="database")
+            raise HTTPException(status_code=500, detail=f"Database error: {e}")
+
+        return JSONResponse(content={
+            "status": "success",
+            "report_id": new_id,
+            "attachments": stored_files
+        })
+    finally:
+        metrics.tracer.finish(trace)
+
+
+@app.get("/api/reports")
+async def get_reports(
+    request: Request,
+    limit: int = Query(50, ge=1),
+    cursor: Optional[int] = None,
+    fields: Optional[str] = None,
+    severity: Optional[str] = None,
+):
+    """
+    Newest-first page of reports with keyset pagination.
+    - Pass the returned next_cursor as ?cursor= to get the following page
+    - ?fields=id,url,... selects columns (reporter details are never returned)
+    """
+    limit = min(limit, MAX_REPORTS_PAGE)
+    try:
+        columns = parse_fields(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    try:
+        version = await db.run(reports_version, db)
+        etag = etag_for(version, "reports", limit, cursor, columns, severity)
+
+        if not_modified(request, etag, version["last_modified"]):
+            return Response(status_code=304, headers=validator_headers(etag, version["last_modified"]))
+        items, next_cursor = await db.run(list_reports, db, limit, cursor, fields, severity)
     except Exception as e:
-        raise HTTPException(status_code=400, detail=f"Validation error: {e}")
-
-    # Save files (optional)
-    upload_dir = "uploads"
-    os.makedirs(upload_dir, exist_ok=True)
-    file_names = []
-    for file in attachments:
-        file_path = os.path.join(upload_dir, file.filename)
-        with open(file_path, "wb") as f:
-            f.write(await file.read())
-        file_names.append(file.filename)
-
-    # Insert into DB safely using parameterized query
+        raise HTTPException(status_code=500, detail=f"Database error: {e}")
+
+    return JSONResponse(
+        content={"items": items, "next_cursor": next_cursor, "limit": limit},
+        headers=validator_headers(etag, version["last_modified"]),
+    )
+
+
+@app.get("/api/reports/ingest")
+def report_ingest_stats():
+    """Report spool: pending reports, flushes, and how many reports each written row coalesced."""
+    if report_ingest is None:
+        return {"enabled": False}
+    return {"enabled": True, **report_ingest.stats()}
+
+
+@app.get("/api/reports/stats")
+async def get_report_stats(request: Request, top: int = Query(10, ge=1, le=100), days: int = Query(30, ge=1, le=366)):
+    """Server-side aggregates: counts by severity and day, top domains and hosts."""
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-        cur.execute("""
-            INSERT INTO reports (
-                url, description, headers, severity,
-                anonymous, reporter_name, reporter_contact, attachments
-            ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-            RETURNING id;
-        """, (
-            form_data.url,
-            form_data.description,
-            form_data.headers,
-            form_data.severity,
-            form_data.anonymous,
-            form_data.reporter_name,
-            form_data.reporter_contact,
-            json.dumps(file_names)
-        ))
-        new_id = cur.fetchone()["id"]
-        conn.commit()
-        cur.close()
-        conn.close()
+        version = await db.run(reports_version, db)
+        etag = etag_for(version, "stats", top, days)
+
+        if not_modified(request, etag, version["last_modified"]):
+            return Response(status_code=304, headers=validator_headers(etag, version["last_modified"]))
+        stats = await db.run(report_stats, db, top, days)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: {e}")
 
-    return JSONResponse(content={
-        "status": "success",
-        "report_id": new_id,
-        "attachments": file_names
-    })
\ No newline at end of file
+    return JSONResponse(content=stats, headers=validator_headers(etag, version["last_modified"]))
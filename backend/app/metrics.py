@@ -0,0 +1,281 @@
+# metrics.py
+import os
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# Fraction of /check-url and /api/report requests whose per-stage timings
+# are kept as a trace (GET /metrics/traces); 0 disables tracing
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0"))
+TRACE_BUFFER_SIZE = int(os.getenv("TRACE_BUFFER_SIZE", "200"))
+
+# Seconds; fine-grained at the low end where the model stages live
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    pairs += [f'{n}="{_escape(v)}"' for n, v in extra]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format (0.0.4)."""
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+class Counter:
+    """Monotonic counter with optional labels."""
+
+    kind = "counter"
+
+    def __init__(self, name, help, labelnames=(), registry=REGISTRY):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        registry.register(self)
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(n, "") for n in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_labels(self.labelnames, key)} {_number(v)}" for key, v in items]
+
+
+class Collector:
+    """
+    Values read at scrape time from stats the app already keeps: callback()
+    returns a number, or a dict of {label values tuple: number}.
+    """
+
+    def __init__(self, name, help, callback, kind="gauge", labelnames=(), registry=REGISTRY):
+        self.name = name
+        self.help = help
+        self.callback = callback
+        self.kind = kind
+        self.labelnames = tuple(labelnames)
+        registry.register(self)
+
+    def samples(self):
+        try:
+            value = self.callback()
+        except Exception:
+            return []
+        if value is None:
+            return []
+        values = value if isinstance(value, dict) else {(): value}
+        return [f"{self.name}{_labels(self.labelnames, key)} {_number(v)}" for key, v in sorted(values.items())]
+
+
+class Histogram:
+    """Cumulative-bucket histogram with optional labels."""
+
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS, registry=REGISTRY):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # labels -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+        registry.register(self)
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(n, "") for n in self.labelnames)
+        i = 0
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                break
+        else:
+            i = len(self.buckets)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[i] += 1
+            series[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self):
+        with self._lock:
+            items = sorted((key, list(series)) for key, series in self._series.items())
+        lines = []
+        for key, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series[:-1]):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, [('le', _number(bound))])} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_number(series[-1])}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+class Trace:
+    """Per-stage timings of one sampled request."""
+
+    def __init__(self, endpoint):
+        self.endpoint = endpoint
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        self.stages = []
+        self.attrs = {}
+
+    def add(self, stage, seconds, **attrs):
+        self.stages.append({"stage": stage, "ms": round(seconds * 1000, 3), **attrs})
+
+    def to_dict(self):
+        return {
+            "endpoint": self.endpoint,
+            "started_at": self.started_at,
+            "total_ms": round((time.perf_counter() - self._start) * 1000, 3),
+            **self.attrs,
+            "stages": list(self.stages),
+        }
+
+
+class Tracer:
+    def __init__(self, sample_rate=TRACE_SAMPLE_RATE, buffer_size=TRACE_BUFFER_SIZE):
+        self.sample_rate = sample_rate
+        self.traces = deque(maxlen=buffer_size)
+
+    def start(self, endpoint):
+        """A Trace for a sampled request, otherwise None."""
+        if self.sample_rate > 0 and random.random() < self.sample_rate:
+            return Trace(endpoint)
+        return None
+
+    def finish(self, trace):
+        if trace is not None:
+            self.traces.append(trace.to_dict())
+
+
+# Stage timings captured on the current thread (see capture_stages)
+_capture = threading.local()
+
+STAGE_SECONDS = Histogram(
+    "urlcheck_stage_duration_seconds",
+    "Time spent per request stage (validate, domain_index, cache, queue_wait, inference, fallback, similarity, "
+    "model stages, form_validate, upload, spool, db_insert)",
+    ["stage"],
+)
+REQUEST_SECONDS = Histogram(
+    "urlcheck_http_request_duration_seconds", "HTTP request latency by route", ["route", "method"],
+)
+REQUESTS = Counter("urlcheck_http_requests_total", "HTTP requests by route and status", ["route", "method", "status"])
+VERDICTS = Counter("urlcheck_verdicts_total", "URL verdicts returned", ["label", "source", "model_version"])
+ERRORS = Counter("urlcheck_errors_total", "Errors by endpoint and kind", ["endpoint", "kind"])
+tracer = Tracer()
+
+
+@contextmanager
+def stage(name, trace=None, **attrs):
+    """Times a block into STAGE_SECONDS (and the trace, if the request is sampled)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.observe(elapsed, stage=name)
+        if trace is not None:
+            trace.add(name, elapsed, **attrs)
+
+
+def observe_model_stage(name, seconds, n):
+    """Stage observer installed into model.predict; runs on the inference thread."""
+    STAGE_SECONDS.observe(seconds, stage=name)
+    captured = getattr(_capture, "stages", None)
+    if captured is not None:
+        captured.append({"stage": name, "ms": round(seconds * 1000, 3), "batch_size": n})
+
+
+def observe_inference(info, seconds, trace=None):
+    """Records one micro-batched prediction from the info dict MicroBatcher.submit() filled."""
+    STAGE_SECONDS.observe(seconds, stage="inference")
+    wait = info.get("queue_wait")
+    if wait is not None:
+        STAGE_SECONDS.observe(wait, stage="queue_wait")
+    if trace is not None:
+        if wait is not None:
+            trace.add("queue_wait", wait)
+        trace.add("inference", seconds, batch_size=info.get("batch_size"))
+        for entry in info.get("stages", ()):
+            trace.stages.append(entry)
+
+
+def capture_stages(fn, *args):
+    """Runs fn(*args) and returns (result, model stage timings recorded meanwhile on this thread)."""
+    _capture.stages = []
+    try:
+        return fn(*args), _capture.stages
+    finally:
+        _capture.stages = None
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency and status per route template."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            path = getattr(route, "path", "unmatched")
+            REQUEST_SECONDS.observe(time.perf_counter() - start, route=path, method=scope["method"])
+            REQUESTS.inc(route=path, method=scope["method"], status=str(status))
@@ -1,82 +1,534 @@
+import os
+import queue
+import random
 import sys
+import threading
+import time
+from collections import deque
 from pathlib import Path
-import pandas as pd
 import numpy as np
-import joblib
-import types
+import hashlib
 
 # Import the required functions
 from model.utils import numeric_features, COMMON_TLDS
+from model.releases import (
+    RELEASES_DIR, CURRENT, SHADOW, PIPELINE_NAME, SCORER_NAME, FALLBACK_NAME, read_pointer, verify_release
+)
 
-# Create a mock module to satisfy joblib's requirements
-mock_mp_main = types.ModuleType('__mp_main__')
-mock_mp_main.get_url_values = lambda x: np.array(x) if not isinstance(x, pd.DataFrame) else x['url'].values
-sys.modules['__mp_main__'] = mock_mp_main
-
+# Unversioned artifact, used until a release is published under RELEASES_DIR
 MODEL_FILE = Path(__file__).resolve().parent / 'url_pipeline.joblib'
 
-def safe_load_model():
-    """Safely load the model with proper function definitions"""
-    try:
-        # First try normal loading
-        return joblib.load(MODEL_FILE)
-    except AttributeError as e:
-        if "get_url_values" in str(e):
-            print("Patching missing get_url_values function...")
-            # Define the missing function in global scope
-            def get_url_values(x):
-                if isinstance(x, pd.DataFrame):
-                    return x['url'].values
-                return np.array(x)
-            
-            # Add to globals for joblib to find
-            import __main__
-            __main__.get_url_values = get_url_values
-            
-            # Try loading again
-            return joblib.load(MODEL_FILE)
-        else:
-            raise
+# "pipeline" loads the joblib sklearn pipeline, "compiled" the numpy-only
+# scorer exported by train.py (no joblib/pandas/sklearn in the worker)
+MODEL_BACKEND = os.getenv("MODEL_BACKEND", "pipeline")
+# How often the CURRENT/SHADOW release pointers are checked for changes
+RELOAD_CHECK_SECONDS = float(os.getenv("MODEL_RELOAD_CHECK_SECONDS", "10"))
+# Longest wait between retries of a failed first load
+MAX_RETRY_SECONDS = 60.0
+# Fraction of scored urls also sent to the shadow release, if one is set
+SHADOW_SAMPLE_RATE = float(os.getenv("SHADOW_SAMPLE_RATE", "0.05"))
+SHADOW_QUEUE_SIZE = int(os.getenv("SHADOW_QUEUE_SIZE", "100"))
+
+# ModelRegistry.state
+NOT_LOADED, LOADING, READY, FAILED = "not_loaded", "loading", "ready", "failed"
+
+WARMUP_URLS = ["https://www.example.com/", "http://login-verify.example.xyz/account?id=1"]
+
+# Optional callback(stage, seconds, n_urls) receiving per-stage timings of
+# live predictions; installed by the API (see set_stage_observer)
+_stage_observer = None
+
+def file_version(*paths):
+    """Short content hash identifying a model artifact (one or more files)."""
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+    return digest.hexdigest()[:12]
+
+class LoadedModel:
+    """
+    A fitted pipeline split into its feature steps and final classifier.
+    Step lookups happen once here instead of on every prediction.
+    """
+
+    def __init__(self, pipeline, version=None):
+        import pandas as pd
+        from scipy.special import expit
+        from scipy import sparse
+        from sklearn.linear_model import LogisticRegression
+        from sklearn.pipeline import FeatureUnion
+
+        self._sparse = sparse
+        self._frame = pd.DataFrame
+        self._expit = expit
+        self.pipeline = pipeline
+        self.version = version
+        self.features = pipeline[:-1]
+        self.clf = pipeline.steps[-1][1]
+        # A bare FeatureUnion is run branch by branch when stage timings are
+        # wanted; the stacked result is the same matrix FeatureUnion builds
+        union = self.features[0] if len(self.features) == 1 else None
+        self.branches = None
+        if isinstance(union, FeatureUnion) and not union.transformer_weights:
+            self.branches = [(name, t) for name, t in union.transformer_list if t not in ('drop', None)]
+        self.classes = self.clf.classes_
+        # Binary one-vs-rest logistic regression: predict() thresholds the
+        # decision function at 0 and predict_proba() is its sigmoid, so one
+        # decision_function call yields both
+        self.binary_logistic = (
+            isinstance(self.clf, LogisticRegression)
+            and len(self.classes) == 2
+            and getattr(self.clf, 'multi_class', 'auto') != 'multinomial'
+        )
+
+    def _transform_timed(self, frame, observe):
+        n = len(frame)
+        if self.branches is None:
+            start = time.perf_counter()
+            X = self.features.transform(frame)
+            observe('features', time.perf_counter() - start, n)
+            return X
+        parts = []
+        for name, transformer in self.branches:
+            start = time.perf_counter()
+            parts.append(transformer.transform(frame))
+            observe(name, time.perf_counter() - start, n)
+        if any(self._sparse.issparse(p) for p in parts):
+            return self._sparse.hstack(parts).tocsr()
+        return np.hstack(parts)
+
+    def score(self, urls, observe=None):
+        """
+        Returns (predicted classes, malicious-class scores or None) for a list of urls.
+        observe, if given, is called as observe(stage, seconds, n_urls) per stage.
+        """
+        frame = self._frame({'url': urls})
+        if observe is None:
+            X = self.features.transform(frame)
+            return self._classify(X)
+        X = self._transform_timed(frame, observe)
+        start = time.perf_counter()
+        result = self._classify(X)
+        observe('classifier', time.perf_counter() - start, len(urls))
+        return result
+
+    def _classify(self, X):
+        clf = self.clf
+
+        if self.binary_logistic:
+            dfv = clf.decision_function(X)
+            return self.classes[(dfv > 0).astype(int)], self._expit(dfv)
+        if hasattr(clf, 'predict_proba'):
+            proba = clf.predict_proba(X)
+            return self.classes[proba.argmax(axis=1)], proba[:, 1]
+        if hasattr(clf, 'decision_function'):
+            dfv = clf.decision_function(X)
+            return self.classes[(dfv > 0).astype(int)], 1 / (1 + 2.71828 ** (-dfv/4.0))
+        return clf.predict(X), None
 
-# Load model
-if MODEL_FILE.exists():
+def load_pipeline(path=MODEL_FILE):
+    # The pipeline references model.utils.get_url_values, importable as is
+    import joblib
+    return joblib.load(path)
+
+def load_compiled_model():
+    from model.scorer import CompiledScorer, SCORER_DIR
+    scorer = CompiledScorer(SCORER_DIR)
+    scorer.version = file_version(*sorted(SCORER_DIR.iterdir()))
+    return scorer
+
+def load_fallback(path, version):
+    """The numeric-only fallback model at path, or None if there is none."""
+    from model.scorer import FallbackScorer
+    if not Path(path).is_file():
+        return None
+    fallback = FallbackScorer(path)
+    fallback.version = version
+    fallback.score(WARMUP_URLS)
+    return fallback
+
+def load_release(version, root=RELEASES_DIR):
+    """Loads, verifies and warms up one published release for MODEL_BACKEND."""
+    release_dir = Path(root) / version
+    manifest = verify_release(release_dir)
+    if MODEL_BACKEND == "compiled":
+        from model.scorer import CompiledScorer
+        model = CompiledScorer(release_dir / SCORER_NAME)
+        model.version = version
+    else:
+        model = LoadedModel(load_pipeline(release_dir / PIPELINE_NAME), version)
+    model.manifest = manifest
+    model.fallback = load_fallback(release_dir / FALLBACK_NAME, version)
+    # First calls pay for lazy allocations and imports; do them off the request path
+    model.score(WARMUP_URLS)
+    return model
+
+def load_legacy_model():
+    """The unversioned artifact next to this file, used when no release is published."""
+    if MODEL_BACKEND == "compiled":
+        model = load_compiled_model()
+    elif MODEL_FILE.exists():
+        model = LoadedModel(load_pipeline(MODEL_FILE), file_version(MODEL_FILE))
+    else:
+        print(f"WARNING: Model file not found at {MODEL_FILE}")
+        return None
+    model.manifest = None
+    model.score(WARMUP_URLS)
+    from model.scorer import FALLBACK_FILE
     try:
-        pipeline = safe_load_model()
-        print("Model loaded successfully")
+        model.fallback = load_fallback(FALLBACK_FILE, model.version)
     except Exception as e:
-        print(f"Error loading model: {e}")
-        pipeline = None
-else:
-    pipeline = None
-    print(f"WARNING: Model file not found at {MODEL_FILE}")
+        print(f"Error loading fallback model: {e}")
+        model.fallback = None
+    return model
+
+class ShadowScorer:
+    """
+    Scores a sample of live traffic with a candidate model on a background
+    thread and records how often it disagrees with the live model.
+
+    offer() never blocks: samples are dropped when the queue is full.
+    """
+
+    def __init__(self, model, sample_rate=SHADOW_SAMPLE_RATE, max_queue=SHADOW_QUEUE_SIZE):
+        self.model = model
+        self.sample_rate = sample_rate
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._stopped = False
+        self.compared = 0
+        self.disagreements = 0
+        self.dropped = 0
+        self.errors = 0
+        self._abs_diff_sum = 0.0
+        self.max_abs_diff = 0.0
+        self.recent = deque(maxlen=20)
+        self._thread = threading.Thread(target=self._run, name="shadow-scorer", daemon=True)
+        self._thread.start()
+
+    def offer(self, urls, live_results):
+        if self._stopped or self.sample_rate <= 0:
+            return
+        picked = [i for i in range(len(urls)) if random.random() < self.sample_rate]
+        if not picked:
+            return
+        try:
+            self._queue.put_nowait(([urls[i] for i in picked], [live_results[i] for i in picked]))
+        except queue.Full:
+            self.dropped += len(picked)
+
+    def stop(self):
+        self._stopped = True
+        self._queue.put(None)
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            urls, live_results = item
+            try:
+                results = _label_results(*self.model.score(urls))
+            except Exception as e:
+                self.errors += 1
+                print(f"Shadow scoring failed: {e}")
+                continue
+            for url, (live_label, live_prob), (label, prob) in zip(urls, live_results, results):
+                self.compared += 1
+                if live_prob is not None and prob is not None:
+                    diff = abs(float(live_prob) - float(prob))
+                    self._abs_diff_sum += diff
+                    self.max_abs_diff = max(self.max_abs_diff, diff)
+                if label != live_label:
+                    self.disagreements += 1
+                    self.recent.append({"url": url, "live": live_label, "shadow": label})
+
+    def stats(self) -> dict:
+        return {
+            "version": self.model.version,
+            "sample_rate": self.sample_rate,
+            "compared": self.compared,
+            "disagreements": self.disagreements,
+            "disagreement_rate": self.disagreements / self.compared if self.compared else 0.0,
+            "mean_abs_diff": self._abs_diff_sum / self.compared if self.compared else 0.0,
+            "max_abs_diff": self.max_abs_diff,
+            "dropped": self.dropped,
+            "errors": self.errors,
+            "recent_disagreements": list(self.recent),
+        }
+
+class ModelRegistry:
+    """
+    Holds the live model (and optional shadow candidate) and swaps in new
+    releases without a restart.
+
+    The CURRENT/SHADOW pointer files are checked at most every
+    check_interval seconds from the request path (a stat, nothing more);
+    when one changes, a background thread loads and warms up the new
+    release and then replaces the reference in a single assignment. Calls
+    in flight keep the model they started with, and a release that fails
+    to load or verify leaves the previous model serving.
+
+    Nothing is loaded when the module is imported: load_model() does the
+    first load (the API calls it from its lifespan hook, serve.py in the
+    preloading master) and state tells readiness probes how far it got.
+    If it fails, a background thread retries it with backoff (starting at
+    check_interval), re-reading the pointers each time, until a model
+    loads: a release published after a failed start is picked up without
+    a restart.
+    """
+
+    def __init__(self, root=RELEASES_DIR, check_interval=RELOAD_CHECK_SECONDS):
+        self.root = Path(root)
+        self.check_interval = check_interval
+        self.live = None
+        self.shadow = None
+        self.state = NOT_LOADED
+        self.load_seconds = None
+        self.last_error = None
+        self.reloads = 0
+        self.loaded_at = None
+        self._pointers = None
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+        self._initial_lock = threading.Lock()
+        self._loader = None
+
+    def _read_pointers(self):
+        return read_pointer(CURRENT, self.root), read_pointer(SHADOW, self.root)
+
+    def load_initial(self):
+        """
+        Blocking first load: the CURRENT release, else the legacy artifact.
+        Runs once; later calls (from other threads too) wait for it and
+        return the same model.
+        """
+        with self._initial_lock:
+            if self.state in (READY, FAILED):
+                return self.live
+            self.state = LOADING
+            start = time.perf_counter()
+            try:
+                live = self._load_initial()
+            except Exception as e:
+                self.last_error = f"{type(e).__name__}: {e}"
+                live = None
+            self.load_seconds = time.perf_counter() - start
+            self.state = READY if live is not None else FAILED
+            if live is None:
+                self._start_retry()
+            return live
+
+    def _start_retry(self):
+        if self._loader is not None and self._loader.is_alive():
+            return
+        self._loader = threading.Thread(target=self._retry_initial, name="model-loader", daemon=True)
+        self._loader.start()
+
+    def _retry_initial(self):
+        delay = max(self.check_interval, 0.1)
+        while self.state == FAILED:
+            time.sleep(delay)
+            delay = min(delay * 2, MAX_RETRY_SECONDS)
+            with self._initial_lock:
+                start = time.perf_counter()
+                try:
+                    live = self._load_initial()
+                except Exception as e:
+                    self.last_error = f"{type(e).__name__}: {e}"
+                    live = None
+                if live is not None:
+                    self.load_seconds = time.perf_counter() - start
+                    self.loaded_at = time.time()
+                    self.state = READY
+                    print(f"Model loaded after retrying (version {live.version}, {self.load_seconds:.2f}s)")
+
+    def _load_initial(self):
+        pointers = self._read_pointers()
+        if pointers[0] is None:
+            self.live = load_legacy_model()
+            self._pointers = pointers
+            self._next_check = time.monotonic() + self.check_interval
+            return self.live
+        self._reload(pointers)
+        if self.live is None:
+            self.live = load_legacy_model()
+        self._next_check = time.monotonic() + self.check_interval
+        return self.live
+
+    def check(self):
+        """Starts a background reload if a pointer changed; never blocks on loading."""
+        now = time.monotonic()
+        if now < self._next_check:
+            return
+        with self._lock:
+            if now < self._next_check or (self._loader is not None and self._loader.is_alive()):
+                return
+            self._next_check = now + self.check_interval
+            pointers = self._read_pointers()
+            if pointers == self._pointers or pointers[0] is None:
+                return
+            self._loader = threading.Thread(target=self._reload, args=(pointers,),
+                                            name="model-loader", daemon=True)
+            self._loader.start()
+
+    def _load(self, version, loaded):
+        if loaded is not None and loaded.version == version:
+            return loaded
+        try:
+            return load_release(version, self.root)
+        except Exception as e:
+            self.last_error = f"{version}: {type(e).__name__}: {e}"
+            print(f"Error loading model release {self.last_error}")
+            return None
+
+    def _reload(self, pointers):
+        current, candidate = pointers
+        self.last_error = None
+        live = self._load(current, self.live)
+        if live is not None and live is not self.live:
+            self.live = live
+            self.state = READY
+            self.reloads += 1
+            self.loaded_at = time.time()
+            print(f"Model release {live.version} is live")
+
+        old_shadow = self.shadow
+        shadow = None
+        live_version = self.live.version if self.live is not None else None
+        if candidate is not None and candidate not in (current, live_version):
+            shadow = self._load(candidate, old_shadow.model if old_shadow is not None else None)
+        if old_shadow is None or shadow is not old_shadow.model:
+            self.shadow = ShadowScorer(shadow) if shadow is not None else None
+            if old_shadow is not None:
+                old_shadow.stop()
+            if shadow is not None:
+                print(f"Shadow scoring release {shadow.version}")
+        # A broken release is not retried until a pointer changes again
+        self._pointers = pointers
+
+    def after_fork(self):
+        """
+        Resets thread state in a forked child: the parent's loader and shadow
+        scorer threads do not exist there. The loaded models are kept, so
+        preloaded weights stay shared with the parent.
+        """
+        self._lock = threading.Lock()
+        self._initial_lock = threading.Lock()
+        self._loader = None
+        shadow = self.shadow
+        if shadow is not None:
+            self.shadow = ShadowScorer(shadow.model, shadow.sample_rate)
+        if self.state == FAILED:
+            self._start_retry()
+
+    def wait(self, timeout=None):
+        """Blocks until a background reload in progress has finished."""
+        loader = self._loader
+        if loader is not None:
+            loader.join(timeout)
+
+    def stats(self) -> dict:
+        live, shadow = self.live, self.shadow
+        return {
+            "version": live.version if live is not None else None,
+            "state": self.state,
+            "load_seconds": self.load_seconds,
+            "backend": MODEL_BACKEND,
+            "manifest": getattr(live, "manifest", None),
+            "fallback": getattr(live, "fallback", None) is not None,
+            "releases_dir": str(self.root),
+            "reloads": self.reloads,
+            "loaded_at": self.loaded_at,
+            "last_error": self.last_error,
+            "shadow": shadow.stats() if shadow is not None else None,
+        }
+
+def _label_results(preds, probs):
+    if probs is None:
+        probs = [None] * len(preds)
+    return [
+        ("malicious" if pred == 1 else "benign", prob)
+        for pred, prob in zip(preds, probs)
+    ]
+
+registry = ModelRegistry()
+# Workers forked from a preloading server (serve.py) need their own threads
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=registry.after_fork)
+
+def load_model():
+    """Loads and warms up the model if that has not happened yet; returns it (None if it failed)."""
+    if registry.state in (READY, FAILED):
+        return registry.live
+    model = registry.load_initial()
+    if model is not None:
+        print(f"Model loaded successfully (version {model.version}, {registry.load_seconds:.2f}s)")
+    else:
+        print(f"Error loading model: {registry.last_error or 'no model artifact'}")
+    return model
+
+def is_ready():
+    return registry.live is not None
+
+def current_model():
+    # Callers that never went through load_model() (scripts, benchmarks) load on first use
+    if registry.state in (NOT_LOADED, LOADING):
+        load_model()
+    registry.check()
+    return registry.live
+
+def model_version():
+    """Version of the currently loaded model, or None if no model is loaded."""
+    model = registry.live
+    return model.version if model is not None else None
+
+def set_stage_observer(observe):
+    """Reports per-stage model timings of predict_batch to observe (None to stop)."""
+    global _stage_observer
+    _stage_observer = observe
 
 def predict_single(url):
-    if pipeline is None:
-        raise RuntimeError("Model not loaded. Please train the model first.")
-    
-    df = pd.DataFrame({'url': [url]})
-    pred = pipeline.predict(df)
-    prob = None
-    
-    # Get the classifier from the pipeline
-    clf = pipeline.named_steps.get('clf', None)
-    if clf is None:
-        # If no 'clf' step, try to find the classifier directly
-        for step_name, step in pipeline.named_steps.items():
-            if hasattr(step, 'predict_proba') or hasattr(step, 'decision_function'):
-                clf = step
-                break
-    
-    if clf is not None:
-        if hasattr(clf, 'predict_proba'):
-            prob = pipeline.predict_proba(df)[0][1]
-        elif hasattr(clf, 'decision_function'):
-            dfv = pipeline.decision_function(df)[0]
-            prob = 1 / (1 + 2.71828 ** (-dfv/4.0))
-    
-    label = "malicious" if pred[0] == 1 else "benign"
+    label, prob = predict_batch([url])[0]
     return label, prob
 
+def predict_batch(urls):
+    """Score many URLs with a single pass through the model.
+
+    Returns a list of (label, probability) tuples in the same order as `urls`.
+    """
+    model = current_model()
+    if model is None:
+        raise RuntimeError("Model not loaded. Please train the model first.")
+
+    urls = [str(u) for u in urls]
+    if not urls:
+        return []
+
+    results = _label_results(*model.score(urls, _stage_observer))
+    shadow = registry.shadow
+    if shadow is not None:
+        shadow.offer(urls, results)
+    return results
+
+def has_fallback():
+    return getattr(registry.live, "fallback", None) is not None
+
+def predict_fallback(urls):
+    """
+    Scores urls with the live release's numeric-features-only fallback model,
+    cheap enough to run inline when the full model is over budget.
+    Returns (label, probability) tuples, or None if no fallback is loaded.
+    """
+    fallback = getattr(registry.live, "fallback", None)
+    if fallback is None:
+        return None
+    urls = [str(u) for u in urls]
+    if not urls:
+        return []
+    return _label_results(*fallback.score(urls))
+
 if __name__ == '__main__':
     if len(sys.argv) < 2:
         print("Usage: python model/predict.py <url1> [url2] ...")
@@ -1,13 +1,18 @@
+import os
+import sys
+import threading
 import numpy as np
-import pandas as pd
 from urllib.parse import urlparse
-import tldextract
 import re
-from collections import Counter
+from collections import Counter, OrderedDict
+
+from model.public_suffix import extract
 
 def get_url_values(x):
     """Extract URL values from DataFrame or array"""
-    if isinstance(x, pd.DataFrame):
+    # pandas is only imported by callers that pass DataFrames
+    pd = sys.modules.get('pandas')
+    if pd is not None and isinstance(x, pd.DataFrame):
         return x['url'].values
     return np.array(x)
 
@@ -16,67 +21,189 @@ COMMON_TLDS = [
     "us", "uk", "de", "jp", "in", "gov", "edu"
 ]
 
+SUSPICIOUS_TOKENS = [
+    'login','secure','account','verify','bank','confirm','signin',
+    'admin','paypal','ebay','invoice'
+]
+
+_IP_RE = re.compile(r'\b(?:[0-9]{1,3}\.){3}[0-9]{1,3}\b')
+_CHUNK_RE = re.compile(r'[a-zA-Z0-9]+')
+# Cheap prefilter: only URLs matching any token need the per-token count
+_TOKEN_RE = re.compile('|'.join(SUSPICIOUS_TOKENS))
+_TLD_INDEX = {t: i for i, t in enumerate(COMMON_TLDS)}
+_N_BASE_FEATURES = 13
+
+def _char_counts(strs, lengths):
+    """Per-string counts of digits, '.', '-' and '@' over one code point buffer."""
+    codes = np.frombuffer(''.join(strs).encode('utf-32-le', 'surrogatepass'), dtype='<u4')
+    ends = np.cumsum(lengths)
+    starts = ends - lengths
+
+    def count(mask):
+        csum = np.concatenate(([0], np.cumsum(mask, dtype=np.int64)))
+        return csum[ends] - csum[starts]
+
+    digits = count((codes >= 48) & (codes <= 57))
+    # str.isdigit also accepts non-ASCII digits; recount those rows exactly
+    for i in np.flatnonzero(count(codes > 127)):
+        digits[i] = sum(c.isdigit() for c in strs[i])
+
+    return digits, count(codes == 46), count(codes == 45), count(codes == 64)
+
+def _host_parts(s):
+    """(domain, tld, subdomain, hostname) for a url, empty strings if parsing fails."""
+    try:
+        parsed = urlparse(s)
+        ext = extract(s)
+        domain = ext.domain or (parsed.hostname or "")
+        tld = ext.suffix or ""
+        subdomain = ext.subdomain or ""
+        hostname = ".".join([p for p in [subdomain, domain, tld] if p])
+    except Exception:
+        return "", "", "", ""
+    return domain, tld, subdomain, hostname
+
+def _entropy(hostname):
+    if not hostname:
+        return 0.0
+    try:
+        probs = np.array(list(Counter(hostname).values())) / len(hostname)
+        return -(probs * np.log2(probs)).sum()
+    except Exception:
+        return 0.0
+
+# Host-derived columns are memoized across calls (entries; 0 disables)
+HOST_MEMO_SIZE = int(os.getenv("HOST_FEATURE_MEMO_SIZE", "65536"))
+_AUTHORITY_END = re.compile(r'[/?#]')
+
+def _host_key(s):
+    """
+    The url up to the end of its authority, which is all _host_parts reads,
+    or None when there is no "://" or urlparse would strip tabs/newlines
+    from it; those urls are featurized without the memo.
+    """
+    start = s.find('://')
+    if start < 0:
+        return None
+    end = _AUTHORITY_END.search(s, start + 3)
+    key = s[:end.start()] if end else s
+    if '\t' in key or '\n' in key or '\r' in key:
+        return None
+    return key
+
+def _host_features(s):
+    """(domain_length, hostname_length, num_subdomains, hostname_entropy, TLD index) for a url."""
+    domain, tld, subdomain, hostname = _host_parts(s)
+    return (len(domain), len(hostname), subdomain.count('.') + (1 if subdomain else 0),
+            _entropy(hostname), _TLD_INDEX.get(tld, len(COMMON_TLDS)))
+
+class HostMemo:
+    """Bounded, thread-safe LRU memo of _host_features by _host_key."""
+
+    def __init__(self, maxsize=HOST_MEMO_SIZE):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_many(self, keys):
+        """{key: features} for the keys present; one hit or miss is counted per key."""
+        found = {}
+        if self.maxsize <= 0:
+            return found
+        with self._lock:
+            data = self._data
+            for key in keys:
+                value = data.get(key)
+                if value is not None:
+                    data.move_to_end(key)
+                    found[key] = value
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def put_many(self, items):
+        if self.maxsize <= 0 or not items:
+            return
+        with self._lock:
+            data = self._data
+            data.update(items)
+            overflow = len(data) - self.maxsize
+            for _ in range(overflow):
+                data.popitem(last=False)
+            self.evictions += max(overflow, 0)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+host_memo = HostMemo()
+
 def numeric_features(urls):
-    """Returns numeric/domain/TLD features for an iterable of url strings."""
-    out = []
-    for u in urls:
-        s = str(u)
-        lower = s.lower()
-        length = len(s)
-        digits = sum(c.isdigit() for c in s)
-        dots = s.count('.')
-        hyphens = s.count('-')
-        at = s.count('@')
-        
-        # Improved IP address detection
-        has_ip = int(bool(re.search(r'\b(?:[0-9]{1,3}\.){3}[0-9]{1,3}\b', s)))
-        has_https = int(lower.startswith('https://'))
-
-        # Domain parsing with error handling
-        try:
-            parsed = urlparse(s)
-            ext = tldextract.extract(s)
-            domain = ext.domain or (parsed.hostname or "")
-            tld = ext.suffix or ""
-            subdomain = ext.subdomain or ""
-            hostname = ".".join([p for p in [subdomain, domain, tld] if p])
-        except Exception:
-            # Fallback if parsing fails
-            domain = ""
-            tld = ""
-            subdomain = ""
-            hostname = ""
-
-        domain_length = len(domain)
-        hostname_length = len(hostname)
-        num_subdomains = subdomain.count('.') + (1 if subdomain else 0)
-
-        # entropy calculation with safety
-        entropy = 0.0
-        if hostname:
-            try:
-                probs = np.array(list(Counter(hostname).values())) / len(hostname)
-                entropy = -(probs * np.log2(probs)).sum()
-            except Exception:
-                entropy = 0.0
-
-        suspicious_tokens = sum(1 for t in [
-            'login','secure','account','verify','bank','confirm','signin',
-            'admin','paypal','ebay','invoice'
-        ] if t in lower)
-
-        chunks = len([c for c in re.split(r'[^a-zA-Z0-9]+', s) if c])
-
-        # TLD one-hot vector
-        tld_vec = [1 if tld == t else 0 for t in COMMON_TLDS]
-        tld_vec.append(0 if tld in COMMON_TLDS else 1)
-
-        row = [
-            length, digits, dots, hyphens, at, has_ip, has_https,
-            domain_length, hostname_length, num_subdomains, entropy,
-            suspicious_tokens, chunks
-        ] + tld_vec
-
-        out.append(row)
-
-    return np.array(out)
\ No newline at end of file
+    """Returns numeric/domain/TLD features for an iterable of url strings.
+
+    Computed column by column for the whole batch; the host-derived columns
+    come from host_memo, computed once per distinct host on a miss.
+    """
+    strs = [str(u) for u in urls]
+    n = len(strs)
+    if n == 0:
+        return np.array([])
+
+    lowers = [s.lower() for s in strs]
+    lengths = np.fromiter(map(len, strs), dtype=np.int64, count=n)
+    digits, dots, hyphens, at = _char_counts(strs, lengths)
+
+    # Host features once per distinct host key (or url, if it has none),
+    # looked up in the cross-call memo before computing
+    keys = {}
+    for s in strs:
+        if s not in keys:
+            keys[s] = _host_key(s)
+    host = host_memo.get_many(set(keys.values()) - {None})
+    computed = {}
+    unkeyed = {}
+    for s, key in keys.items():
+        if key is None:
+            unkeyed[s] = _host_features(s)
+        elif key not in host:
+            host[key] = computed[key] = _host_features(s)
+    host_memo.put_many(computed)
+    host_cols = np.array([host[keys[s]] if keys[s] is not None else unkeyed[s] for s in strs])
+
+    out = np.zeros((n, _N_BASE_FEATURES + len(COMMON_TLDS) + 1))
+    out[:, 0] = lengths
+    out[:, 1] = digits
+    out[:, 2] = dots
+    out[:, 3] = hyphens
+    out[:, 4] = at
+    out[:, 5] = [_IP_RE.search(s) is not None for s in strs]
+    out[:, 6] = [l.startswith('https://') for l in lowers]
+
+    out[:, 7:11] = host_cols[:, :4]
+    tld_idx = host_cols[:, 4].astype(np.int64)
+
+    out[:, 11] = [
+        sum(1 for t in SUSPICIOUS_TOKENS if t in l) if _TOKEN_RE.search(l) else 0
+        for l in lowers
+    ]
+    out[:, 12] = [len(_CHUNK_RE.findall(s)) for s in strs]
+
+    # TLD one-hot vector (last column is "other")
+    out[np.arange(n), _N_BASE_FEATURES + tld_idx] = 1
+
+    return out
@@ -0,0 +1,372 @@
+# reports.py
+import hashlib
+import json
+import os
+from datetime import date, datetime, timedelta, timezone
+from urllib import parse
+
+from model.public_suffix import extract_host
+
+# Columns that may be returned by GET /api/reports. Reporter identity and
+# raw headers are never exposed by the read API.
+PUBLIC_FIELDS = ("id", "url", "description", "severity", "attachments", "created_at",
+                 "report_count", "last_reported_at")
+DEFAULT_FIELDS = ("id", "url", "severity", "report_count", "created_at")
+
+# Per-report details kept in reports.reporters for one url; report_count
+# keeps counting past it
+MAX_REPORT_DETAILS = int(os.getenv("MAX_REPORT_DETAILS", "50"))
+# Rows per multi-row INSERT statement
+INSERT_CHUNK_ROWS = int(os.getenv("REPORT_INSERT_CHUNK_ROWS", "500"))
+# How long applied spool segments are remembered (to skip them on replay)
+SPOOL_MARKER_TTL = timedelta(hours=float(os.getenv("REPORT_SPOOL_MARKER_TTL_HOURS", "24")))
+
+REPORT_COLUMNS = (
+    "canonical_url", "url", "description", "headers", "severity", "anonymous",
+    "reporter_name", "reporter_contact", "attachments", "report_count", "reporters",
+    "created_at", "last_reported_at",
+)
+# Keeps the first MAX_REPORT_DETAILS entries of the existing and new reporters
+MERGE_REPORTERS_SQL = {
+    "postgres": """(
+        SELECT COALESCE(jsonb_agg(e ORDER BY i), '[]'::jsonb)
+        FROM jsonb_array_elements(reports.reporters || excluded.reporters) WITH ORDINALITY AS t(e, i)
+        WHERE i <= {limit}
+    )""",
+    "sqlite": """(
+        SELECT json_group_array(json(value)) FROM (
+            SELECT value FROM json_each(reports.reporters)
+            UNION ALL SELECT value FROM json_each(excluded.reporters)
+            LIMIT {limit}
+        )
+    )""",
+}
+UPSERT_REPORTS_SQL = """
+    INSERT INTO reports ({columns}) VALUES {rows}
+    ON CONFLICT (canonical_url) DO UPDATE SET
+        report_count = reports.report_count + excluded.report_count,
+        last_reported_at = excluded.last_reported_at,
+        reporters = {merge}
+    RETURNING id, canonical_url
+"""
+
+UPSERT_ROLLUP_SQL = """
+    INSERT INTO report_rollups (dimension, key, count) VALUES (%s, %s, %s)
+    ON CONFLICT (dimension, key) DO UPDATE SET count = report_rollups.count + excluded.count
+"""
+UPSERT_ROLLUPS_SQL = """
+    INSERT INTO report_rollups (dimension, key, count) VALUES {rows}
+    ON CONFLICT (dimension, key) DO UPDATE SET count = report_rollups.count + excluded.count
+"""
+
+
+def host_and_domain(url):
+    """(hostname, registered domain) of a reported URL, empty strings if unknown."""
+    try:
+        host = (parse.urlsplit(url).hostname or "").rstrip(".")
+    except ValueError:
+        return "", ""
+    parts = extract_host(host)
+    domain = ".".join(p for p in (parts.domain, parts.suffix) if p)
+    return host, domain or host
+
+
+def rollup_keys(url, severity, day):
+    host, domain = host_and_domain(url)
+    keys = [("total", ""), ("severity", severity.lower()), ("day", day)]
+    if host:
+        keys += [("domain", domain), ("host", host)]
+    return keys
+
+
+def _cursor(conn, db, sql, params=()):
+    cur = conn.cursor()
+    cur.execute(db.format_sql(sql), params)
+    return cur
+
+
+def timestamp(value=None):
+    """UTC timestamp text that Postgres parses and that sorts correctly in sqlite."""
+    return (value or datetime.now(timezone.utc)).strftime("%Y-%m-%d %H:%M:%S+00:00")
+
+
+def new_report(url, canonical_url, description, headers, severity, anonymous,
+               reporter_name=None, reporter_contact=None, attachments=()):
+    """One received report, as spooled and as passed to apply_reports()."""
+    return {
+        "url": url,
+        "canonical_url": canonical_url,
+        "description": description,
+        "headers": headers,
+        "severity": severity,
+        "anonymous": anonymous,
+        "reporter_name": reporter_name,
+        "reporter_contact": reporter_contact,
+        "attachments": list(attachments),
+        "reported_at": timestamp(),
+    }
+
+
+def _detail(report):
+    return {k: report[k] for k in (
+        "reported_at", "severity", "description", "headers", "anonymous",
+        "reporter_name", "reporter_contact", "attachments",
+    )}
+
+
+def coalesce_reports(reports):
+    """
+    One row per canonical url: the first report's columns, the number of
+    reports and the details of up to MAX_REPORT_DETAILS of them.
+    """
+    rows = {}
+    for report in reports:
+        row = rows.get(report["canonical_url"])
+        if row is None:
+            rows[report["canonical_url"]] = row = {
+                **report, "report_count": 0, "reporters": [], "created_at": report["reported_at"],
+            }
+        row["report_count"] += 1
+        row["last_reported_at"] = max(row.get("last_reported_at") or "", report["reported_at"])
+        if len(row["reporters"]) < MAX_REPORT_DETAILS:
+            row["reporters"].append(_detail(report))
+    return list(rows.values())
+
+
+def _values(n_rows, n_columns):
+    row = "(" + ", ".join(["%s"] * n_columns) + ")"
+    return ", ".join([row] * n_rows)
+
+
+def _chunks(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def apply_reports(db, reports=(), segments=None):
+    """
+    Writes received reports in one transaction and returns {canonical_url: id}.
+
+    Reports of the same canonical url become a single upserted row
+    (multi-row INSERT ... ON CONFLICT, INSERT_CHUNK_ROWS rows per
+    statement), and the rollups get one upsert per key with the summed
+    count. So the statements scale with distinct urls, not with reports.
+
+    segments, if given instead of reports, maps each spool segment name to
+    its reports. The names are recorded in the same transaction. Segments recorded earlier
+    are skipped: their reports were written before a crash stopped the
+    spool from deleting them.
+    """
+    dialect = "sqlite" if db.is_sqlite else "postgres"
+    with db.connection() as conn:
+        applied = set()
+        if segments:
+            names = list(segments)
+            for chunk in _chunks(names, INSERT_CHUNK_ROWS):
+                cur = _cursor(conn, db, f"""
+                    SELECT segment FROM report_spool_segments
+                    WHERE segment IN ({", ".join(["%s"] * len(chunk))})
+                """, tuple(chunk))
+                applied.update(row["segment"] for row in cur.fetchall())
+                cur.close()
+            reports = [r for name in names if name not in applied for r in segments[name]]
+
+        ids = {}
+        upsert = UPSERT_REPORTS_SQL.format(
+            columns=", ".join(REPORT_COLUMNS), rows="{rows}",
+            merge=MERGE_REPORTERS_SQL[dialect].format(limit=MAX_REPORT_DETAILS),
+        )
+        for chunk in _chunks(coalesce_reports(reports), INSERT_CHUNK_ROWS):
+            params = []
+            for row in chunk:
+                for column in REPORT_COLUMNS:
+                    value = row.get(column)
+                    params.append(json.dumps(value) if column in ("attachments", "reporters") else value)
+            cur = _cursor(conn, db, upsert.format(rows=_values(len(chunk), len(REPORT_COLUMNS))), tuple(params))
+            ids.update((row["canonical_url"], row["id"]) for row in cur.fetchall())
+            cur.close()
+
+        counts = {}
+        for report in reports:
+            for key in rollup_keys(report["url"], report["severity"], report["reported_at"][:10]):
+                counts[key] = counts.get(key, 0) + 1
+        rollups = [(dimension, key, n) for (dimension, key), n in counts.items()]
+        for chunk in _chunks(rollups, INSERT_CHUNK_ROWS):
+            sql = UPSERT_ROLLUPS_SQL.format(rows=_values(len(chunk), 3))
+            _cursor(conn, db, sql, tuple(v for row in chunk for v in row)).close()
+
+        if segments:
+            now = datetime.now(timezone.utc)
+            markers = [(name, len(segments[name]), timestamp(now)) for name in segments if name not in applied]
+            for chunk in _chunks(markers, INSERT_CHUNK_ROWS):
+                sql = f"INSERT INTO report_spool_segments (segment, reports, flushed_at) VALUES {_values(len(chunk), 3)}"
+                _cursor(conn, db, sql, tuple(v for row in chunk for v in row)).close()
+    return ids
+
+
+def prune_spool_markers(db, ttl=SPOOL_MARKER_TTL):
+    """Forgets applied spool segments older than ttl; returns how many were removed."""
+    cutoff = timestamp(datetime.now(timezone.utc) - ttl)
+    return db.execute("DELETE FROM report_spool_segments WHERE flushed_at < %s", (cutoff,))
+
+
+def insert_report(db, report):
+    """
+    Writes one report (a new_report() dict) and its rollups synchronously;
+    returns the id of its url's row. Used when the write-behind spool is off.
+    """
+    return apply_reports(db, [report])[report["canonical_url"]]
+
+
+def rebuild_rollups(db, batch_size=5000):
+    """
+    Recomputes report_rollups from the reports table (for pre-existing rows).
+
+    Each row counts report_count times, so totals, severities, domains and
+    hosts match what apply_reports() accumulated. The per-day split of a
+    coalesced row cannot be recovered (reporters keeps only the first
+    MAX_REPORT_DETAILS reports): all of its reports count on the day of
+    its created_at, the first report.
+    """
+    counts = {}
+    last_id = 0
+    with db.connection() as conn:
+        while True:
+            cur = _cursor(conn, db, """
+                SELECT id, url, severity, report_count, created_at FROM reports
+                WHERE id > %s ORDER BY id LIMIT %s
+            """, (last_id, batch_size))
+            rows = cur.fetchall()
+            cur.close()
+            if not rows:
+                break
+            for row in rows:
+                weight = row["report_count"] or 1
+                for key in rollup_keys(row["url"], row["severity"], _day(row["created_at"])):
+                    counts[key] = counts.get(key, 0) + weight
+            last_id = rows[-1]["id"]
+
+        _cursor(conn, db, "DELETE FROM report_rollups").close()
+        for (dimension, key), count in counts.items():
+            _cursor(conn, db, UPSERT_ROLLUP_SQL, (dimension, key, count)).close()
+    return len(counts)
+
+
+def _day(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()[:10]
+    return str(value)[:10]
+
+
+def _serialize(row):
+    out = dict(row)
+    if "attachments" in out and isinstance(out["attachments"], str):
+        out["attachments"] = json.loads(out["attachments"])
+    # Postgres returns datetimes for every timestamp column (sqlite returns text)
+    for key, value in out.items():
+        if isinstance(value, (datetime, date)):
+            out[key] = value.isoformat()
+    return out
+
+
+def parse_fields(fields):
+    """Validated column list for a comma separated ?fields= value."""
+    if not fields:
+        return list(DEFAULT_FIELDS)
+    requested = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in requested if f not in PUBLIC_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    # id is always returned; it is the pagination key
+    return ["id"] + [f for f in dict.fromkeys(requested) if f != "id"]
+
+
+def list_reports(db, limit, cursor=None, fields=None, severity=None):
+    """
+    One page of reports, newest first, using keyset pagination on id.
+    Returns (rows, next_cursor); next_cursor is None on the last page.
+    """
+    columns = parse_fields(fields)
+    where, params = [], []
+    if cursor is not None:
+        where.append("id < %s")
+        params.append(cursor)
+    if severity:
+        where.append("severity = %s")
+        params.append(severity)
+    sql = f"SELECT {', '.join(columns)} FROM reports"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY id DESC LIMIT %s"
+    params.append(limit + 1)
+
+    rows = db.execute(sql, tuple(params), fetch="all")
+    next_cursor = rows[limit - 1]["id"] if len(rows) > limit else None
+    return [_serialize(r) for r in rows[:limit]], next_cursor
+
+
+def report_stats(db, top=10, days=30):
+    """Aggregates served from the incrementally maintained rollups."""
+    def query(conn, sql, params):
+        cur = _cursor(conn, db, sql, params)
+        rows = cur.fetchall()
+        cur.close()
+        return rows
+
+    top_sql = """
+        SELECT key, count FROM report_rollups WHERE dimension = %s
+        ORDER BY count DESC, key LIMIT %s
+    """
+    with db.connection() as conn:
+        total = query(conn, "SELECT count FROM report_rollups WHERE dimension = %s", ("total",))
+        severity = query(conn, "SELECT key, count FROM report_rollups WHERE dimension = %s", ("severity",))
+        per_day = query(conn, """
+            SELECT key, count FROM report_rollups WHERE dimension = %s
+            ORDER BY key DESC LIMIT %s
+        """, ("day", days))
+        domains = query(conn, top_sql, ("domain", top))
+        hosts = query(conn, top_sql, ("host", top))
+
+    return {
+        "total": total[0]["count"] if total else 0,
+        "by_severity": {r["key"]: r["count"] for r in sorted(severity, key=lambda r: r["key"])},
+        "by_day": [{"day": r["key"], "count": r["count"]} for r in reversed(per_day)],
+        "top_domains": [{"domain": r["key"], "count": r["count"]} for r in domains],
+        "top_hosts": [{"host": r["key"], "count": r["count"]} for r in hosts],
+    }
+
+
+def _as_utc(value):
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    return value if value.tzinfo is not None else value.replace(tzinfo=timezone.utc)
+
+
+def reports_version(db):
+    """
+    Cheap change marker for conditional requests: newest id and its
+    timestamp (primary key lookup), the latest last_reported_at (index
+    lookup; a coalesced re-report changes it without adding a row) and the
+    rolled-up total.
+    """
+    newest = db.execute("SELECT id, created_at FROM reports ORDER BY id DESC LIMIT 1", fetch="one")
+    reported = db.execute("SELECT MAX(last_reported_at) AS last_reported_at FROM reports", fetch="one")
+    total = db.execute(
+        "SELECT count FROM report_rollups WHERE dimension = %s AND key = %s", ("total", ""), fetch="one"
+    )
+    stamps = [_as_utc(newest["created_at"]) if newest else None,
+              _as_utc(reported["last_reported_at"]) if reported else None]
+    stamps = [s for s in stamps if s is not None]
+    last_modified = max(stamps) if stamps else None
+    return {
+        "max_id": newest["id"] if newest else 0,
+        "total": total["count"] if total else 0,
+        "last_modified": last_modified,
+    }
+
+
+def etag_for(version, *parts):
+    raw = json.dumps([version["max_id"], version["total"], version["last_modified"], *parts], default=str)
+    return '"' + hashlib.sha256(raw.encode()).hexdigest()[:32] + '"'
@@ -0,0 +1,55 @@
+-- Reports table used by POST /api/report (Postgres / Supabase)
+CREATE TABLE IF NOT EXISTS reports (
+    id BIGSERIAL PRIMARY KEY,
+    url TEXT NOT NULL,
+    description TEXT NOT NULL,
+    headers TEXT,
+    severity VARCHAR(20) NOT NULL,
+    anonymous BOOLEAN NOT NULL DEFAULT TRUE,
+    reporter_name VARCHAR(100),
+    reporter_contact VARCHAR(100),
+    attachments JSONB NOT NULL DEFAULT '[]'::jsonb,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    canonical_url TEXT,
+    report_count INTEGER NOT NULL DEFAULT 1,
+    reporters JSONB NOT NULL DEFAULT '[]'::jsonb,
+    last_reported_at TIMESTAMPTZ,
+    review_status VARCHAR(20),
+    reviewed_at TIMESTAMPTZ
+);
+
+-- Reports are coalesced per canonical url: the row keeps the first report,
+-- report_count counts all of them and reporters holds the details of the
+-- first MAX_REPORT_DETAILS. Columns added to existing databases:
+ALTER TABLE reports ADD COLUMN IF NOT EXISTS canonical_url TEXT;
+ALTER TABLE reports ADD COLUMN IF NOT EXISTS report_count INTEGER NOT NULL DEFAULT 1;
+ALTER TABLE reports ADD COLUMN IF NOT EXISTS reporters JSONB NOT NULL DEFAULT '[]'::jsonb;
+ALTER TABLE reports ADD COLUMN IF NOT EXISTS last_reported_at TIMESTAMPTZ;
+CREATE UNIQUE INDEX IF NOT EXISTS reports_canonical_url ON reports (canonical_url);
+-- MAX(last_reported_at) is the Last-Modified of the read API
+CREATE INDEX IF NOT EXISTS reports_last_reported_at ON reports (last_reported_at);
+
+-- Reports are anonymous, so they only reach the domain index's deny list
+-- once a reviewer sets review_status = 'confirmed' ('rejected' otherwise)
+ALTER TABLE reports ADD COLUMN IF NOT EXISTS review_status VARCHAR(20);
+ALTER TABLE reports ADD COLUMN IF NOT EXISTS reviewed_at TIMESTAMPTZ;
+CREATE INDEX IF NOT EXISTS reports_review_status ON reports (review_status);
+
+-- Incrementally maintained aggregates for GET /api/reports/stats
+-- (dimension: total, severity, day, domain, host)
+CREATE TABLE IF NOT EXISTS report_rollups (
+    dimension VARCHAR(20) NOT NULL,
+    key TEXT NOT NULL,
+    count BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (dimension, key)
+);
+CREATE INDEX IF NOT EXISTS report_rollups_top ON report_rollups (dimension, count DESC);
+
+-- Report spool segments already written to the tables above; a segment
+-- replayed after a crash between commit and delete is skipped
+CREATE TABLE IF NOT EXISTS report_spool_segments (
+    segment TEXT PRIMARY KEY,
+    reports INTEGER NOT NULL,
+    flushed_at TIMESTAMPTZ NOT NULL
+);
+CREATE INDEX IF NOT EXISTS report_spool_segments_flushed_at ON report_spool_segments (flushed_at);
@@ -0,0 +1,40 @@
+-- SQLite stand-in for schema.sql, created automatically for sqlite:/// URLs
+CREATE TABLE IF NOT EXISTS reports (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    url TEXT NOT NULL,
+    description TEXT NOT NULL,
+    headers TEXT,
+    severity VARCHAR(20) NOT NULL,
+    anonymous BOOLEAN NOT NULL DEFAULT 1,
+    reporter_name VARCHAR(100),
+    reporter_contact VARCHAR(100),
+    attachments TEXT NOT NULL DEFAULT '[]',
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    canonical_url TEXT,
+    report_count INTEGER NOT NULL DEFAULT 1,
+    reporters TEXT NOT NULL DEFAULT '[]',
+    last_reported_at TIMESTAMP,
+    review_status VARCHAR(20),
+    reviewed_at TIMESTAMP
+);
+CREATE UNIQUE INDEX IF NOT EXISTS reports_canonical_url ON reports (canonical_url);
+CREATE INDEX IF NOT EXISTS reports_last_reported_at ON reports (last_reported_at);
+CREATE INDEX IF NOT EXISTS reports_review_status ON reports (review_status);
+
+-- Incrementally maintained aggregates for GET /api/reports/stats
+-- (dimension: total, severity, day, domain, host)
+CREATE TABLE IF NOT EXISTS report_rollups (
+    dimension VARCHAR(20) NOT NULL,
+    key TEXT NOT NULL,
+    count BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (dimension, key)
+);
+CREATE INDEX IF NOT EXISTS report_rollups_top ON report_rollups (dimension, count DESC);
+
+-- Report spool segments already written (see schema.sql)
+CREATE TABLE IF NOT EXISTS report_spool_segments (
+    segment TEXT PRIMARY KEY,
+    reports INTEGER NOT NULL,
+    flushed_at TIMESTAMP NOT NULL
+);
+CREATE INDEX IF NOT EXISTS report_spool_segments_flushed_at ON report_spool_segments (flushed_at);
@@ -0,0 +1,115 @@
+"""
+Multi-worker launcher for the API with the model shared between workers.
+
+With gunicorn installed, the app is imported and the model loaded once
+in the master process and the uvicorn workers are forked from it
+(preload), so they share the loaded weights copy-on-write. The master
+freezes the garbage collector's view of the preloaded objects before
+forking, so collections in the workers do not write to (and un-share)
+those pages.
+
+MODEL_BACKEND defaults to "compiled" here: its weights are memory-mapped
+.npy files, so every worker maps the same page-cache pages whether or not
+it was forked from a preloaded master, and they stay shared across model
+reloads. The "pipeline" backend also works with preload, but its
+vocabulary dict and arrays are ordinary heap objects that each worker
+gradually un-shares as it touches them, and that are loaded again per
+worker on every reload.
+
+Without gunicorn it falls back to uvicorn's own multi-process mode, which
+spawns workers that each import the app: only the memory-mapped compiled
+weights are shared then.
+
+Usage: python serve.py [--workers N] [--bind 0.0.0.0:8000] [--backend compiled|pipeline]
+                       [--no-preload] [--timeout 30]
+"""
+import argparse
+import gc
+import os
+import sys
+from pathlib import Path
+
+APP_DIR = Path(__file__).resolve().parent
+DEFAULT_WORKERS = int(os.getenv("WEB_CONCURRENCY", str(os.cpu_count() or 1)))
+DEFAULT_BIND = os.getenv("BIND", f"0.0.0.0:{os.getenv('PORT', '8000')}")
+
+
+def _worker_class():
+    try:
+        import uvicorn_worker  # noqa: F401  (split out of uvicorn in 0.30)
+        return "uvicorn_worker.UvicornWorker"
+    except ImportError:
+        return "uvicorn.workers.UvicornWorker"
+
+
+def when_ready(server):
+    # Everything imported so far (app, model) moves to the permanent
+    # generation, so the workers' collections never touch those objects
+    gc.collect()
+    gc.freeze()
+
+
+def load_app(preload=True):
+    """
+    The app as gunicorn's master imports it. With preload the model is
+    loaded here, before the workers are forked, so they inherit it instead
+    of each loading their own (importing main alone does not load it).
+    """
+    import main
+    if preload:
+        main.load_model()
+    return main.app
+
+
+def run_gunicorn(args):
+    from gunicorn.app.base import BaseApplication
+
+    class Application(BaseApplication):
+        def load_config(self):
+            self.cfg.set("bind", [args.bind])
+            self.cfg.set("workers", args.workers)
+            self.cfg.set("worker_class", _worker_class())
+            self.cfg.set("preload_app", not args.no_preload)
+            self.cfg.set("timeout", args.timeout)
+            self.cfg.set("when_ready", when_ready)
+
+        def load(self):
+            return load_app(preload=not args.no_preload)
+
+    Application().run()
+
+
+def run_uvicorn(args):
+    import uvicorn
+
+    host, _, port = args.bind.rpartition(":")
+    print("gunicorn is not installed: starting uvicorn workers without preload; "
+          "only the memory-mapped compiled model is shared between them")
+    uvicorn.run("main:app", host=host or "0.0.0.0", port=int(port), workers=args.workers)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument("--bind", default=DEFAULT_BIND)
+    parser.add_argument("--backend", choices=["compiled", "pipeline"],
+                        default=os.getenv("MODEL_BACKEND", "compiled"))
+    parser.add_argument("--no-preload", action="store_true", help="Import the app in every worker instead")
+    parser.add_argument("--timeout", type=int, default=30)
+    args = parser.parse_args(argv)
+
+    # Read by model.predict at import time, in the master or the workers
+    os.environ["MODEL_BACKEND"] = args.backend
+    os.chdir(APP_DIR)
+    if str(APP_DIR) not in sys.path:
+        sys.path.insert(0, str(APP_DIR))
+
+    try:
+        import gunicorn  # noqa: F401
+    except ImportError:
+        return run_uvicorn(args)
+    return run_gunicorn(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
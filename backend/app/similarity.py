@@ -0,0 +1,90 @@
+# similarity.py
+import os
+import threading
+import time
+from pathlib import Path
+
+from model.minhash import MinHashIndex
+
+# Built offline by ai-model/model/train.py or `python -m model.minhash build`
+MINHASH_INDEX_DIR = Path(os.getenv(
+    "MINHASH_INDEX_DIR", Path(__file__).resolve().parent / "model" / "url_minhash"
+))
+# How often the index is checked for a newer build
+MINHASH_CHECK_SECONDS = float(os.getenv("MINHASH_CHECK_SECONDS", "30"))
+# Similarity from which a url is reported as a near-duplicate of a known-bad one
+# (default: the threshold the index was built with)
+SIMILAR_THRESHOLD = os.getenv("SIMILAR_THRESHOLD")
+
+
+class SimilarityIndexHolder:
+    """
+    Hot-swappable MinHash/LSH index of known-bad urls.
+
+    Reloaded when the index's meta.json (written last by a build) changes,
+    checked at most every check_interval seconds. The index files are
+    memory-mapped, so workers share their pages.
+    """
+
+    def __init__(self, path=MINHASH_INDEX_DIR, check_interval=MINHASH_CHECK_SECONDS, threshold=SIMILAR_THRESHOLD):
+        self.path = Path(path)
+        self.check_interval = check_interval
+        self.threshold = float(threshold) if threshold else None
+        self.index = None
+        self._mtime = None
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+        self.loaded_at = None
+        self.hits = 0
+        self.misses = 0
+        self.reload()
+
+    def reload(self):
+        """Loads the index if it changed; returns True if a new index was swapped in."""
+        with self._lock:
+            self._next_check = time.monotonic() + self.check_interval
+            try:
+                mtime = (self.path / "meta.json").stat().st_mtime_ns
+            except FileNotFoundError:
+                return False
+            if mtime == self._mtime:
+                return False
+            try:
+                index = MinHashIndex.load(self.path)
+            except Exception as e:
+                print(f"Error loading near-duplicate index {self.path}: {e}")
+                return False
+            self.index = index
+            self._mtime = mtime
+            self.loaded_at = time.time()
+            print(f"Near-duplicate index loaded (version {index.version}, {len(index)} urls)")
+            return True
+
+    def lookup(self, urls):
+        """Per url, {"matched", "similarity"} of the most similar known-bad url, or None."""
+        if time.monotonic() >= self._next_check:
+            self.reload()
+        index = self.index
+        if index is None or not urls:
+            return [None] * len(urls)
+        results = []
+        for match in index.query(urls, self.threshold, label=1):
+            if match is None:
+                self.misses += 1
+                results.append(None)
+            else:
+                self.hits += 1
+                i, sim = match
+                results.append({"matched": index.url(i), "similarity": round(sim, 4)})
+        return results
+
+    def stats(self) -> dict:
+        index = self.index
+        return {
+            **(index.stats() if index is not None else {"version": None, "urls": 0}),
+            "path": str(self.path),
+            "threshold_override": self.threshold,
+            "loaded_at": self.loaded_at,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
@@ -0,0 +1,184 @@
+# snapshots.py
+import base64
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+
+# Published offline by ai-model/model/verdict_snapshot.py
+SNAPSHOT_DIR = Path(os.getenv(
+    "SNAPSHOT_DIR", Path(__file__).resolve().parent / "model" / "snapshots"
+))
+# How often the directory is checked for a newer snapshot
+SNAPSHOT_CHECK_SECONDS = float(os.getenv("SNAPSHOT_CHECK_SECONDS", "5"))
+# Older snapshots (decoded) and computed diffs kept in memory
+SNAPSHOT_CACHE_SIZE = int(os.getenv("SNAPSHOT_CACHE_SIZE", "16"))
+
+
+def decode_sets(snapshot) -> dict:
+    """{name: sorted array of hashes} at the width each set was published with."""
+    widths = snapshot.get("hash_bytes") or {}
+    return {
+        name: np.frombuffer(base64.b64decode(data), dtype=f"S{widths.get(name, snapshot.get('prefix_bytes', 4))}")
+        for name, data in snapshot["sets"].items()
+    }
+
+
+def encode_hashes(values) -> str:
+    return base64.b64encode(values.tobytes()).decode("ascii")
+
+
+class SnapshotStore:
+    """
+    Numbered verdict snapshots and the diffs between them.
+
+    The directory is re-listed when its mtime changes (checked at most every
+    check_interval seconds). Clients that already hold snapshot N ask for
+    diff(N) and get the hashes added to and removed from each set since
+    then; if N has been pruned (or is unknown), or its sets were published
+    with different hash widths, they get the full snapshot.
+    """
+
+    def __init__(self, path=SNAPSHOT_DIR, check_interval=SNAPSHOT_CHECK_SECONDS, cache_size=SNAPSHOT_CACHE_SIZE):
+        self.path = Path(path)
+        self.check_interval = check_interval
+        self.cache_size = cache_size
+        self.seqs = []
+        self.latest = None
+        self._latest_sets = None
+        self._mtime = None
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+        self._cache_lock = threading.Lock()
+        self._sets = OrderedDict()
+        self._diffs = OrderedDict()
+        self.loaded_at = None
+        self.served = {"full": 0, "diff": 0}
+        self.reload()
+
+    def _file(self, seq):
+        return self.path / f"{seq:08d}.json"
+
+    def reload(self):
+        """Re-lists the directory if it changed; returns True if a newer snapshot was loaded."""
+        with self._lock:
+            self._next_check = time.monotonic() + self.check_interval
+            try:
+                mtime = self.path.stat().st_mtime_ns
+            except FileNotFoundError:
+                return False
+            if mtime == self._mtime:
+                return False
+            seqs = sorted(int(p.stem) for p in self.path.glob("*.json") if p.stem.isdigit())
+            self._mtime = mtime
+            self.seqs = seqs
+            if not seqs or (self.latest is not None and self.latest["seq"] == seqs[-1]):
+                return False
+            try:
+                with open(self._file(seqs[-1])) as f:
+                    latest = json.load(f)
+                sets = decode_sets(latest)
+            except Exception as e:
+                print(f"Error loading verdict snapshot {self._file(seqs[-1])}: {e}")
+                return False
+            self.latest, self._latest_sets = latest, sets
+            self._diffs.clear()
+            self.loaded_at = time.time()
+            print(f"Verdict snapshot {latest['seq']} loaded (index version {latest.get('index_version')})")
+            return True
+
+    def _check(self):
+        if time.monotonic() >= self._next_check:
+            self.reload()
+
+    def current(self):
+        """The latest snapshot as published, or None if there is none."""
+        self._check()
+        if self.latest is not None:
+            self.served["full"] += 1
+        return self.latest
+
+    def _old_sets(self, seq):
+        sets = self._sets.get(seq)
+        if sets is None:
+            with open(self._file(seq)) as f:
+                sets = decode_sets(json.load(f))
+            self._sets[seq] = sets
+            if len(self._sets) > self.cache_size:
+                self._sets.popitem(last=False)
+        else:
+            self._sets.move_to_end(seq)
+        return sets
+
+    def diff(self, since: int):
+        """
+        {"seq", "since", "full": False, "sets": {name: {"add", "remove"}}}
+        bringing a client at `since` up to date, the full snapshot with
+        "full": True if `since` is no longer available (or not diffable), or None if nothing
+        has been published.
+        """
+        self._check()
+        latest, sets = self.latest, self._latest_sets
+        if latest is None:
+            return None
+        seq = latest["seq"]
+        if since not in self.seqs and since != seq:
+            self.served["full"] += 1
+            return {**latest, "since": since, "full": True}
+
+        key = (since, seq)
+        with self._cache_lock:
+            result = self._diffs.get(key)
+            if result is None:
+                try:
+                    old = self._old_sets(since) if since != seq else sets
+                except (OSError, ValueError, KeyError):
+                    # Pruned between the listing and now
+                    self.served["full"] += 1
+                    return {**latest, "since": since, "full": True}
+                if any(name in old and old[name].dtype != values.dtype for name, values in sets.items()):
+                    # An older format (e.g. short allow prefixes): hashes do not compare
+                    self.served["full"] += 1
+                    return {**latest, "since": since, "full": True}
+                result = self._build_diff(latest, sets, since, old)
+                self._diffs[key] = result
+                if len(self._diffs) > self.cache_size:
+                    self._diffs.popitem(last=False)
+        self.served["diff"] += 1
+        return result
+
+    @staticmethod
+    def _build_diff(latest, sets, since, old):
+        return {
+            "format_version": latest["format_version"],
+            "seq": latest["seq"],
+            "since": since,
+            "index_version": latest.get("index_version"),
+            "hash_bytes": latest.get("hash_bytes"),
+            "full": False,
+            "sets": {
+                name: {
+                    "add": encode_hashes(np.setdiff1d(values, old.get(name, values[:0]), assume_unique=True)),
+                    "remove": encode_hashes(np.setdiff1d(old.get(name, values[:0]), values, assume_unique=True)),
+                }
+                for name, values in sets.items()
+            },
+        }
+
+    def stats(self) -> dict:
+        self._check()
+        latest = self.latest
+        return {
+            "seq": latest["seq"] if latest else None,
+            "index_version": latest.get("index_version") if latest else None,
+            "built_at": latest.get("built_at") if latest else None,
+            "available": list(self.seqs),
+            "path": str(self.path),
+            "loaded_at": self.loaded_at,
+            "served": dict(self.served),
+            "snapshot": latest.get("stats") if latest else None,
+        }
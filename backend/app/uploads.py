@@ -0,0 +1,164 @@
+# uploads.py
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
+
+UPLOAD_DIR = Path(os.getenv("UPLOAD_DIR", Path(__file__).resolve().parent / "uploads"))
+# Per-file and per-request attachment limits in bytes
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(10 * 1024 * 1024)))
+MAX_REQUEST_UPLOAD_BYTES = int(os.getenv("MAX_REQUEST_UPLOAD_BYTES", str(25 * 1024 * 1024)))
+# Whole report request body, enforced before the form is parsed: the
+# attachments plus room for the form fields and multipart framing
+MAX_REQUEST_BODY_BYTES = int(os.getenv("MAX_REQUEST_BODY_BYTES", str(MAX_REQUEST_UPLOAD_BYTES + 1024 * 1024)))
+CHUNK_SIZE = 64 * 1024
+
+
+class UploadTooLarge(Exception):
+    """An attachment (or the request's attachments together) exceeded the size limit."""
+
+
+def blob_path(upload_dir, sha256):
+    """Content-addressed location of a stored attachment."""
+    return Path(upload_dir) / sha256[:2] / sha256
+
+
+def _spool_stream(src, upload_dir, max_bytes):
+    """
+    Copies src to a temp file in upload_dir in chunks while hashing it.
+    Returns (temp path, sha256, size); the temp file is removed on failure.
+    """
+    upload_dir = Path(upload_dir)
+    upload_dir.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=upload_dir, prefix=".upload-")
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = src.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadTooLarge(f"Attachment exceeds {max_bytes} bytes")
+                digest.update(chunk)
+                out.write(chunk)
+            out.flush()
+            os.fsync(out.fileno())
+        return tmp, digest.hexdigest(), size
+    except BaseException:
+        _discard(tmp)
+        raise
+
+
+def _commit(tmp, upload_dir, sha256):
+    """Atomically renames a spooled temp file to its content address (dropping it if already stored)."""
+    final = blob_path(upload_dir, sha256)
+    if final.exists():
+        # Identical content is already stored
+        os.unlink(tmp)
+        return
+    final.parent.mkdir(exist_ok=True)
+    os.replace(tmp, final)
+
+
+def _discard(tmp):
+    try:
+        os.unlink(tmp)
+    except FileNotFoundError:
+        pass
+
+
+async def store_attachments(files, upload_dir=UPLOAD_DIR,
+                            max_file_bytes=MAX_UPLOAD_BYTES,
+                            max_request_bytes=MAX_REQUEST_UPLOAD_BYTES):
+    """
+    Stores uploaded files content-addressed by SHA-256 and returns their
+    metadata for the attachments column. Memory use is one chunk per file
+    regardless of size.
+
+    All files are spooled to temp files first and only renamed to their
+    content address once every limit has passed. A request that fails
+    removes only its own temp files: a stored blob may already be shared
+    with a concurrent request that uploaded the same content.
+    """
+    spooled = []
+    stored = []
+    total = 0
+    committed = 0
+    try:
+        for file in files:
+            limit = min(max_file_bytes, max_request_bytes - total)
+            try:
+                tmp, sha256, size = await run_in_threadpool(_spool_stream, file.file, upload_dir, limit)
+            except UploadTooLarge:
+                if limit < max_file_bytes:
+                    raise UploadTooLarge(f"Attachments exceed {max_request_bytes} bytes per request")
+                raise
+            spooled.append((tmp, sha256))
+            total += size
+            stored.append({
+                "sha256": sha256,
+                "filename": os.path.basename(file.filename or ""),
+                "content_type": file.content_type,
+                "size": size,
+            })
+        for tmp, sha256 in spooled:
+            await run_in_threadpool(_commit, tmp, upload_dir, sha256)
+            committed += 1
+    finally:
+        # Temp files not renamed: a limit was exceeded or a commit failed
+        for tmp, _ in spooled[committed:]:
+            _discard(tmp)
+    return stored
+
+
+class RequestBodyLimit:
+    """
+    ASGI middleware that caps the request body of the given paths before
+    it is parsed, so an oversized multipart upload is refused instead of
+    being spooled by the form parser first. A declared Content-Length over
+    the limit is answered with 413 without reading the body; otherwise the
+    body is counted as it is received and the parser is stopped with 413
+    once it passes the limit. on_reject(path) is called for each refusal.
+    """
+
+    def __init__(self, app, max_bytes=MAX_REQUEST_BODY_BYTES, paths=(), on_reject=None):
+        self.app = app
+        self.max_bytes = max_bytes
+        self.paths = frozenset(paths)
+        self.on_reject = on_reject
+
+    def _reject(self, path):
+        if self.on_reject is not None:
+            self.on_reject(path)
+        return f"Request body exceeds {self.max_bytes} bytes"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            return await self.app(scope, receive, send)
+        path = scope["path"]
+
+        declared = dict(scope["headers"]).get(b"content-length")
+        if declared is not None and declared.isdigit() and int(declared) > self.max_bytes:
+            response = JSONResponse({"detail": self._reject(path)}, status_code=413, headers={"Connection": "close"})
+            return await response(scope, receive, send)
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    # FastAPI re-raises HTTPExceptions from body parsing as they are
+                    raise HTTPException(status_code=413, detail=self._reject(path))
+            return message
+
+        await self.app(scope, limited_receive, send)
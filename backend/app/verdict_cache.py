@@ -0,0 +1,179 @@
+# verdict_cache.py
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from urllib import parse
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def canonicalize_url(url: str) -> str:
+    """
+    Normalizes a URL so equivalent spellings share one cache entry:
+    lowercases scheme and host, drops default ports and the fragment,
+    and uses "/" for an empty path.
+    """
+    parts = parse.urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+
+    userinfo, at, hostport = parts.netloc.rpartition("@")
+    host, colon, port = hostport.lower().rpartition(":")
+    if not colon or "]" in port:
+        host, port = hostport.lower(), ""
+    elif port.isdigit() and int(port) == DEFAULT_PORTS.get(scheme):
+        port = ""
+    netloc = f"{userinfo}{at}{host}{':' + port if port else ''}"
+
+    return parse.urlunsplit((scheme, netloc, parts.path or "/", parts.query, ""))
+
+
+class VerdictCache:
+    """
+    Thread-safe LRU cache with a TTL for URL verdicts.
+
+    Concurrent misses for the same key are collapsed into a single
+    computation (single-flight); the other callers wait for its result.
+    """
+
+    def __init__(self, maxsize=10000, ttl=300.0, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self._inflight = {}  # key -> Future
+        self._inflight_async = {}  # key -> asyncio.Future
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def _lookup(self, key):
+        """Returns (found, value); caller must hold the lock."""
+        entry = self._data.get(key)
+        if entry is None:
+            return False, None
+        expires_at, value = entry
+        if expires_at <= self._clock():
+            del self._data[key]
+            self.expirations += 1
+            return False, None
+        self._data.move_to_end(key)
+        return True, value
+
+    def _store(self, key, value):
+        """Caller must hold the lock."""
+        if self.maxsize <= 0:
+            return
+        self._data[key] = (self._clock() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def get(self, key, default=None):
+        with self._lock:
+            found, value = self._lookup(key)
+            if found:
+                self.hits += 1
+                return value
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        with self._lock:
+            self._store(key, value)
+
+    def get_or_compute(self, key, compute):
+        """Returns the cached value for key, calling compute() at most once per miss."""
+        with self._lock:
+            found, value = self._lookup(key)
+            if found:
+                self.hits += 1
+                return value
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                self.misses += 1
+                future = Future()
+                self._inflight[key] = future
+            else:
+                self.coalesced += 1
+
+        if not owner:
+            return future.result()
+
+        try:
+            value = compute()
+        except BaseException as e:
+            with self._lock:
+                self._inflight.pop(key, None)
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            self._inflight.pop(key, None)
+            self._store(key, value)
+        future.set_result(value)
+        return value
+
+    async def get_or_compute_async(self, key, compute):
+        """
+        Async variant of get_or_compute for event-loop callers: compute is a
+        coroutine function, awaited at most once per miss.
+        """
+        with self._lock:
+            found, value = self._lookup(key)
+            if found:
+                self.hits += 1
+                return value
+            future = self._inflight_async.get(key)
+            owner = future is None
+            if owner:
+                self.misses += 1
+                future = asyncio.get_running_loop().create_future()
+                self._inflight_async[key] = future
+            else:
+                self.coalesced += 1
+
+        if not owner:
+            return await asyncio.shield(future)
+
+        try:
+            value = await compute()
+        except BaseException as e:
+            with self._lock:
+                self._inflight_async.pop(key, None)
+            future.set_exception(e)
+            # Mark the exception as retrieved when nobody else was waiting
+            future.exception()
+            raise
+
+        with self._lock:
+            self._inflight_async.pop(key, None)
+            self._store(key, value)
+        future.set_result(value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses + self.coalesced
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_rate": round((self.hits + self.coalesced) / lookups, 4) if lookups else 0.0,
+            }
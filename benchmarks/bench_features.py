@@ -0,0 +1,186 @@
+"""
+Equivalence check and throughput benchmark for numeric_features.
+
+Compares the batched numeric_features in ai-model/model/utils.py and
+backend/app/model/utils.py against the original per-URL loop, with the
+host memo both cold and warm, then times both at the requested dataset
+sizes (the batched version with a cold and a warm memo).
+
+Usage: python benchmarks/bench_features.py [--sizes 10000,1000000] [--skip-reference-above N]
+"""
+import argparse
+import importlib.util
+import re
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+from urllib.parse import urlparse
+
+import numpy as np
+import pandas as pd
+import tldextract
+
+ROOT = Path(__file__).resolve().parent.parent
+CSV_FILE = ROOT / "ai-model" / "data" / "urls_and_labels.csv"
+UTILS_FILES = {
+    "ai-model": ROOT / "ai-model" / "model" / "utils.py",
+    "backend": ROOT / "backend" / "app" / "model" / "utils.py",
+}
+
+TOKENS = [
+    'login','secure','account','verify','bank','confirm','signin',
+    'admin','paypal','ebay','invoice'
+]
+
+
+def reference_numeric_features(urls, common_tlds, ip_pattern, https_prefix, guarded):
+    """The original per-URL loop, kept here as the equivalence oracle."""
+    out = []
+    for u in urls:
+        s = str(u)
+        lower = s.lower()
+        length = len(s)
+        digits = sum(c.isdigit() for c in s)
+        dots = s.count('.')
+        hyphens = s.count('-')
+        at = s.count('@')
+        has_ip = int(bool(re.search(ip_pattern, s)))
+        has_https = int(lower.startswith(https_prefix))
+
+        try:
+            parsed = urlparse(s)
+            ext = tldextract.extract(s)
+            domain = ext.domain or (parsed.hostname or "")
+            tld = ext.suffix or ""
+            subdomain = ext.subdomain or ""
+            hostname = ".".join([p for p in [subdomain, domain, tld] if p])
+        except Exception:
+            if not guarded:
+                raise
+            domain = tld = subdomain = hostname = ""
+
+        domain_length = len(domain)
+        hostname_length = len(hostname)
+        num_subdomains = subdomain.count('.') + (1 if subdomain else 0)
+
+        entropy = 0.0
+        if hostname:
+            probs = np.array(list(Counter(hostname).values())) / len(hostname)
+            entropy = -(probs * np.log2(probs)).sum()
+
+        suspicious_tokens = sum(1 for t in TOKENS if t in lower)
+        chunks = len([c for c in re.split(r'[^a-zA-Z0-9]+', s) if c])
+
+        tld_vec = [1 if tld == t else 0 for t in common_tlds]
+        tld_vec.append(0 if tld in common_tlds else 1)
+
+        out.append([
+            length, digits, dots, hyphens, at, has_ip, has_https,
+            domain_length, hostname_length, num_subdomains, entropy,
+            suspicious_tokens, chunks
+        ] + tld_vec)
+
+    return np.array(out)
+
+
+REFERENCE_ARGS = {
+    "ai-model": dict(ip_pattern=r'\b\d{1,3}(?:\.\d{1,3}){3}\b', https_prefix='https', guarded=False),
+    "backend": dict(ip_pattern=r'\b(?:[0-9]{1,3}\.){3}[0-9]{1,3}\b', https_prefix='https://', guarded=True),
+}
+
+# Edge cases that the training CSV does not exercise
+EXTRA_URLS = [
+    "", "a", "http://", "https://1.2.3.4/login", "HTTPS://Example.COM/Verify",
+    "example.com/path", "http://user:pw@host.co.uk:8080/a-b-c?x=1#frag",
+    "https://aaaa.aa", "http://ｅｘａｍｐｌｅ.com/²³", "https://münchen.de/١٢٣",
+    "ftp://paypal.ebay.invoice.signin.bank", "http://[::1]/x", "12345",
+    "https://sub.a-b.xyz/%E2%82%AC@@", "\t https://x.top \n",
+    # Host memo keys: the authority ends at the first /?# after "://"
+    "http:/\n/paypal.com/x", "http://exa\tmple.com/", "http://example.com/\n", "a:b://c.com/x",
+    "x?y://host.com/", "a//b://c.org/", "http:///x", "http://?q=1", "https://host.io#f",
+    "HTTPS://Sub.Example.CO.uk:443/x", "//cdn.example.net/a.js",
+]
+
+
+def load_utils(name, path):
+    # utils imports model.public_suffix; resolve it from the same tree
+    for mod in [m for m in sys.modules if m == "model" or m.startswith("model.")]:
+        del sys.modules[mod]
+    root = str(path.parent.parent)
+    sys.path.insert(0, root)
+    try:
+        spec = importlib.util.spec_from_file_location(f"bench_utils_{name.replace('-', '_')}", path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    finally:
+        sys.path.remove(root)
+    return module
+
+
+def load_urls():
+    urls = pd.read_csv(CSV_FILE, on_bad_lines='skip')['url'].dropna().astype(str).tolist()
+    return urls + EXTRA_URLS
+
+
+def sample(urls, size, seed=0):
+    rng = np.random.default_rng(seed)
+    return [urls[i] for i in rng.integers(0, len(urls), size)]
+
+
+def check_equivalence(name, module, urls):
+    expected = reference_numeric_features(urls, module.COMMON_TLDS, **REFERENCE_ARGS[name])
+    module.host_memo.clear()
+    # Cold memo, warm memo, and one url at a time against the warm memo
+    runs = {
+        "cold": module.numeric_features(urls),
+        "warm": module.numeric_features(urls),
+        "single": np.vstack([module.numeric_features([u]) for u in urls]),
+    }
+    for run, actual in runs.items():
+        if expected.shape != actual.shape or expected.dtype != actual.dtype:
+            raise AssertionError(f"{name} ({run}): shape/dtype mismatch {expected.shape}/{expected.dtype} "
+                                 f"vs {actual.shape}/{actual.dtype}")
+        if expected.tobytes() != actual.tobytes():
+            rows = np.flatnonzero((expected != actual).any(axis=1))
+            raise AssertionError(f"{name} ({run}): {len(rows)} rows differ, first: {urls[rows[0]]!r}")
+    print(f"[{name}] bit-identical on {len(urls)} urls (cold/warm/single memo); {module.host_memo.stats()}")
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10000,1000000")
+    parser.add_argument("--skip-reference-above", type=int, default=None,
+                        help="Only time the new implementation above this size")
+    args = parser.parse_args()
+
+    urls = load_urls()
+    modules = {name: load_utils(name, path) for name, path in UTILS_FILES.items()}
+    # Warm up tldextract's suffix list before anything is timed
+    tldextract.extract("https://example.com")
+
+    for name, module in modules.items():
+        check_equivalence(name, module, urls)
+
+    for size in [int(s) for s in args.sizes.split(",")]:
+        batch = sample(urls, size)
+        for name, module in modules.items():
+            module.host_memo.clear()
+            new = timed(module.numeric_features, batch)
+            warm = timed(module.numeric_features, batch)
+            line = (f"[{name}] n={size:>8d}  batched {new:8.3f}s ({size / new:10.0f} urls/s)"
+                    f"  warm memo {warm:8.3f}s ({size / warm:10.0f} urls/s)")
+            if args.skip_reference_above is None or size <= args.skip_reference_above:
+                ref = timed(reference_numeric_features, batch, module.COMMON_TLDS, *REFERENCE_ARGS[name].values())
+                line += f"  reference {ref:8.3f}s  speedup x{ref / new:.2f}"
+            print(line)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
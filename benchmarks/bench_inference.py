@@ -0,0 +1,103 @@
+"""
+Parity check and per-request latency benchmark for predict_single.
+
+Compares the single-pass predict_single of each model package against the
+previous two-pass path (pipeline.predict followed by pipeline.predict_proba)
+on the training CSV, then reports per-request latency percentiles for both.
+
+Usage: python benchmarks/bench_inference.py [--requests 2000] [--targets backend,ai-model]
+"""
+import argparse
+import importlib
+import io
+import sys
+import time
+from contextlib import redirect_stdout
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parent.parent
+CSV_FILE = ROOT / "ai-model" / "data" / "urls_and_labels.csv"
+TARGETS = {
+    "backend": ROOT / "backend" / "app",
+    "ai-model": ROOT / "ai-model",
+}
+
+
+def import_predict(target):
+    """Imports model.predict from one of the two model packages."""
+    for name in [m for m in sys.modules if m == "model" or m.startswith("model.")]:
+        del sys.modules[name]
+    path = str(TARGETS[target])
+    sys.path.insert(0, path)
+    try:
+        with redirect_stdout(io.StringIO()):
+            return importlib.import_module("model.predict")
+    finally:
+        sys.path.remove(path)
+
+
+def two_pass(pipeline, url):
+    """The previous inference path: features are computed twice."""
+    df = pd.DataFrame({'url': [url]})
+    pred = pipeline.predict(df)
+    prob = pipeline.predict_proba(df)[0][1]
+    return ("malicious" if pred[0] == 1 else "benign"), prob
+
+
+def percentiles(samples):
+    ms = np.array(samples) * 1000
+    return {p: float(np.percentile(ms, p)) for p in (50, 95, 99)}
+
+
+def latency(fn, urls):
+    samples = []
+    for url in urls:
+        start = time.perf_counter()
+        fn(url)
+        samples.append(time.perf_counter() - start)
+    return percentiles(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--targets", default="backend,ai-model")
+    args = parser.parse_args()
+
+    urls = pd.read_csv(CSV_FILE, on_bad_lines='skip')['url'].dropna().astype(str).tolist()
+    rng = np.random.default_rng(0)
+    sample = [urls[i] for i in rng.integers(0, len(urls), args.requests)]
+
+    for target in args.targets.split(","):
+        predict = import_predict(target)
+        # The backend serves whichever release is live; ai-model has a plain global
+        pipeline = predict.current_model().pipeline if hasattr(predict, "current_model") else predict.pipeline
+
+        mismatches = 0
+        for url in urls:
+            old_label, old_prob = two_pass(pipeline, url)
+            new_label, new_prob = predict.predict_single(url)
+            if old_label != new_label or old_prob != new_prob:
+                mismatches += 1
+        print(f"[{target}] parity: {len(urls) - mismatches}/{len(urls)} identical")
+
+        # warm up
+        for url in sample[:50]:
+            two_pass(pipeline, url)
+            predict.predict_single(url)
+
+        old = latency(lambda u: two_pass(pipeline, u), sample)
+        new = latency(predict.predict_single, sample)
+        for name, p in (("two-pass", old), ("single-pass", new)):
+            print(f"[{target}] {name:11s} p50 {p[50]:7.3f} ms  p95 {p[95]:7.3f} ms  p99 {p[99]:7.3f} ms")
+        print(f"[{target}] p50 speedup x{old[50] / new[50]:.2f}")
+
+        if mismatches:
+            return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
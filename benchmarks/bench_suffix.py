@@ -0,0 +1,118 @@
+"""
+Parity check and microbenchmark for model.public_suffix.
+
+Compares public_suffix.extract() of each model package against
+tldextract.extract() on the training CSV plus host-parsing edge cases, then
+times per-call extraction and the cold start (import plus first call) of
+both in fresh interpreters.
+
+Usage: python benchmarks/bench_suffix.py [--calls 200000] [--targets backend,ai-model]
+"""
+import argparse
+import importlib
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import tldextract
+
+ROOT = Path(__file__).resolve().parent.parent
+CSV_FILE = ROOT / "ai-model" / "data" / "urls_and_labels.csv"
+TARGETS = {
+    "backend": ROOT / "backend" / "app",
+    "ai-model": ROOT / "ai-model",
+}
+
+# Wildcard/exception rules, punycode, IPs and odd authorities
+EXTRA_URLS = [
+    "", "...", "localhost", "http://www.ck", "http://a.b.ck", "foo.bar.kawasaki.jp",
+    "x.city.kawasaki.jp", "http://xn--fiqs8s.xn--fiqs8s/", "http://www.食狮.公司.cn/",
+    "http://user:pw@EXAMPLE.CO.UK.:8080/a?b#c", "//foo.co.uk", "a。b。com",
+    "http://192.168.0.1:80/x", "http://1.2.3.4.5/", "http://[::1]:443/", "[2001:db8::1]",
+    "mailto:x@y.com", "https://waiterrant.blogspot.com", "http://s3.amazonaws.com",
+    "HTTPS://Sub.Example.GOV.uk/path", "https://münchen.de/", "ftp://a.b.c.d.e.f.xyz",
+]
+
+COLD_START = {
+    "tldextract": "import tldextract; tldextract.extract('https://www.example.co.uk/')",
+    "public_suffix": "from model.public_suffix import extract; extract('https://www.example.co.uk/')",
+}
+
+
+def import_public_suffix(target):
+    for name in [m for m in sys.modules if m == "model" or m.startswith("model.")]:
+        del sys.modules[name]
+    path = str(TARGETS[target])
+    sys.path.insert(0, path)
+    try:
+        return importlib.import_module("model.public_suffix")
+    finally:
+        sys.path.remove(path)
+
+
+def load_urls():
+    urls = pd.read_csv(CSV_FILE, on_bad_lines='skip')['url'].dropna().astype(str).tolist()
+    return urls + EXTRA_URLS
+
+
+def check_parity(target, module, urls):
+    mismatches = []
+    for url in urls:
+        expected = tldextract.extract(url)
+        actual = module.extract(url)
+        if (expected.subdomain, expected.domain, expected.suffix) != tuple(actual):
+            mismatches.append((url, expected, actual))
+    for url, expected, actual in mismatches[:10]:
+        print(f"  {url!r}: tldextract {expected} vs {actual}")
+    if mismatches:
+        raise AssertionError(f"{target}: {len(mismatches)} of {len(urls)} urls differ from tldextract")
+    print(f"[{target}] identical to tldextract on {len(urls)} urls "
+          f"(suffix list {module.SUFFIX_LIST_VERSION})")
+
+
+def per_call(fn, urls):
+    start = time.perf_counter()
+    for url in urls:
+        fn(url)
+    return (time.perf_counter() - start) / len(urls) * 1e6
+
+
+def cold_start(code, cwd, repeats=5):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], cwd=cwd, check=True)
+        times.append(time.perf_counter() - start)
+    return min(times) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=200000)
+    parser.add_argument("--targets", default="backend,ai-model")
+    args = parser.parse_args()
+
+    urls = load_urls()
+    rng = np.random.default_rng(0)
+    batch = [urls[i] for i in rng.integers(0, len(urls), args.calls)]
+    # Load tldextract's suffix list before anything is timed
+    tldextract.extract("https://example.com")
+
+    for target in args.targets.split(","):
+        module = import_public_suffix(target)
+        check_parity(target, module, urls)
+        ours = per_call(module.extract, batch)
+        theirs = per_call(tldextract.extract, batch)
+        print(f"[{target}] per call: public_suffix {ours:6.2f}us  tldextract {theirs:6.2f}us  "
+              f"speedup x{theirs / ours:.2f}")
+
+    cwd = TARGETS[args.targets.split(",")[0]]
+    for name, code in COLD_START.items():
+        print(f"cold start (python -c, import + first call) {name:>13}: {cold_start(code, cwd):7.1f}ms")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,199 @@
+"""
+Per-worker memory of the multi-worker API: how much of each worker is
+unique (USS) versus shared with the master and the other workers.
+
+Modes:
+  fork    no server needed: imports the model in this process (like the
+          preloading master in serve.py), forks --workers children that
+          each score --requests single urls, and reads every child's
+          /proc/<pid>/smaps_rollup. With --no-preload the children import
+          the model themselves after the fork, as unpreloaded workers do.
+  serve   starts backend/app/serve.py (needs gunicorn + uvicorn), sends
+          --requests /check-url calls to it and measures its worker
+          processes the same way.
+
+USS (private clean + dirty pages) is what each extra worker really costs;
+PSS splits shared pages evenly between the processes mapping them. With
+--max-uss-mb the run fails (exit code 1) when any worker exceeds it.
+
+Usage: python benchmarks/bench_workers.py [--mode fork|serve] [--workers 4] [--requests 500]
+                                          [--backends compiled,pipeline] [--no-preload]
+                                          [--max-uss-mb N] [--out results.json]
+"""
+import argparse
+import gc
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from bench_features import load_urls, sample
+
+ROOT = Path(__file__).resolve().parent.parent
+BACKEND_DIR = ROOT / "backend" / "app"
+
+
+def memory_kb(pid="self"):
+    """{"rss", "pss", "uss", "shared"} in kB from /proc/<pid>/smaps_rollup."""
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1])
+    uss = fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0)
+    return {"rss": fields.get("Rss", 0), "pss": fields.get("Pss", 0), "uss": uss,
+            "shared": fields.get("Shared_Clean", 0) + fields.get("Shared_Dirty", 0)}
+
+
+def import_model(backend):
+    os.environ["MODEL_BACKEND"] = backend
+    for name in [m for m in sys.modules if m == "model" or m.startswith("model.")]:
+        del sys.modules[name]
+    if str(BACKEND_DIR) not in sys.path:
+        sys.path.insert(0, str(BACKEND_DIR))
+    import model.predict as predict
+    return predict
+
+
+def fork_workers(backend, workers, urls, preload):
+    """Forks the workers; returns one memory dict per worker, measured after scoring urls."""
+    predict = import_model(backend) if preload else None
+    if preload:
+        predict.load_model()
+        gc.collect()
+        gc.freeze()
+
+    children = []
+    for _ in range(workers):
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            code = 0
+            try:
+                worker_predict = predict or import_model(backend)
+                for url in urls:
+                    worker_predict.predict_single(url)
+                gc.collect()
+                os.write(write_fd, json.dumps(memory_kb()).encode())
+            except BaseException as e:
+                os.write(write_fd, json.dumps({"error": repr(e)}).encode())
+                code = 1
+            finally:
+                os._exit(code)
+        os.close(write_fd)
+        children.append((pid, read_fd))
+
+    results = []
+    for pid, read_fd in children:
+        with os.fdopen(read_fd) as f:
+            data = json.loads(f.read() or '{"error": "no output"}')
+        os.waitpid(pid, 0)
+        if "error" in data:
+            raise RuntimeError(f"worker {pid} failed: {data['error']}")
+        results.append(data)
+    if preload:
+        gc.unfreeze()
+    return results
+
+
+def child_pids(pid):
+    pids = []
+    for task in Path(f"/proc/{pid}/task").iterdir():
+        pids += [int(p) for p in (task / "children").read_text().split()]
+    return pids
+
+
+def serve_workers(backend, workers, urls, preload, port):
+    """Runs serve.py; returns one memory dict per worker process."""
+    import httpx
+
+    cmd = [sys.executable, str(BACKEND_DIR / "serve.py"), "--workers", str(workers),
+           "--bind", f"127.0.0.1:{port}", "--backend", backend]
+    if not preload:
+        cmd.append("--no-preload")
+    server = subprocess.Popen(cmd, cwd=BACKEND_DIR)
+    try:
+        base = f"http://127.0.0.1:{port}"
+        deadline = time.monotonic() + 120
+        while True:
+            try:
+                if httpx.get(f"{base}/model", timeout=2).status_code == 200:
+                    break
+            except httpx.HTTPError:
+                pass
+            if server.poll() is not None or time.monotonic() > deadline:
+                raise RuntimeError("server did not come up")
+            time.sleep(0.5)
+        with httpx.Client(base_url=base, timeout=30) as client:
+            for i, url in enumerate(urls):
+                client.get("/check-url", params={"url": f"{url}?w={i}"})
+        # uvicorn's supervisor may sit between the launcher and the workers
+        pids = child_pids(server.pid)
+        if len(pids) == 1 and workers > 1:
+            pids = child_pids(pids[0])
+        return [memory_kb(pid) for pid in pids]
+    finally:
+        server.terminate()
+        server.wait(30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=["fork", "serve"], default="fork")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--backends", default="compiled,pipeline")
+    parser.add_argument("--no-preload", action="store_true")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--max-uss-mb", type=float, default=None)
+    parser.add_argument("--out", default=None)
+    args = parser.parse_args()
+
+    urls = sample(load_urls(), args.requests, seed=3)
+    preload = not args.no_preload
+    report = {"mode": args.mode, "workers": args.workers, "preload": preload, "backends": {}}
+    failed = False
+    for backend in [b for b in args.backends.split(",") if b]:
+        if args.mode == "fork":
+            # Each backend in a fresh child so the previous one's imports do not count as shared
+            read_fd, write_fd = os.pipe()
+            pid = os.fork()
+            if pid == 0:
+                os.close(read_fd)
+                try:
+                    data = fork_workers(backend, args.workers, urls, preload)
+                    os.write(write_fd, json.dumps(data).encode())
+                finally:
+                    os._exit(0)
+            os.close(write_fd)
+            with os.fdopen(read_fd) as f:
+                output = f.read()
+            os.waitpid(pid, 0)
+            if not output:
+                raise RuntimeError(f"{backend}: measurement failed")
+            stats = json.loads(output)
+        else:
+            stats = serve_workers(backend, args.workers, urls, preload, args.port)
+
+        report["backends"][backend] = stats
+        uss = [s["uss"] / 1024 for s in stats]
+        pss = [s["pss"] / 1024 for s in stats]
+        rss = [s["rss"] / 1024 for s in stats]
+        print(f"[{backend}] {len(stats)} workers, preload={preload}: "
+              f"USS mean {sum(uss) / len(uss):7.1f} MB max {max(uss):7.1f} MB | "
+              f"PSS mean {sum(pss) / len(pss):7.1f} MB | RSS mean {sum(rss) / len(rss):7.1f} MB")
+        if args.max_uss_mb is not None and max(uss) > args.max_uss_mb:
+            print(f"[{backend}] worker USS {max(uss):.1f} MB exceeds --max-uss-mb {args.max_uss_mb}")
+            failed = True
+
+    if args.out:
+        Path(args.out).write_text(json.dumps(report, indent=2))
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,382 @@
+"""
+Offline benchmark suite with JSON results and baseline comparison.
+
+Sections (--only to pick a subset):
+  featurize   numeric_features throughput at several batch sizes
+  inference   predict_single latency percentiles, predict_batch throughput
+  load        model load time and resident memory per MODEL_BACKEND, in a
+              fresh interpreter
+  startup     API cold start per MODEL_BACKEND in a fresh interpreter: time to
+              import main, how many heavy libraries (pandas, sklearn, ...)
+              that import pulled in, and time until the model is loaded and
+              warm. The -X importtime profile of main's direct imports is
+              printed and saved under "import_profile"
+  http        /check-url (uncached and cached) and /api/report throughput
+              and latency through an in-process ASGI client at --concurrency,
+              against a temporary sqlite database
+
+Every metric records its unit and whether higher or lower is better. With
+--baseline, each metric present in both runs is compared, and the run
+fails (exit code 1) when one is worse by more than its threshold:
+--threshold sets the default relative change and --metric-threshold
+'glob=value' overrides it for matching metric names.
+
+Usage: python benchmarks/run_suite.py [--out results.json] [--baseline baseline.json]
+                                      [--threshold 0.15] [--metric-threshold 'http.*=0.3']
+                                      [--only featurize,inference,load,startup,http] [--quick]
+"""
+import argparse
+import asyncio
+import fnmatch
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+
+from bench_features import UTILS_FILES, load_urls, load_utils, sample
+from bench_inference import import_predict, percentiles
+
+ROOT = Path(__file__).resolve().parent.parent
+BACKEND_DIR = ROOT / "backend" / "app"
+SECTIONS = ("featurize", "inference", "load", "startup", "http")
+# Libraries only the model load (or the reports database) should import
+HEAVY_MODULES = ("pandas", "scipy", "sklearn", "joblib", "psycopg2")
+IMPORT_PROFILE_TOP = 8
+# Written to stderr right before "import main", so the profile skips interpreter startup
+IMPORT_MARKER = "-- import main --"
+
+LOAD_SCRIPT = """
+import json, resource, sys, time
+start = time.perf_counter()
+sys.path.insert(0, {path!r})
+import model.predict as predict
+predict.predict_batch(["https://www.example.com/"])
+elapsed = time.perf_counter() - start
+rss_kb = None
+try:
+    with open("/proc/self/status") as f:
+        rss_kb = next(int(line.split()[1]) for line in f if line.startswith("VmRSS:"))
+except OSError:
+    pass
+peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({{"seconds": elapsed, "rss_kb": rss_kb, "peak_kb": peak_kb}}))
+"""
+
+STARTUP_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+sys.path.insert(0, {path!r})
+print({marker!r}, file=sys.stderr, flush=True)
+import main
+imported = time.perf_counter() - start
+heavy = sorted(m for m in {heavy!r} if m in sys.modules)
+main.load_model()
+main.predict_batch(main.WARMUP_URLS)
+print(json.dumps({{"import_seconds": imported, "ready_seconds": time.perf_counter() - start, "heavy": heavy}}))
+"""
+
+
+class Results:
+    def __init__(self):
+        self.metrics = {}
+        self.import_profile = None
+
+    def add(self, name, value, unit, better):
+        self.metrics[name] = {"value": float(value), "unit": unit, "better": better}
+        print(f"  {name:45s} {value:14.3f} {unit}")
+
+
+def bench_featurize(results, urls, sizes):
+    print("featurize")
+    module = load_utils("backend", UTILS_FILES["backend"])
+    module.numeric_features(urls[:100])
+    for size in sizes:
+        batch = sample(urls, size)
+        start = time.perf_counter()
+        module.numeric_features(batch)
+        elapsed = time.perf_counter() - start
+        results.add(f"featurize.numeric_features.n{size}.urls_per_s", size / elapsed, "urls/s", "higher")
+
+
+def bench_inference(results, urls, requests, batch_sizes):
+    print("inference")
+    predict = import_predict("backend")
+    batch = sample(urls, requests, seed=1)
+    for url in batch[:50]:
+        predict.predict_single(url)
+
+    samples = []
+    for url in batch:
+        start = time.perf_counter()
+        predict.predict_single(url)
+        samples.append(time.perf_counter() - start)
+    for p, value in percentiles(samples).items():
+        results.add(f"inference.single.p{p}_ms", value, "ms", "lower")
+
+    for size in batch_sizes:
+        chunks = [batch[i:i + size] for i in range(0, len(batch), size)] or [batch]
+        chunks = [c for c in chunks if len(c) == size] or chunks[:1]
+        start = time.perf_counter()
+        for chunk in chunks:
+            predict.predict_batch(chunk)
+        elapsed = time.perf_counter() - start
+        results.add(f"inference.batch{size}.urls_per_s", sum(map(len, chunks)) / elapsed, "urls/s", "higher")
+
+
+def bench_load(results, backends):
+    print("load")
+    for backend in backends:
+        env = dict(os.environ, MODEL_BACKEND=backend)
+        out = subprocess.run(
+            [sys.executable, "-c", LOAD_SCRIPT.format(path=str(BACKEND_DIR))],
+            cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True,
+        ).stdout
+        data = json.loads(out.strip().splitlines()[-1])
+        results.add(f"load.{backend}.seconds", data["seconds"], "s", "lower")
+        if data["rss_kb"] is not None:
+            results.add(f"load.{backend}.rss_mb", data["rss_kb"] / 1024, "MB", "lower")
+
+
+def parse_import_profile(stderr, root="main"):
+    """(module, cumulative seconds) of root's direct imports from -X importtime output, slowest first."""
+    children, depth = [], None
+    lines = stderr.splitlines()
+    if IMPORT_MARKER in lines:
+        lines = lines[lines.index(IMPORT_MARKER) + 1:]
+    for line in lines:
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if not cumulative.strip().isdigit():
+            continue
+        level = (len(name) - len(name.lstrip()) - 1) // 2
+        name = name.strip()
+        if name == root:
+            depth = level
+            break
+        children.append((level, name, int(cumulative) / 1e6))
+    if depth is None:
+        return []
+    # importtime prints a module after everything it imported, so root's
+    # direct imports are the entries one level below it
+    direct = [(name, seconds) for level, name, seconds in children if level == depth + 1]
+    return sorted(direct, key=lambda item: -item[1])
+
+
+def bench_startup(results, backends):
+    print("startup")
+    for i, backend in enumerate(backends):
+        env = dict(os.environ, MODEL_BACKEND=backend)
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c",
+             STARTUP_SCRIPT.format(path=str(BACKEND_DIR), heavy=HEAVY_MODULES, marker=IMPORT_MARKER)],
+            cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True,
+        )
+        data = json.loads(proc.stdout.strip().splitlines()[-1])
+        results.add(f"startup.{backend}.import_main_seconds", data["import_seconds"], "s", "lower")
+        results.add(f"startup.{backend}.ready_seconds", data["ready_seconds"], "s", "lower")
+        results.add(f"startup.{backend}.heavy_modules_at_import", len(data["heavy"]), "modules", "lower")
+        if data["heavy"]:
+            print(f"    imported by main: {', '.join(data['heavy'])}")
+        if i == 0:
+            # The import path is the same for every backend; profile it once.
+            # Kept out of the compared metrics: single modules are too noisy
+            profile = parse_import_profile(proc.stderr)
+            results.import_profile = {name: round(seconds * 1000, 3) for name, seconds in profile}
+            print("    slowest imports of main (cumulative):")
+            for name, seconds in profile[:IMPORT_PROFILE_TOP]:
+                print(f"      {name:41s} {seconds * 1000:14.3f} ms")
+
+
+async def _drive(send, total, concurrency):
+    """Runs send(i) for i in range(total) from `concurrency` workers."""
+    indexes = iter(range(total))
+    latencies = []
+
+    async def worker():
+        for i in indexes:
+            start = time.perf_counter()
+            response = await send(i)
+            if not 200 <= response.status_code < 300:
+                raise RuntimeError(f"HTTP {response.status_code}: {response.text[:200]}")
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return total / (time.perf_counter() - start), percentiles(latencies)
+
+
+async def _bench_http(results, urls, requests, concurrency):
+    import httpx
+    import main
+
+    def record(name, rps, pct):
+        results.add(f"http.{name}.c{concurrency}.rps", rps, "req/s", "higher")
+        for p in (50, 99):
+            results.add(f"http.{name}.c{concurrency}.p{p}_ms", pct[p], "ms", "lower")
+
+    # /check-url rejects urls without a scheme, and the dataset has some
+    batch = sample([u for u in urls if "://" in u], requests, seed=2)
+    transport = httpx.ASGITransport(app=main.app)
+    async with main.lifespan(main.app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            # The model loads in the background after startup
+            deadline = time.monotonic() + 120
+            while (await client.get("/readyz")).status_code != 200:
+                if time.monotonic() > deadline:
+                    raise RuntimeError("API did not become ready")
+                await asyncio.sleep(0.05)
+            await client.get("/check-url", params={"url": "https://www.example.com/"})
+
+            # Unique query strings defeat the verdict cache: model + batching path
+            record("check_url", *await _drive(
+                lambda i: client.get("/check-url", params={"url": f"{batch[i]}?bench={i}"}),
+                requests, concurrency))
+            record("check_url_cached", *await _drive(
+                lambda i: client.get("/check-url", params={"url": "https://www.example.com/"}),
+                requests, concurrency))
+            record("api_report", *await _drive(
+                lambda i: client.post("/api/report", data={
+                    "url": f"https://reported.example.com/{i}",
+                    "description": "benchmark report",
+                    "severity": "high",
+                    "anonymous": "true",
+                }),
+                requests, concurrency))
+            # A campaign: many reports of a few urls, coalesced by the spool
+            record("api_report_burst", *await _drive(
+                lambda i: client.post("/api/report", data={
+                    "url": f"https://campaign.example.com/{i % 20}",
+                    "description": "benchmark report",
+                    "severity": "high",
+                    "anonymous": "true",
+                }),
+                requests, concurrency))
+        if main.report_ingest is not None:
+            await main.report_ingest.flush()
+            stats = main.report_ingest.stats()
+            print(f"    spool: {stats['flushed_reports']} reports written as {stats['rows_written']} rows "
+                  f"in {stats['flushes']} flushes")
+
+
+def bench_http(results, urls, requests, concurrency):
+    print("http")
+    tmp = tempfile.mkdtemp(prefix="bench-http-")
+    # Configuration is read at import time, so it must be set before main is imported
+    os.environ["DATABASE_URL"] = f"sqlite:///{tmp}/reports.db"
+    os.environ["UPLOAD_DIR"] = f"{tmp}/uploads"
+    os.environ["DOMAIN_INDEX_FILE"] = f"{tmp}/no-index.json"
+    # REPORT_SPOOL_DIR= (empty) benchmarks the synchronous insert path instead
+    os.environ.setdefault("REPORT_SPOOL_DIR", f"{tmp}/spool")
+    for name in [m for m in sys.modules if m == "model" or m.startswith("model.")]:
+        del sys.modules[name]
+    sys.path.insert(0, str(BACKEND_DIR))
+    asyncio.run(_bench_http(results, urls, requests, concurrency))
+
+
+def compare(current, baseline, default_threshold, overrides):
+    """Prints a comparison table; returns the names of regressed metrics."""
+    regressions = []
+    print(f"\n{'metric':45s} {'baseline':>12s} {'current':>12s} {'change':>8s}")
+    for name, metric in sorted(current.items()):
+        base = baseline.get(name)
+        if base is None or not base["value"]:
+            continue
+        change = (metric["value"] - base["value"]) / base["value"]
+        worse = -change if metric["better"] == "higher" else change
+        threshold = default_threshold
+        for pattern, value in overrides:
+            if fnmatch.fnmatch(name, pattern):
+                threshold = value
+        flag = "  REGRESSION" if worse > threshold else ""
+        if flag:
+            regressions.append(name)
+        print(f"{name:45s} {base['value']:12.3f} {metric['value']:12.3f} {change:+8.1%}{flag}")
+    return regressions
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def parse_override(value):
+    pattern, _, threshold = value.rpartition("=")
+    if not pattern:
+        raise argparse.ArgumentTypeError("expected glob=threshold")
+    return pattern, float(threshold)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--out", default=None, help="Write results JSON here")
+    parser.add_argument("--baseline", default=None, help="Results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.15)
+    parser.add_argument("--metric-threshold", type=parse_override, action="append", default=[])
+    parser.add_argument("--only", default=",".join(SECTIONS))
+    parser.add_argument("--quick", action="store_true", help="Smaller sizes for a fast smoke run")
+    parser.add_argument("--sizes", default=None, help="featurize batch sizes (default 1000,10000,100000)")
+    parser.add_argument("--requests", type=int, default=None)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--backends", default="pipeline,compiled")
+    args = parser.parse_args()
+
+    sections = [s.strip() for s in args.only.split(",") if s.strip()]
+    unknown = set(sections) - set(SECTIONS)
+    if unknown:
+        parser.error(f"Unknown sections: {', '.join(sorted(unknown))}")
+    sizes = [int(s) for s in (args.sizes or ("1000,10000" if args.quick else "1000,10000,100000")).split(",")]
+    requests = args.requests or (200 if args.quick else 2000)
+
+    urls = load_urls()
+    results = Results()
+    if "featurize" in sections:
+        bench_featurize(results, urls, sizes)
+    if "inference" in sections:
+        bench_inference(results, urls, requests, batch_sizes=(32, 256))
+    if "load" in sections:
+        bench_load(results, [b for b in args.backends.split(",") if b])
+    if "startup" in sections:
+        bench_startup(results, [b for b in args.backends.split(",") if b])
+    if "http" in sections:
+        bench_http(results, urls, requests, args.concurrency)
+
+    run = {
+        "meta": {
+            "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "quick": args.quick,
+            "sections": sections,
+        },
+        "metrics": results.metrics,
+        "import_profile": results.import_profile,
+    }
+    if args.out:
+        Path(args.out).write_text(json.dumps(run, indent=2))
+        print(f"\nWrote {len(results.metrics)} metrics to {args.out}")
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text())
+        regressions = compare(results.metrics, baseline["metrics"], args.threshold, args.metric_threshold)
+        if regressions:
+            print(f"\n{len(regressions)} metric(s) regressed beyond threshold: {', '.join(regressions)}")
+            return 1
+        print("\nNo regressions beyond threshold")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -10,14 +10,29 @@ function Statistics() {
     search: "",
   });
 
-  // Mock data - replace with actual API call
+  // One row per reported URL; /api/reports is paginated, so follow
+  // next_cursor until the last page
   useEffect(() => {
     const fetchReports = async () => {
       try {
-        // Replace with actual API endpoint
-        const response = await fetch("/api/reports");
-        const data = await response.json();
-        setReports(data);
+        const fields = "id,url,created_at,last_reported_at,report_count";
+        const all = [];
+        let cursor = null;
+        do {
+          const params = new URLSearchParams({ fields, limit: "200" });
+          if (cursor !== null) params.set("cursor", cursor);
+          const response = await fetch(`/api/reports?${params}`);
+          if (!response.ok) throw new Error(`HTTP ${response.status}`);
+          const data = await response.json();
+          all.push(...data.items);
+          cursor = data.next_cursor;
+        } while (cursor !== null && cursor !== undefined);
+        setReports(
+          all.map((report) => ({
+            ...report,
+            last_reported_at: report.last_reported_at || report.created_at,
+          }))
+        );
       } catch (error) {
         console.error("Failed to fetch reports:", error);
       } finally {
@@ -33,17 +48,17 @@ function Statistics() {
       // Date filter
       if (filter.dateRange === "today") {
         const today = new Date().toDateString();
-        return new Date(report.reportedAt).toDateString() === today;
+        return new Date(report.last_reported_at).toDateString() === today;
       }
       if (filter.dateRange === "week") {
         const weekAgo = new Date();
         weekAgo.setDate(weekAgo.getDate() - 7);
-        return new Date(report.reportedAt) >= weekAgo;
+        return new Date(report.last_reported_at) >= weekAgo;
       }
       if (filter.dateRange === "month") {
         const monthAgo = new Date();
         monthAgo.setMonth(monthAgo.getMonth() - 1);
-        return new Date(report.reportedAt) >= monthAgo;
+        return new Date(report.last_reported_at) >= monthAgo;
       }
 
       return true;
@@ -56,9 +71,9 @@ function Statistics() {
     .sort((a, b) => {
       // Sort
       if (filter.sortBy === "frequency") {
-        return b.reportCount - a.reportCount;
+        return b.report_count - a.report_count;
       }
-      return new Date(b.reportedAt) - new Date(a.reportedAt);
+      return new Date(b.last_reported_at) - new Date(a.last_reported_at);
     });
 
   return (
@@ -178,14 +193,14 @@ function Statistics() {
                       </a>
                     </td>
                     <td className="px-6 py-4 whitespace-nowrap text-sm text-gray-500">
-                      {format(new Date(report.firstReported), "PPp")}
+                      {format(new Date(report.created_at), "PPp")}
                     </td>
                     <td className="px-6 py-4 whitespace-nowrap text-sm text-gray-500">
-                      {format(new Date(report.reportedAt), "PPp")}
+                      {format(new Date(report.last_reported_at), "PPp")}
                     </td>
                     <td className="px-6 py-4 whitespace-nowrap text-sm text-gray-900">
                       <span className="px-2 inline-flex text-xs leading-5 font-semibold rounded-full bg-green-100 text-green-800">
-                        {report.reportCount} reports
+                        {report.report_count} reports
                       </span>
                     </td>
                   </tr>
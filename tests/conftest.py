@@ -0,0 +1,37 @@
+"""
+Shared helpers for the test suite.
+
+The repo ships two copies of the `model` package (ai-model/model for
+training, backend/app/model for serving). Both are imported as `model`, so
+import_model() clears any loaded `model*` modules and imports the requested
+submodule from the right tree.
+"""
+import importlib
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+MODEL_ROOTS = {
+    "ai-model": ROOT / "ai-model",
+    "backend": ROOT / "backend" / "app",
+}
+
+
+def import_model(copy, name):
+    """Imports model.<name> from the given copy ("ai-model" or "backend")."""
+    for mod in [m for m in sys.modules if m == "model" or m.startswith("model.")]:
+        del sys.modules[mod]
+    root = str(MODEL_ROOTS[copy])
+    sys.path.insert(0, root)
+    try:
+        return importlib.import_module(f"model.{name}")
+    finally:
+        sys.path.remove(root)
+
+
+@pytest.fixture(params=sorted(MODEL_ROOTS))
+def model_copy(request):
+    """Runs a test once per copy of the model package."""
+    return request.param
@@ -0,0 +1,83 @@
+import numpy as np
+import pytest
+
+from conftest import import_model
+
+HOSTS = [
+    "https://www.example.com",
+    "http://mail.example.co.uk",
+    "https://login.paypal-secure.xyz",
+    "http://192.168.0.1:8080",
+    "https://münchen.de",
+]
+# domain_length, hostname_length, num_subdomains, hostname_entropy
+HOST_COLUMNS = [7, 8, 9, 10]
+
+
+@pytest.fixture
+def utils(model_copy):
+    module = import_model(model_copy, "utils")
+    module.host_memo.clear()
+    return module
+
+
+def fresh(utils, urls):
+    """Features computed with the memo disabled."""
+    memo, utils.host_memo = utils.host_memo, utils.HostMemo(maxsize=0)
+    try:
+        return utils.numeric_features(urls)
+    finally:
+        utils.host_memo = memo
+
+
+def test_same_hosts_twice(utils):
+    urls = [h + "/" for h in HOSTS]
+    first = utils.numeric_features(urls)
+    second = utils.numeric_features(urls)
+    np.testing.assert_array_equal(first, second)
+    np.testing.assert_array_equal(first, fresh(utils, urls))
+    stats = utils.host_memo.stats()
+    assert stats["misses"] == len(HOSTS)
+    assert stats["hits"] == len(HOSTS)
+
+
+def test_hosts_differing_in_path_and_query(utils):
+    variants = ["/", "/a/b/c.html", "?q=1&r=2", "/login?next=/admin#top", ""]
+    urls = [h + v for h in HOSTS for v in variants]
+    rows = utils.numeric_features(urls)
+    np.testing.assert_array_equal(rows, fresh(utils, urls))
+    # One memo entry per host; every variant shares its host's columns
+    assert utils.host_memo.stats()["size"] == len(HOSTS)
+    host_rows = rows[:, HOST_COLUMNS + list(range(13, rows.shape[1]))].reshape(len(HOSTS), len(variants), -1)
+    assert (host_rows == host_rows[:, :1]).all()
+
+
+def test_memo_hit_matches_miss_for_other_path(utils):
+    utils.numeric_features(["https://www.example.com/first"])
+    hit = utils.numeric_features(["https://www.example.com/second?x=1"])
+    np.testing.assert_array_equal(hit, fresh(utils, ["https://www.example.com/second?x=1"]))
+    assert utils.host_memo.stats()["hits"] == 1
+
+
+def test_stays_within_size_bound(utils):
+    memo = utils.HostMemo(maxsize=8)
+    saved, utils.host_memo = utils.host_memo, memo
+    try:
+        urls = [f"https://host{i}.example.com/path?{i}" for i in range(50)]
+        for start in range(0, len(urls), 7):
+            rows = utils.numeric_features(urls[start:start + 7])
+            np.testing.assert_array_equal(rows, fresh(utils, urls[start:start + 7]))
+            assert memo.stats()["size"] <= memo.maxsize
+        utils.numeric_features(urls)
+        stats = memo.stats()
+    finally:
+        utils.host_memo = saved
+    assert stats["size"] == stats["maxsize"] == 8
+    assert stats["evictions"] == stats["misses"] - stats["size"]
+    assert 0.0 <= stats["hit_rate"] <= 1.0
+
+
+def test_unkeyed_urls_bypass_memo(utils):
+    urls = ["example.com/path", "", "http://exa\tmple.com/"]
+    np.testing.assert_array_equal(utils.numeric_features(urls), fresh(utils, urls))
+    assert utils.host_memo.stats()["size"] == 0
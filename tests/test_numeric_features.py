@@ -0,0 +1,98 @@
+import importlib.util
+
+import numpy as np
+import pytest
+
+from conftest import ROOT, import_model
+
+
+def load_bench():
+    spec = importlib.util.spec_from_file_location("bench_features", ROOT / "benchmarks" / "bench_features.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+bench = load_bench()
+
+URLS = [
+    # Plain and multi-label suffix hosts
+    "https://www.google.com/search?q=x",
+    "http://mail.example.co.uk/inbox",
+    "https://a.b.c.example.org/path/to/page.html",
+    "http://paypal-secure-login.xyz/verify/account?id=1",
+    # IPs, with and without scheme/port, and near-misses
+    "http://192.168.0.1/login",
+    "https://10.0.0.1:8443/admin",
+    "1.2.3.4",
+    "http://999.999.999.999/",
+    "http://1.2.3/",
+    "http://1.2.3.4.5/",
+    "http://[2001:db8::1]/x",
+    # No scheme
+    "example.com",
+    "www.example.com/path?x=1",
+    "//cdn.example.net/a.js",
+    "paypal.com.evil.top/signin",
+    # https variants: the two copies disagree on "https" vs "https://"
+    "https://secure.bank.com",
+    "HTTPS://Example.COM/Verify",
+    "httpsfoo.com",
+    "https:/broken.com",
+    # Empty and degenerate strings
+    "",
+    " ",
+    "a",
+    "12345",
+    "http://",
+    "https://",
+    "http:///x",
+    # Non-ASCII and whitespace
+    "https://münchen.de/١٢٣",
+    "http://ｅｘａｍｐｌｅ.com/²³",
+    "\t https://x.top \n",
+    "http://user:pw@host.co.uk:8080/a-b-c?x=1#frag",
+]
+
+
+@pytest.fixture
+def utils(model_copy):
+    module = import_model(model_copy, "utils")
+    module.host_memo.clear()
+    return module
+
+
+def reference(model_copy, module, urls):
+    return bench.reference_numeric_features(urls, module.COMMON_TLDS, **bench.REFERENCE_ARGS[model_copy])
+
+
+def test_matches_reference(model_copy, utils):
+    expected = reference(model_copy, utils, URLS)
+    actual = utils.numeric_features(URLS)
+    assert actual.shape == expected.shape
+    for url, want, got in zip(URLS, expected, actual):
+        np.testing.assert_array_equal(got, want, err_msg=repr(url))
+
+
+def test_matches_reference_row_by_row(model_copy, utils):
+    expected = reference(model_copy, utils, URLS)
+    actual = np.vstack([utils.numeric_features([u]) for u in URLS])
+    np.testing.assert_array_equal(actual, expected)
+
+
+def test_matches_reference_with_duplicates(model_copy, utils):
+    urls = URLS + URLS[::-1] + URLS[:5]
+    np.testing.assert_array_equal(utils.numeric_features(urls), reference(model_copy, utils, urls))
+
+
+def test_https_and_ip_semantics(model_copy, utils):
+    names = ["length", "digits", "dots", "hyphens", "at_sign", "has_ip", "has_https"]
+    rows = utils.numeric_features(["httpsfoo.com", "http://1.2.3.4/", "https://x.com"])
+    has_ip, has_https = rows[:, names.index("has_ip")], rows[:, names.index("has_https")]
+    np.testing.assert_array_equal(has_ip, [0, 1, 0])
+    # ai-model counts any "https" prefix, the backend only "https://"
+    np.testing.assert_array_equal(has_https, [1 if model_copy == "ai-model" else 0, 0, 1])
+
+
+def test_empty_batch(utils):
+    assert utils.numeric_features([]).size == 0
@@ -0,0 +1,75 @@
+import pytest
+
+from conftest import import_model
+
+# (url, (subdomain, domain, suffix), registered domain); expectations agree
+# with tldextract on the bundled ICANN snapshot
+CASES = [
+    # Single- and multi-label suffixes
+    ("https://www.example.com/path", ("www", "example", "com"), "example.com"),
+    ("http://mail.example.co.uk/inbox", ("mail", "example", "co.uk"), "example.co.uk"),
+    ("http://a.b.example.co.uk", ("a.b", "example", "co.uk"), "example.co.uk"),
+    ("http://EXAMPLE.Co.UK", ("", "EXAMPLE", "Co.UK"), "EXAMPLE.Co.UK"),
+    ("http://user:pw@www.example.com:8080/?q=1#f", ("www", "example", "com"), "example.com"),
+    ("example.com/no/scheme", ("", "example", "com"), "example.com"),
+    ("//cdn.example.net/a.js", ("cdn", "example", "net"), "example.net"),
+    # Wildcard (*.ck, *.bd, *.kawasaki.jp) and exception (!www.ck, !city.kawasaki.jp) rules
+    ("http://foo.bar.ck", ("", "foo", "bar.ck"), "foo.bar.ck"),
+    ("http://www.ck", ("", "www", "ck"), "www.ck"),
+    ("http://a.www.ck", ("a", "www", "ck"), "www.ck"),
+    ("http://y.x.bd", ("", "y", "x.bd"), "y.x.bd"),
+    ("http://x.y.kawasaki.jp", ("", "x", "y.kawasaki.jp"), "x.y.kawasaki.jp"),
+    ("http://a.city.kawasaki.jp", ("a", "city", "kawasaki.jp"), "city.kawasaki.jp"),
+    # IP hosts
+    ("http://192.168.0.1/login", ("", "192.168.0.1", ""), ""),
+    ("https://10.0.0.1:8443", ("", "10.0.0.1", ""), ""),
+    ("http://[::1]/x", ("", "[::1]", ""), ""),
+    ("http://[2001:db8::1]:8080/", ("", "[2001:db8::1]", ""), ""),
+    ("http://999.1.1.1", ("999.1.1", "1", ""), ""),
+    ("http://1.2.3.4.5", ("1.2.3.4", "5", ""), ""),
+    # Trailing root-label dots, ASCII and full-width
+    ("http://example.co.uk./", ("", "example", "co.uk"), "example.co.uk"),
+    ("example.com.。", ("", "example", "com"), "example.com"),
+    ("http://www.example．com", ("www", "example", "com"), "example.com"),
+    # IDNA hosts, in unicode and punycode form
+    ("http://пример.рф/", ("", "пример", "рф"), "пример.рф"),
+    ("http://www.example.xn--p1ai", ("www", "example", "xn--p1ai"), "example.xn--p1ai"),
+    ("http://a.b.公司.cn", ("a", "b", "公司.cn"), "b.公司.cn"),
+    ("http://a.b.xn--55qx5d.cn", ("a", "b", "xn--55qx5d.cn"), "b.xn--55qx5d.cn"),
+    ("http://xn--80ak6aa92e.com", ("", "xn--80ak6aa92e", "com"), "xn--80ak6aa92e.com"),
+    # Bare suffixes and hosts with no known suffix
+    ("co.uk", ("", "", "co.uk"), ""),
+    ("http://co.uk/", ("", "", "co.uk"), ""),
+    ("http://com", ("", "", "com"), ""),
+    ("http://x.bd", ("", "", "x.bd"), ""),
+    ("http://bd", ("", "bd", ""), ""),
+    ("http://localhost:8000", ("", "localhost", ""), ""),
+    ("", ("", "", ""), ""),
+]
+
+
+@pytest.fixture
+def public_suffix(model_copy):
+    return import_model(model_copy, "public_suffix")
+
+
+@pytest.mark.parametrize("url,parts,registered", CASES, ids=[c[0] or "empty" for c in CASES])
+def test_extract(public_suffix, url, parts, registered):
+    assert tuple(public_suffix.extract(url)) == parts
+    assert public_suffix.registered_domain(url) == registered
+
+
+@pytest.mark.parametrize("host,parts", [
+    ("www.example.co.uk", ("www", "example", "co.uk")),
+    ("foo.bar.ck", ("", "foo", "bar.ck")),
+    ("1.2.3.4", ("", "1.2.3.4", "")),
+    ("[::1]", ("", "[::1]", "")),
+    ("co.uk", ("", "", "co.uk")),
+    ("example。com", ("", "example", "com")),
+])
+def test_extract_host(public_suffix, host, parts):
+    assert tuple(public_suffix.extract_host(host)) == parts
+
+
+def test_snapshot_version(public_suffix):
+    assert public_suffix.SUFFIX_LIST_VERSION
@@ -0,0 +1,97 @@
+import numpy as np
+import pytest
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.linear_model import LogisticRegression
+from sklearn.pipeline import FeatureUnion, Pipeline
+from sklearn.preprocessing import FunctionTransformer
+
+from conftest import import_model
+
+TRAIN_URLS = [
+    "https://www.google.com/search?q=phishing",
+    "https://github.com/login",
+    "https://en.wikipedia.org/wiki/URL",
+    "https://docs.python.org/3/library/urllib.parse.html",
+    "https://mail.example.co.uk/inbox",
+    "https://münchen.de/stadtplan",
+    "http://paypal-secure-login.xyz/verify/account",
+    "http://192.168.10.4/bank/confirm.php",
+    "http://signin.ebay.invoice.top/update?id=8812",
+    "http://secure-account-verify.ru/login@admin",
+    "http://аpple-id.com/signin",
+    "http://xn--80ak6aa92e.com/verify",
+]
+TRAIN_LABELS = [0, 0, 0, 0, 0, 0, 1, 1, 1, 1, 1, 1]
+
+# char_wb edge cases: no words at all, words shorter than the smallest
+# n-gram, non-ASCII and mixed-case text, and whitespace-separated words
+EDGE_URLS = [
+    "",
+    " ",
+    "a",
+    "ab",
+    "a b",
+    "ÄB",
+    "http://ёж.рф/",
+    "https://例え.テスト/パス",
+    "HTTPS://Example.COM/Verify",
+    "http://x.io/é́",
+    "\t https://x.top \n",
+    "paypal  login\tsecure",
+    "https://192.168.0.1:8080/a-b?c=d#e",
+]
+
+
+def fit_pipeline(utils):
+    def branch(step):
+        return Pipeline([('selector', FunctionTransformer(func=utils.get_url_values, validate=False)), step])
+
+    pipeline = Pipeline([
+        ('features', FeatureUnion([
+            ('tfidf', branch(('tfidf', TfidfVectorizer(analyzer='char_wb', ngram_range=(3, 5))))),
+            ('numeric', branch(('nums', FunctionTransformer(func=utils.numeric_features, validate=False)))),
+        ])),
+        ('clf', LogisticRegression(max_iter=1000)),
+    ])
+    return pipeline.fit(np.array(TRAIN_URLS), TRAIN_LABELS)
+
+
+@pytest.fixture
+def fitted(model_copy, tmp_path):
+    utils = import_model(model_copy, "utils")
+    scorer = import_model(model_copy, "scorer")
+    pipeline = fit_pipeline(utils)
+    return pipeline, scorer.CompiledScorer(scorer.export_scorer(pipeline, tmp_path / "url_scorer"))
+
+
+@pytest.mark.parametrize("urls", [TRAIN_URLS, EDGE_URLS, TRAIN_URLS + EDGE_URLS], ids=["train", "edge", "mixed"])
+def test_decision_function_matches_pipeline(fitted, urls):
+    pipeline, compiled = fitted
+    expected = pipeline.decision_function(np.array(urls))
+    np.testing.assert_allclose(compiled.decision_function(urls), expected, rtol=1e-9, atol=1e-9)
+
+
+@pytest.mark.parametrize("url", EDGE_URLS)
+def test_single_url_matches_pipeline(fitted, url):
+    pipeline, compiled = fitted
+    expected = pipeline.decision_function(np.array([url]))
+    np.testing.assert_allclose(compiled.decision_function([url]), expected, rtol=1e-9, atol=1e-9)
+
+
+def test_ngrams_match_vectorizer(fitted):
+    pipeline, compiled = fitted
+    analyzer = TfidfVectorizer(analyzer='char_wb', ngram_range=(3, 5)).build_analyzer()
+    for url in EDGE_URLS:
+        assert compiled._ngrams(url) == analyzer(url), url
+
+
+def test_score_returns_classes_and_probabilities(fitted):
+    pipeline, compiled = fitted
+    labels, probs = compiled.score(TRAIN_URLS)
+    np.testing.assert_array_equal(labels, pipeline.predict(np.array(TRAIN_URLS)))
+    np.testing.assert_allclose(probs, pipeline.predict_proba(np.array(TRAIN_URLS))[:, 1], rtol=1e-9, atol=1e-9)
+
+
+def test_empty_batch(fitted):
+    _, compiled = fitted
+    assert compiled.decision_function([]).shape == (0,)
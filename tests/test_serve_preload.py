@@ -0,0 +1,94 @@
+import json
+import subprocess
+import sys
+
+import pytest
+
+from conftest import ROOT
+
+APP_DIR = ROOT / "backend" / "app"
+
+# Runs in a fresh interpreter (main and model.predict keep process-wide
+# state): loads the app the way serve.py's gunicorn master does, forks
+# workers like gunicorn's preload, and reports what each worker saw
+LAUNCHER = r"""
+import json, os, sys
+sys.path.insert(0, os.getcwd())
+import serve
+from model import predict
+
+registry = predict.registry
+loads = []
+load_initial = registry._load_initial
+def counting_load_initial():
+    loads.append(os.getpid())
+    return load_initial()
+registry._load_initial = counting_load_initial
+
+preload = sys.argv[1] == "preload"
+serve.load_app(preload=preload)
+if preload:
+    serve.when_ready(None)
+master = {"pid": os.getpid(), "loads": list(loads), "state": registry.state}
+
+workers = []
+for _ in range(3):
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_fd)
+        # What each worker's lifespan does before serving
+        model = predict.load_model()
+        predict.predict_single("http://paypal-secure-login.xyz/verify")
+        os.write(write_fd, json.dumps({
+            "pid": os.getpid(), "loads": loads, "state": registry.state,
+            "model_id": id(model), "loaded_at": registry.loaded_at,
+        }).encode())
+        os._exit(0)
+    os.close(write_fd)
+    with os.fdopen(read_fd) as f:
+        workers.append(json.loads(f.read()))
+    os.waitpid(pid, 0)
+print(json.dumps({"master": master, "workers": workers}))
+"""
+
+
+def launch(mode):
+    result = subprocess.run(
+        [sys.executable, "-c", LAUNCHER, mode], cwd=APP_DIR,
+        capture_output=True, text=True, timeout=120,
+    )
+    assert result.returncode == 0, result.stderr
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def test_preload_loads_model_once_before_fork():
+    run = launch("preload")
+    master, workers = run["master"], run["workers"]
+    assert master["state"] == "ready"
+    assert master["loads"] == [master["pid"]]
+    for worker in workers:
+        assert worker["state"] == "ready"
+        # No worker loaded the model again; all use the master's copy
+        assert worker["loads"] == [master["pid"]]
+    assert len({w["model_id"] for w in workers}) == 1
+    assert len({w["loaded_at"] for w in workers}) == 1
+
+
+def test_without_preload_each_worker_loads_its_own():
+    run = launch("no-preload")
+    master, workers = run["master"], run["workers"]
+    assert master["state"] == "not_loaded"
+    assert master["loads"] == []
+    for worker in workers:
+        assert worker["loads"] == [worker["pid"]]
+
+
+@pytest.mark.parametrize("budget_mb,exit_code", [(64, 0), (0.5, 1)])
+def test_bench_workers_uss_budget(budget_mb, exit_code):
+    result = subprocess.run(
+        [sys.executable, str(ROOT / "benchmarks" / "bench_workers.py"), "--workers", "2", "--requests", "20",
+         "--backends", "compiled", "--max-uss-mb", str(budget_mb)],
+        cwd=ROOT, capture_output=True, text=True, timeout=120,
+    )
+    assert result.returncode == exit_code, result.stdout + result.stderr